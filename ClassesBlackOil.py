@@ -32,21 +32,160 @@ desenvolvida e a apresentação elaborada
 
 import math as M
 import numpy as np
+import functools
+import hashlib
+import time
+import ClassesInstrumentacao
+import ClassesUnidades
+import ClassesViscosidadeGas
+from collections import OrderedDict
+
+
+class CacheCorrelacoes:
+    def __init__(self, tamanho_maximo=4096):
+        """
+        Nota: cache LRU compartilhável entre objetos FatorZ/BlackOil. Cada resultado é guardado com a chave
+        (correlação, valores das entradas que ela lê), então propriedades que não dependem da pressão são calculadas
+        uma vez por fluido e as que dependem, uma vez por nó.
+        :param tamanho_maximo: Número máximo de resultados guardados; o menos usado recentemente é descartado
+        """
+        self.tamanho_maximo = tamanho_maximo
+        self.dados = OrderedDict()
+        self.acertos = 0
+        self.falhas = 0
+
+    def busca(self, chave):
+        """
+        :return: Resultado guardado ou None
+        """
+        if chave in self.dados:
+            self.dados.move_to_end(chave)
+            self.acertos += 1
+            return self.dados[chave]
+        self.falhas += 1
+        return None
+
+    def guarda(self, chave, valor):
+        self.dados[chave] = valor
+        self.dados.move_to_end(chave)
+        while len(self.dados) > self.tamanho_maximo:
+            self.dados.popitem(last=False)
+
+    def limpa(self):
+        self.dados.clear()
+        self.acertos = 0
+        self.falhas = 0
+
+
+def _chave_da_entrada(valor):
+    """
+    Nota: a chave nunca usa só o id() do valor, que o Python reaproveita depois que o objeto é coletado; um resultado
+    guardado para um objeto já descartado seria devolvido para outro que ocupasse o mesmo endereço.
+    :param valor: Valor de um atributo (escalar, array ou objeto)
+    :return: Representação hashable; arrays entram pelo resumo do conteúdo, listas e tuplas item a item e objetos
+    (ex.: NumeroDual, Grandeza) pelo conteúdo dos seus atributos
+    """
+    if isinstance(valor, np.ndarray):
+        conteudo = hashlib.blake2b(np.ascontiguousarray(valor).data, digest_size=16).digest()
+        return valor.shape, valor.dtype.str, conteudo
+    if isinstance(valor, (int, float, str, np.generic)) or valor is None:
+        return valor
+    if isinstance(valor, (tuple, list)):
+        return type(valor).__name__, tuple(_chave_da_entrada(v) for v in valor)
+    atributos = getattr(valor, '__dict__', None)
+    if atributos is not None:  # atributos privados (ex.: conversões já feitas de uma Grandeza) ficam de fora
+        return type(valor).__qualname__, tuple((nome, _chave_da_entrada(v)) for nome, v in sorted(atributos.items())
+                                               if not nome.startswith('_'))
+    return _PorIdentidade(valor)
+
+
+class _PorIdentidade:
+    # Chave de um objeto sem conteúdo comparável: a referência guardada na chave impede que o objeto seja coletado (e
+    # o id reaproveitado) enquanto a entrada estiver no cache
+    __slots__ = ('objeto',)
+
+    def __init__(self, objeto):
+        self.objeto = objeto
+
+    def __hash__(self):
+        return id(self.objeto)
+
+    def __eq__(self, outro):
+        return isinstance(outro, _PorIdentidade) and outro.objeto is self.objeto
+
+
+def _somente_leitura(valor):
+    # Resultados em cache são compartilhados: arrays ficam protegidos contra escrita
+    if isinstance(valor, np.ndarray):
+        valor.flags.writeable = False
+    elif isinstance(valor, tuple):
+        for v in valor:
+            _somente_leitura(v)
+    return valor
+
+
+def _memoriza(*entradas):
+    """
+    Nota: decora as correlações declarando os atributos que cada uma lê. Sem cache no objeto (self.cache = None),
+    o método é chamado diretamente. Com a instrumentação ligada (ClassesInstrumentacao), cada chamada é medida.
+    :param entradas: Nomes dos atributos de que a correlação depende
+    """
+    def decorador(metodo):
+        def calcula(self):
+            cache = self.cache
+            if cache is None:
+                return metodo(self)
+            chave = (metodo.__name__,) + tuple(_chave_da_entrada(getattr(self, e)) for e in entradas)
+            valor = cache.busca(chave)
+            if valor is None:
+                valor = _somente_leitura(metodo(self))
+                cache.guarda(chave, valor)
+            return valor
+
+        @functools.wraps(metodo)
+        def memorizado(self):
+            instrumentacao = ClassesInstrumentacao.ATIVA
+            if instrumentacao is None:
+                return calcula(self)
+            with instrumentacao.mede(metodo.__name__, 'correlacao') as argumentos:
+                valor = calcula(self)
+                saida = valor[0] if isinstance(valor, tuple) else valor
+                argumentos['elementos'] = np.size(getattr(saida, 'valor', saida))  # NumeroDual: tamanho do valor
+            return valor
+        memorizado.entradas = entradas
+        return memorizado
+    return decorador
 
 
 class FatorZ:
-    def __init__(self, Ppr=0, Tpr=0, zc=0, x0=0):
+    # Nome curto de cada correlação -> método que a resolve (usado pelas superfícies pré-calculadas)
+    CORRELACOES_Z = {'brill_e_beggs': 'fator_z_correlacao_de_brill_e_beggs',
+                     'papay': 'fator_z_correlacao_papay',
+                     'hall_yarborough': 'fator_z_correlacao_de_hall_yarborough',
+                     'dranchukabukassem': 'fator_z_correlacao_dranchukabukassem'}
+
+    # Sem __dict__ por instância: os atributos ficam em posições fixas do objeto
+    __slots__ = ('Ppr', 'Tpr', 'zc', 'x0', 'superficie_z', 'tolerancia_z', 'cache')
+
+    def __init__(self, Ppr=0, Tpr=0, zc=0, x0=0, superficie_z=None, tolerancia_z=10 ** -4, cache=None):
         """
         :param Ppr: Pressão pseudoreduzida, adimensional
         :param Tpr: Temperatura pseudoreduzida, adimensional
         :param zc: z crítico (metano), adimensional
         :param x0: Valor que zera função objetivo
+        :param superficie_z: SuperficieZ pré-calculada (ClassesSuperficieZ), usada por fator_z_interpolado
+        :param tolerancia_z: Erro absoluto máximo aceito para o Z interpolado
+        :param cache: CacheCorrelacoes compartilhado (None desliga a memorização)
         """
         self.Ppr = Ppr
         self.Tpr = Tpr
         self.zc = zc
         self.x0 = x0
+        self.superficie_z = superficie_z
+        self.tolerancia_z = tolerancia_z
+        self.cache = cache
 
+    @_memoriza('Ppr', 'Tpr')
     def fator_z_correlacao_de_brill_e_beggs(self):
         """
         :param Ppr: Pressão pseudoreduzida, adimensional
@@ -59,11 +198,12 @@ class FatorZ:
         A = 1.39 * (Tpr - 0.92) ** 0.5 - 0.36 * Tpr - 0.101
         B = (0.62 - 0.23 * Tpr) * Ppr + ((0.066 / (Tpr - 0.86)) - 0.037) * Ppr ** 2 + (
                    0.32 / 10 ** (9 * (Tpr - 1))) * Ppr ** 6
-        C = 0.132 - 0.32 * M.log10(Tpr)
+        C = 0.132 - 0.32 * np.log10(Tpr)
         D = 10 ** (0.3106 - 0.49 * Tpr + 0.1824 * Tpr ** 2)
-        Z = A + ((1 - A) / M.exp(B)) + C * Ppr ** D
+        Z = A + ((1 - A) / np.exp(B)) + C * Ppr ** D
         return Z
 
+    @_memoriza('Ppr', 'Tpr')
     def fator_z_correlacao_papay(self):  # Essa correlação é simples mas tem suas limitações
         """
         :param Ppr: Pressão pseudoreduzida, adimensional
@@ -76,8 +216,11 @@ class FatorZ:
         Z = 1 - ((3.53 * Ppr) / (10 ** (0.9813 * Tpr))) + ((0.274 * Ppr ** 2) / (10 ** (0.8157 * Tpr)))
         return Z
 
+    @_memoriza('Ppr', 'Tpr')
     def fator_z_correlacao_de_hall_yarborough(self):
         """
+        Nota: Ppr e Tpr podem ser arrays; todos os pontos são iterados juntos pelo método de Newton com a derivada
+        analítica da função objetivo, e cada ponto para de ser atualizado assim que converge.
         :param Ppr: Pressão pseudoreduzida, adimensional
         :param Tpr: Temperatura pseudoreduzida, adimensional
         :return: Fator de compressibilidade do gás
@@ -86,17 +229,14 @@ class FatorZ:
         Tpr = self.Tpr
 
         t = 1 / Tpr
-        X1 = 0.06125 * t * M.exp(-1.2 * (1 - t)**2)
+        X1 = 0.06125 * t * np.exp(-1.2 * (1 - t)**2)
         X2 = 14.76 * t - 9.76 * t**2 + 4.58 * t**3
         X3 = 90.7 * t - 242.2 * t**2 + 42.4 * t**3
         X4 = 2.18 + (2.82 * t)
 
-        Pert = 10 ** -6
-        Parad = 10 ** -11
-        maxit = 5000
-        iter = 0
         x0 = (X1 * Ppr)/FatorZ.fator_z_correlacao_de_brill_e_beggs(self)
         # Aqui, podemos usar a Correlação de Papay também!
+        x0 = np.where((x0 > 0) & (x0 < 1), x0, X1 * Ppr)  # fora da faixa de Brill e Beggs, parte do gás ideal (Z=1)
 
         """
         O melhor chute: basta fazer o passo contrário do "Z = (X1 * Ppr) / x0" e isolar x0.
@@ -105,19 +245,21 @@ class FatorZ:
         o valor de Z.
         """
 
-        F = lambda Y: - X1 * Ppr + ((Y + Y ** 2 + Y ** 3 - Y ** 4) / (1 - Y) ** 3) - X2 * Y ** 2 + X3 * Y ** X4
-        while True:
-            iter += 1
-            xold = x0
-            x0 = xold - ((Pert * xold * F(xold)) / (F(xold + Pert * xold) - F(x0)))
-            Erro = ((xold - x0) / xold) * 100
-            if Erro <= Parad or iter >= maxit:
-                break
-        Z = (X1 * Ppr) / x0
-        return f'FATOR Z PELA CORRELAÇÃO DE HALL-YARBOROUGH>> {Z}'
+        F = lambda Y, X1Ppr, X2, X3, X4: - X1Ppr + ((Y + Y ** 2 + Y ** 3 - Y ** 4) / (1 - Y) ** 3) - X2 * Y ** 2 + \
+            X3 * Y ** X4
+        dF_dY = lambda Y, X1Ppr, X2, X3, X4: (1 + 4 * Y + 4 * Y ** 2 - 4 * Y ** 3 + Y ** 4) / (1 - Y) ** 4 - \
+            2 * X2 * Y + X4 * X3 * Y ** (X4 - 1)
+        # Y é a massa específica reduzida, sempre entre 0 e 1
+        Y = _newton_vetorizado(F, dF_dY, x0, (X1 * Ppr, X2, X3, X4), lim_inf=0, lim_sup=1)[0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            Z = np.where(Y > 0, (X1 * Ppr) / Y, 1)  # em Ppr = 0, Y = 0 e Z = 1
+        return Z[()]
 
+    @_memoriza('Ppr', 'Tpr', 'zc', 'x0')
     def fator_z_correlacao_dranchukabukassem(self):
         """
+        Nota: Ppr e Tpr podem ser arrays, resolvidos juntos pelo método de Newton com derivada analítica.
+        Se x0 não for informado (x0 = 0), o chute inicial é a correlação de Brill e Beggs.
         :param Ppr: Pressão pseudoreduzida, adimensional
         :param Tpr: Temperatura pseudoreduzida, adimensional
         :param zc: z crítico (metano), adimensional
@@ -131,35 +273,67 @@ class FatorZ:
 
         A1, A2, A3, A4, A5, A6, A7, A8, A9, A10, A11 = 0.3265, -1.0700, -0.5339, 0.01569, -0.05165, 0.5475, -0.7361, \
                                                        0.1844, 0.1056, 0.6134, 0.7210
-        # Função Objetivo
-        F = lambda z: 1 + (A1 + A2 / Tpr + A3 / Tpr ** 3 + A4 / Tpr ** 4 + A5 / Tpr ** 5) * ((zc * Ppr) / (z * Tpr)) + (
-                    A6 + A7 / Tpr + A8 / Tpr ** 2) * \
-                    ((zc * Ppr) / (z * Tpr)) ** 2 - A9 * (A7 / Tpr + A8 / Tpr ** 2) * ((zc * Ppr) / (z * Tpr)) ** 5 + \
-                    A10 * (1 + A11 * ((zc * Ppr) / (z * Tpr)) ** 2) * (
-                                (((zc * Ppr) / (z * Tpr)) ** 2) * M.exp(-A11 * ((zc * Ppr) / (z * Tpr)) ** 2)) / (
-                                Tpr ** 3) - z
-
-        Pert = 10 ** -6
-        Parad = 10 ** -11
-        maxit = 50000
-        iter = 0
-
-        while True:
-            iter += 1
-            xold = x0
-            x0 = xold - ((Pert * xold * F(xold)) / (F(xold + Pert * xold) - F(x0)))
-            Erro = ((xold - x0) / xold) * 100
-            if Erro <= Parad or iter >= maxit:
-                break
-        z = x0
-        return f'FATOR Z PELA CORRELAÇÃO DE DRANCHUK & ABU-KASSEM>> {z}'
+        B1 = A1 + A2 / Tpr + A3 / Tpr ** 3 + A4 / Tpr ** 4 + A5 / Tpr ** 5
+        B2 = A6 + A7 / Tpr + A8 / Tpr ** 2
+        B3 = A9 * (A7 / Tpr + A8 / Tpr ** 2)
+        B4 = A10 / Tpr ** 3
+        c = (zc * Ppr) / Tpr  # massa específica reduzida: rho_r = c / z
+
+        # Função Objetivo e sua derivada em relação a z (regra da cadeia: d(rho_r)/dz = -rho_r/z)
+        def F(z, c, B1, B2, B3, B4):
+            rho_r = c / z
+            return 1 + B1 * rho_r + B2 * rho_r ** 2 - B3 * rho_r ** 5 + \
+                B4 * (1 + A11 * rho_r ** 2) * rho_r ** 2 * np.exp(-A11 * rho_r ** 2) - z
+
+        def dF_dz(z, c, B1, B2, B3, B4):
+            rho_r = c / z
+            dG_drho = B1 + 2 * B2 * rho_r - 5 * B3 * rho_r ** 4 + \
+                B4 * (2 * rho_r + 2 * A11 * rho_r ** 3 - 2 * A11 ** 2 * rho_r ** 5) * np.exp(-A11 * rho_r ** 2)
+            return -dG_drho * rho_r / z - 1
+
+        Z_bb = FatorZ.fator_z_correlacao_de_brill_e_beggs(self)
+        x0 = np.where(np.asarray(x0) > 0, x0, np.where(Z_bb > 0, Z_bb, 1))
+        z = _newton_vetorizado(F, dF_dz, x0, (c, B1, B2, B3, B4), lim_inf=0)[0]
+        return z[()]
+
+
+    @_memoriza('superficie_z', 'Ppr', 'Tpr', 'tolerancia_z')
+    def fator_z_interpolado(self):
+        """
+        Nota: Z vem da superfície pré-calculada (consulta O(1) por ponto). Pontos fora da malha, ou em células cujo
+        erro de interpolação estimado passa de tolerancia_z, são resolvidos pela própria correlação da superfície.
+        :param Ppr: Pressão pseudoreduzida, adimensional
+        :param Tpr: Temperatura pseudoreduzida, adimensional
+        :param superficie_z: SuperficieZ pré-calculada
+        :param tolerancia_z: Erro absoluto máximo aceito para o Z interpolado
+        :return: Fator de compressibilidade do gás
+        """
+        superficie = self.superficie_z
+
+        Z, valido = superficie.interpola(self.Ppr, self.Tpr, self.tolerancia_z)
+        if not valido.all():
+            fora = ~valido
+            Ppr, Tpr = np.broadcast_arrays(self.Ppr, self.Tpr)
+            solver = FatorZ(Ppr[fora], Tpr[fora], superficie.zc)
+            Z[fora] = getattr(solver, FatorZ.CORRELACOES_Z[superficie.correlacao])()
+        return Z[()]
 
 
 class BlackOil(FatorZ):
+    """
+    Nota: os atributos (P, T, dg, do, API, Rs, ...) podem ser escalares ou arrays NumPy. As correlações usam apenas
+    operações do NumPy (np.where no lugar de if/else), então um único objeto avalia uma malha inteira de pressões
+    em uma chamada, seguindo as regras de broadcast do NumPy.
+    """
+    __slots__ = ('Rho_oleo', 'P', 'dgn', 'API', 'do', 'Rs', 'Rsb', 'dg', 'T', 'Tsep', 'Psep', 'Pb', 'Bo', 'Bg', 'Bob',
+                 'Co', 'uob', 'uod', 'uo', 'Correl_Bo', 'Correl_Rs', 'rho_o_sc', 'rho_g_sc', 'Rho_ob', 'n', 'Z', 'Tpc',
+                 'Ppc', 'Mar', 'Mg', 'dgas', 'dar', 'Psc', 'Tsc', 'Yn2', 'Yco2', 'Yh2s', 'R', 'rho_g', 'ug', 'Cg')
+
     def __init__(self, Rho_oleo=0, P=0, dgn=0, API=0, do=0, Rs=0, Rsb=0, dg=0, T=0, Tsep=0, Psep=0, Pb=0, Bo=0, Bg=0, Bob=0, Co=0
                  , uob=0, uod=0, Correl_Bo=0, Correl_Rs=0, rho_o_sc=0, rho_g_sc=0, Rho_ob=0,  n=0.172, Z=0,
                  Tpr=0, Tpc=0, Ppr=0, Ppc=0, Mar=28.96, Mg=0, dgas=0, dar=1.225, Psc=14.7, Tsc=60, Yn2=0, Yco2=0,
-                 Yh2s=0, R=10.73, rho_g=0, ug=0, Cg=0):
+                 Yh2s=0, R=10.73, rho_g=0, ug=0, Cg=0, superficie_z=None, tolerancia_z=10 ** -4,
+                 cache=None, uo=0):
 
 
         self.Rho_oleo = Rho_oleo
@@ -180,6 +354,7 @@ class BlackOil(FatorZ):
         self.Co = Co
         self.uob = uob
         self.uod = uod
+        self.uo = uo
         self.Correl_Bo = Correl_Bo  # Escolher um fator volume formação de óleo para derivar em relação a P
         self.Correl_Rs = Correl_Rs  # Escolher um método de razão de solubilidade do óleo para derivar em relação a P
         self.rho_o_sc = rho_o_sc
@@ -204,7 +379,11 @@ class BlackOil(FatorZ):
         self.rho_g = rho_g
         self.ug = ug
         self.Cg = Cg
+        self.superficie_z = superficie_z
+        self.tolerancia_z = tolerancia_z
+        self.cache = cache
 
+    @_memoriza('API')
     def fase_oleo_densidade_relativa_do_oleo_com_API__do__(self):
         """
         :param API: Grau API, adimensional
@@ -215,6 +394,7 @@ class BlackOil(FatorZ):
         do = 141.5 / (API + 131.5)
         return do
 
+    @_memoriza('do')
     def fase_oleo_grau_API_com_do__API__(self):
         """
         :param do: Densidade relatia do óleo, adimensional
@@ -224,6 +404,25 @@ class BlackOil(FatorZ):
         API = (141.5/do) - 131.5
         return API
 
+    @_memoriza('dg', 'API', 'Tsep', 'Psep')
+    def fase_gas_densidade_relativa_normalizada_vasquez_e_beggs_1980__dgn__(self):
+        """
+        Nota: densidade do gás corrigida para a pressão de separador de referência (100 psig)
+        :param dg: Densidade relativa do gás, adimensional
+        :param API: Grau API, adimensional
+        :param Tsep: Temperatura no separador, °F
+        :param Psep: Pressão no separador, psia
+        :return: Gravidade específica do gás normalizada, adimensional
+        """
+        dg = self.dg
+        API = self.API
+        Tsep = self.Tsep
+        Psep = self.Psep
+
+        dgn = dg * (1 + 5.912 * 10 ** -5 * API * Tsep * np.log10(Psep / 114.7))
+        return dgn
+
+    @_memoriza('API', 'Rs', 'dg', 'T')
     def pressao_de_bolha_Standing_1947__Pb__(self):
         """
         :param API: Grau API, adimensional
@@ -241,6 +440,7 @@ class BlackOil(FatorZ):
         Pb = 18.2 * (((Rs / dg) ** 0.83) * 10 ** a - 1.4)
         return Pb
 
+    @_memoriza('API', 'Tsep', 'Psep', 'dg', 'Rs', 'T')
     def pressao_de_bolha_Vasquez_e_Beggs_1980__Pb__(self):
         """
         Nota: dgn, gravidade específica do gás normalizada
@@ -259,19 +459,16 @@ class BlackOil(FatorZ):
         Rs = self.Rs
         T = self.T
 
-        if API <= 30:
-            C1 = 27.624
-            C2 = 0.914328
-            C3 = 11.172
-        else:
-            C1 = 56.18
-            C2 = 0.84246
-            C3 = 10.393
+        pesado = API <= 30  # máscara: vale tanto para escalar quanto para array
+        C1 = np.where(pesado, 27.624, 56.18)
+        C2 = np.where(pesado, 0.914328, 0.84246)
+        C3 = np.where(pesado, 11.172, 10.393)
         dgn = dg * (1 + 5.912 * 10 ** -5 * API * Tsep * np.log10(Psep / 114.7))
         a = -C3 * API / T  # T em °R
         Pb = ((C1 * Rs / dgn) * 10 ** a) ** C2
-        return Pb
+        return Pb[()]
 
+    @_memoriza('Rs', 'dg', 'API', 'T')
     def pressao_de_bolha_Glaso_1980__Pb__(self):
         """
         :param Rs: Razão de solubilidade Gás-Óleo, SCF/STB
@@ -292,6 +489,7 @@ class BlackOil(FatorZ):
         Pb = 10 ** (1.7669 + 1.7447 * np.log10(A) - 0.30208 * (np.log10(A)) ** 2)  # Pb em psia
         return Pb
 
+    @_memoriza('Rs', 'API', 'dg', 'T')
     def pressao_de_bolha_petrosky_e_farshad_1993__Pb__(self):
         """
         :param Rs: Razão de solubilidade Gás-Óleo, SCF/STB
@@ -309,6 +507,7 @@ class BlackOil(FatorZ):
         Pb = ((112.727 * Rs ** 0.577421) / (dg ** 0.8439 * 10 ** a)) - 1391.051  # Pb em psia
         return Pb
 
+    @_memoriza('P', 'dg', 'API', 'T')
     def fase_oleo_razao_de_solubilidade_standing_1947_P_menorIgual_Pb__Rs__(self):
         """
         se P > Pb:
@@ -331,6 +530,7 @@ class BlackOil(FatorZ):
         Rs = dg * (((P / 18.2) + 1.4) * 10 ** (0.0125 * API - 0.00091 * T)) ** (1 / 0.83)
         return Rs
 
+    @_memoriza('API', 'P', 'dgn', 'T')
     def fase_oleo_razao_de_solubilidade_vasquez_e_beggs_1980_P_menorIgual_Pb__Rs__(self):
         """
         :param API: Grau API, adimensional
@@ -344,17 +544,14 @@ class BlackOil(FatorZ):
         dgn = self.dgn
         T = self.T
 
-        if API <= 30:
-            C1 = 0.0362
-            C2 = 1.0937
-            C3 = 25.7240
-        else:
-            C1 = 0.0178
-            C2 = 1.1870
-            C3 = 23.931
+        pesado = API <= 30
+        C1 = np.where(pesado, 0.0362, 0.0178)
+        C2 = np.where(pesado, 1.0937, 1.1870)
+        C3 = np.where(pesado, 25.7240, 23.931)
         Rs = (C1 * dgn * P ** C2) * np.exp(C3 * (API / T))
-        return Rs
+        return Rs[()]
 
+    @_memoriza('P', 'API', 'dg', 'T')
     def fase_oleo_razao_de_solubilidade_glaso_1980_P_menorIgual_Pb__Rs__(self):
         """
         :param P: Pressão, psia
@@ -372,6 +569,7 @@ class BlackOil(FatorZ):
         Rs = dg * (((API ** 0.989) / (T ** 0.1722)) * 10 ** a) ** 1.2255
         return Rs
 
+    @_memoriza('P', 'API', 'dg', 'T')
     def fase_oleo_razao_de_solubilidade_Petrosky_1993_P_menorIgual_Pb__Rs__(self):
         """
         :param P: Pressão, psia
@@ -389,6 +587,7 @@ class BlackOil(FatorZ):
         Rs = (((P / 112.727) + 12.34) * dg ** 0.8439 * 10 ** a) ** 1.73184
         return Rs
 
+    @_memoriza('P', 'Pb', 'Rho_ob')
     def fase_oleo__compressibilidade_isotermica_oleo_standing_1974_P_maiorIgual_Pb__Co__(self):
         """
         :param P: Pressão, psia
@@ -403,6 +602,7 @@ class BlackOil(FatorZ):
         Co = 10 ** -6 * np.exp((Rho_ob + 0.004347 * (P - Pb) - 79.1) / (0.0007141 * (P - Pb) - 12.938))  # Co em 1/psia
         return Co
 
+    @_memoriza('P', 'Rs', 'API', 'dgn', 'T')
     def fase_oleo_compressibilidade_isotermica_oleo_vasques_e_beggs_1980_P_maiorIgual_Pb__Co__(self):
         """
         :param P: Pressão, psia
@@ -420,6 +620,7 @@ class BlackOil(FatorZ):
         Co = (-1433 + 5 * Rs + 17.2 * T - 1180 * dgn + 12.61 * API) / (10 ** 5 * P)  # Co em 1/psia
         return Co
 
+    @_memoriza('P', 'Rs', 'API', 'dg', 'T')
     def fase_oleo_ompressibilidade_isotermica_oleo_petrosky_e_farshad_1993_P_maiorIgual_Pb__Co__(self):
         """
         :param P: Pressão, psia
@@ -438,6 +639,7 @@ class BlackOil(FatorZ):
         Co = (1.705 * 10 ** -7) * (Rs ** 0.69357) * (dg ** 0.1885) * (API ** 0.3272) * (T ** 0.6729) * (P ** -0.5906)
         return Co
 
+    @_memoriza('Bo', 'Bg', 'Bob', 'Co', 'P', 'Pb', 'dg', 'API', 'T')
     def fase_oleo_compressiblidade_isotermica_oleo_P_menor_Pb__Co__(self):
         """
         Nota: Se dBo/dP < Bg * dRs/dP -> Co > 0.
@@ -470,6 +672,7 @@ class BlackOil(FatorZ):
         Co = (-1 / Bo) * dBo_dP + (Bg / Bo) * dRs_dP
         return Co
 
+    @_memoriza('P', 'Pb', 'Bob', 'Co')
     def fase_oleo_fator_volume_formacao_de_oleo_P_maior_Pb__Bo__(self):
         """
         Nota: pg 84, o que seria Bob, seria o fator volume formação de óleo na pressõa de bolha?
@@ -487,6 +690,7 @@ class BlackOil(FatorZ):
         Bo = Bob * np.exp(-Co * (P - Pb))
         return Bo
 
+    @_memoriza('Rs', 'dg', 'do', 'T')
     def fase_oleo_fator_volume_formacao_de_oleo_standing_1947_P_menorIgual_Pb__Bo__(self):
         """
         :param Rs: Razão de solubilidade Gás-Óleo, SCF/STB
@@ -503,6 +707,7 @@ class BlackOil(FatorZ):
         Bo = 0.9759 + 0.00012 * (Rs * (dg / do) ** 0.5 + 1.25 * T) ** 1.2  # Bo em bbl/STB
         return Bo
 
+    @_memoriza('API', 'Rs', 'dgn', 'T')
     def fase_oleo_ator_volume_formacao_de_oleo_vasquez_e_beggs_1980_P_menor_Pb__Bo__(self):
         """
         :param API: Grau API, adimensional
@@ -516,17 +721,14 @@ class BlackOil(FatorZ):
         dgn = self.dgn
         T = self.T
 
-        if API <= 30:
-            C1 = 4.677 * 10 ** -4
-            C2 = 1.751 * 10 ** -5
-            C3 = -1.811 * 10 ** -8
-        else:
-            C1 = 4.670 * 10 ** -4
-            C2 = 1.100 * 10 ** -5
-            C3 = 1.337 * 10 ** -9
+        pesado = API <= 30
+        C1 = np.where(pesado, 4.677 * 10 ** -4, 4.670 * 10 ** -4)
+        C2 = np.where(pesado, 1.751 * 10 ** -5, 1.100 * 10 ** -5)
+        C3 = np.where(pesado, -1.811 * 10 ** -8, 1.337 * 10 ** -9)
         Bo = 1 + C1 * Rs + (T - 520) * (API / dgn) * (C2 + C3 * Rs)
-        return Bo
+        return Bo[()]
 
+    @_memoriza('Rs', 'do', 'dg', 'T')
     def fase_oleo_fator_volume_formacao_de_oleo_glaso_1980_P_menor_Pb__Bo__Bob__(self):
         """
         Nota: Usando 45 amostras. Bob é um parâmetro de correção
@@ -546,6 +748,7 @@ class BlackOil(FatorZ):
         Bo = 1 + 10 ** a
         return Bo, Bob
 
+    @_memoriza('Rs', 'do', 'dg', 'T')
     def fase_oleo_fator_volume_formacao_de_oleo_na_pressao_de_bolha__Bob(self):
         """
         Nota: Usando 45 amostras. Bob é um parâmetro de correção
@@ -563,6 +766,7 @@ class BlackOil(FatorZ):
         Bob = Rs * (dg / do) ** 0.526 + 0.986 * T  # Bob é apenas um parâmetro e correlação
         return Bob
 
+    @_memoriza('Rs', 'dg', 'do', 'T')
     def fase_oleo_fator_volume_formacao_de_oleo_petrosky_e_farshad_1993_P_menor_Pb__Bo__(self):
         """
         :param Rs: Razão de solubilidade Gás-Óleo, SCF/STB
@@ -580,6 +784,7 @@ class BlackOil(FatorZ):
                     Rs ** 0.3738 * (dg ** 0.2914) / (do ** 0.6265) + 0.24626 * T ** 0.5371) ** 3.0936
         return Bo
 
+    @_memoriza('rho_o_sc', 'rho_g_sc', 'P', 'Pb', 'Co', 'Rho_ob', 'Bo', 'Rs', 'do', 'dg')
     def fase_oleo_massa_especifica_oleo__Rho_oleo__(self):
         """
         Nota: na página 96 não tinha alguma unidades, e na 97 nõa tenho certeza.
@@ -605,14 +810,12 @@ class BlackOil(FatorZ):
         do = self.do
         dg = self.dg
 
-        if P > Pb:
-            Rho_oleo = Rho_ob * np.exp(Co * (P - Pb))
-        elif P <= Pb:
-            Rho_oleo = (62.4 * do + 0.0136 * Rs * dg) / Bo  # lb/ft³
-        else:  # Para P<Pb
-            Rho_oleo = (rho_o_sc + Rs * rho_g_sc) / Bo
-        return Rho_oleo
+        # Os dois ramos são avaliados em todo o array e a máscara P > Pb escolhe o valor de cada nó
+        # (rho_o_sc e rho_g_sc ficam disponíveis para a forma alternativa (rho_o_sc + Rs * rho_g_sc) / Bo)
+        Rho_oleo = np.where(P > Pb, Rho_ob * np.exp(Co * (P - Pb)), (62.4 * do + 0.0136 * Rs * dg) / Bo)  # lb/ft³
+        return Rho_oleo[()]
 
+    @_memoriza('API', 'T')
     def fase_oleo_viscosidade_do_oleo_morto_beal_standing_1981__uo__(self):
         """
         :param API: Grau API, adimensional
@@ -626,6 +829,7 @@ class BlackOil(FatorZ):
         uod = 0.32 + ((1.8 * 10 ** 7) / (API ** 4.53)) * (360 / (T - 260)) ** A
         return uod
 
+    @_memoriza('API', 'T')
     def fase_oleo_viscosidade_do_oleo_morto_beggs_e_robinson_1975__uo__(self):
         """
         :param API: Grau API, adimensional
@@ -639,6 +843,7 @@ class BlackOil(FatorZ):
         uod = (10 ** (A * (T ** -1.163))) - 1
         return uod
 
+    @_memoriza('API', 'T')
     def fase_oleo_viscosidade_do_oleo_morto_bergman_2004__uod__(self):
         """
         Nota: O último logaritmo da fórmula é o logaritmo natural em python.
@@ -653,6 +858,7 @@ class BlackOil(FatorZ):
         uod = np.exp(X) - 1
         return uod
 
+    @_memoriza('Rs', 'uod')
     def fase_oleo_viscosidade_do_oleo_saturado_standing_1981_P_menorIgual_Pb__uob__(self):
         """
         :param Rs: Razão de solubilidade Gás-Óleo, SCF/STB
@@ -667,6 +873,7 @@ class BlackOil(FatorZ):
         uob = a * uod ** b
         return uob
 
+    @_memoriza('Rs', 'uod')
     def fase_oleo_viscosidade_do_oleo_saturado_beggs_e_robinson_1975_P_menorIgual_Pb__uob__(self):
         """
         :param Rs: Razão de solubilidade Gás-Óleo, SCF/STB
@@ -681,6 +888,7 @@ class BlackOil(FatorZ):
         uob = a * uod ** b
         return uob
 
+    @_memoriza('Rs', 'uod')
     def fase_oleo_viscosidade_do_oleo_saturado_bergman_1975_P_menorIgual_Pb__uob__(self):
         """
         :param Rs: Razão de solubilidade Gás-Óleo, SCF/STB
@@ -695,6 +903,7 @@ class BlackOil(FatorZ):
         uob = a * uod ** b
         return uob
 
+    @_memoriza('P', 'Pb', 'uob')
     def fase_oleo_viscosidade_do_oleo_sub_saturado_beal_standing_1981_P_maiorIgual_Pb__uo__(self):
         """
         :param P: Pressão, psi
@@ -709,6 +918,7 @@ class BlackOil(FatorZ):
         uo = uob + (0.001 * (P - Pb)) * (0.024 * uob ** 1.6 + 0.038 * uob ** 0.56)
         return uo
 
+    @_memoriza('P', 'Pb', 'uob')
     def fase_oleo_viscosidade_do_oleo_sub_saturado_beggs_e_robinson_1975_P_maiorIgual_Pb__uo__(self):
         """
         :param P: Pressão, psi
@@ -724,6 +934,7 @@ class BlackOil(FatorZ):
         uo = uob * (P / Pb) ** m
         return uo
 
+    @_memoriza('P', 'Pb', 'uob')
     def fase_oleo_viscosidade_do_oleo_sub_saturado_bergman_2004_P_maiorIgual_Pb__uo__(self):
         """
         :param P: Pressão, psi
@@ -740,6 +951,7 @@ class BlackOil(FatorZ):
         uo = uob * np.exp(alpha * (P - Pb) ** betha)
         return uo
 
+    @_memoriza('P', 'Mg', 'Z', 'R', 'T')
     def fase_gas_massa_especifica_gas__rho_g__(self):
         """
         :param P: Pressão, Pa
@@ -758,6 +970,7 @@ class BlackOil(FatorZ):
         rho_g = (P*Mg)/(Z*R*T)
         return rho_g
 
+    @_memoriza('dg', 'Mar')
     def fase_gas_massa_do_gas__Mg__(self):
         """
         Nota: Mar = 28.96 lb/lbmol
@@ -772,6 +985,7 @@ class BlackOil(FatorZ):
         Mg = Mar * dg
         return Mg
 
+    @_memoriza('dgas', 'dar')
     def fase_gas_densidade_relativa_do_gas__dg__(self):
         """
         Nota: Pressão na condição padrão: Pa, Temperatura na condição padrão: K
@@ -788,22 +1002,21 @@ class BlackOil(FatorZ):
         dg = dgas / dar
         return dg
 
+    @_memoriza('dg', 'P', 'T')
     def fase_gas_pressao_temperatura_pseudocritica__Ppr__Tpr__Ppc__Tpc__(self):
         dg = self.dg
         P = self.P
         T = self.T
-        if dg < 0.75:  # gás seco
-            Ppc = (677 + 15 * dg - 37.5 * dg ** 2)
-            Tpc = (168 + 325 * dg - 12.5 * dg ** 2)
-        else:  # gás úmido
-            Ppc = (706 - 51.7 * dg - 11.1 * dg ** 2)
-            Tpc = (187 + 330 * dg - 71.5 * dg ** 2)
+        seco = dg < 0.75  # gás seco; caso contrário, gás úmido
+        Ppc = np.where(seco, 677 + 15 * dg - 37.5 * dg ** 2, 706 - 51.7 * dg - 11.1 * dg ** 2)[()]
+        Tpc = np.where(seco, 168 + 325 * dg - 12.5 * dg ** 2, 187 + 330 * dg - 71.5 * dg ** 2)[()]
 
         Ppr = P/Ppc
         Tpr = T/Tpc
 
         return Ppr, Tpr, Ppc, Tpc
 
+    @_memoriza('P', 'Z', 'T', 'Psc', 'Tsc')
     def fase_gas_fator_volume_formacao_de_gas__Bg__(self):
         """
         :param P: Pressão, mesma unidade de Psc
@@ -822,6 +1035,7 @@ class BlackOil(FatorZ):
         Bg = (Psc / Tsc) * ((Z * T) / P)
         return Bg
 
+    @_memoriza('Z', 'Tpr', 'Ppr', 'Ppc')
     def fase_gas_compressibilidade_isotermica_do_gas__Cg__(self):
         """
         Nota: dZ_dPpr foi obtido a partir da derivada manual da Correlação de Papay
@@ -841,6 +1055,7 @@ class BlackOil(FatorZ):
         Cg = Cpr/Ppc
         return Cg
 
+    @_memoriza('dg', 'T', 'Yn2', 'Yco2', 'Yh2s')
     def fase_gas_viscosidade_do_gas_dempsey_1965__ug__(self):
         """
         Nota: UG, viscosidade do gás não corrigida, cP. Na página 48, será que a correlação está incompleta?
@@ -851,19 +1066,9 @@ class BlackOil(FatorZ):
         :param Yh2s: Fração molar do componente
         :return: Viscosidade do gás na condição de pressão atmosférica, cP
         """
-        dg = self.dg
-        T = self.T
-        Yn2 = self.Yn2
-        Yco2 = self.Yco2
-        Yh2s = self.Yh2s
-
-        UG = (1.709 * 10 ** -5 - 2.062 * 10 ** -6 * dg) * T + 8.188 * 10 ** -3 - 6.15 * 10 ** -3 * np.log10(dg)
-        delta_ug_n2 = Yn2 * (8.43 * 10 ** -3 * np.log10(dg) + 9.59 * 10 ** -3)
-        delta_ug_co2 = Yco2 * (9.08 * 10 ** -3 * np.log10(dg) + 6.24 * 10 ** -3)
-        delta_ug_h2s = Yh2s * (8.49 * 10 ** -3 * np.log10(dg) + 3.73 * 10 ** -3)
-        ug = UG + delta_ug_n2 + delta_ug_co2 + delta_ug_h2s
-        return ug
+        return ClassesViscosidadeGas.viscosidade_dempsey(self.dg, self.T, self.Yn2, self.Yco2, self.Yh2s)
 
+    @_memoriza('Mg', 'rho_g', 'T')
     def fase_gas_viscosidade_do_gas_lee__ug__(self):
         """
         :param Mg: Peso molecular do gás, lbm/(lb mol)
@@ -871,127 +1076,222 @@ class BlackOil(FatorZ):
         :param T: Tempeeratura, °R
         :return: Viscosidade do gás, cP
         """
-        Mg = self.Mg
-        rho_g = self.rho_g
-        T = self.T
+        fatores = self._fatores_viscosidade_lee()
+        return ClassesViscosidadeGas.viscosidade_lee(fatores, self.rho_g)
 
-        xv = 3.448 + (986.4 / T) + 0.01009 * Mg
-        yv = 2.4 - 0.2 * xv
-        kv = ((9.379 + 0.0160 * Mg) * T ** 1.5) / (209.2 + 19.26 * Mg + T)
-        ug = (10 ** -4) * kv * np.exp(xv * (rho_g / 62.4) ** yv)
-        return ug
+    @_memoriza('Mg', 'T')
+    def _fatores_viscosidade_lee(self):
+        # kv, xv e yv não dependem da pressão: uma vez por fluido e temperatura
+        return ClassesViscosidadeGas.fatores_lee(self.Mg, self.T)
 
+    @_memoriza('Mg', 'rho_g', 'Tpr', 'Tpc', 'Ppc', 'T')
     def fase_gas_viscosidade_do_gas_sutton_2007__ug__(self):
         """
-        :param Mg: Peso molecular, g/(g mol)
-        :param dgas: Densidade do gás, g/cm³
+        Nota: a correlação usa a massa específica in situ em g/cm³ (antes lia dgas, a massa específica na condição
+        padrão); rho_g é lido em lb/ft³, como nas demais propriedades do gás, e convertido.
+        :param Mg: Peso molecular, lb/lbmol
+        :param rho_g: Massa específica do gás in situ, lb/ft³
         :param Tpr: Temperatura pseudoreduzida, adimensional
-        :param Tpc: Temperatura pseudocrítica, adimensional
-        :param Ppc: Pressão pseudocrítica, adimensional
+        :param Tpc: Temperatura pseudocrítica, °R
+        :param Ppc: Pressão pseudocrítica, psia
         :param T: Temperatura, °R
         :return: Viscosidade do gás, cP
         """
-        Mg = self.Mg
-        dgas = self.dgas   # Acho que aqui é rho_g
-        Tpr = self.Tpr
-        Tpc = self.Tpc
-        Ppc = self.Ppc
-        T = self.T
+        fatores = self._fatores_viscosidade_sutton()
+        return ClassesViscosidadeGas.viscosidade_sutton(fatores, self.rho_g)
+
+    @_memoriza('Mg', 'Tpr', 'Tpc', 'Ppc', 'T')
+    def _fatores_viscosidade_sutton(self):
+        # X, Y e K não dependem da pressão: uma vez por fluido e temperatura
+        return ClassesViscosidadeGas.fatores_sutton(self.Mg, self.T, self.Tpr, self.Tpc, self.Ppc)
+
+
+class EstadoBlackOil(BlackOil):
+    """
+    Nota: estado compacto para varreduras grandes. Todos os atributos numéricos do BlackOil (CAMPOS) moram em um único
+    array float64 (len(CAMPOS), n_nos): um registro por nó e uma linha contígua por propriedade. As correlações leem
+    e escrevem direto nessas linhas (PVT.P é uma visão, PVT.Bo = ... grava no array), então o custo por nó é
+    8 bytes × len(CAMPOS) e a entrega para pandas/Arrow é sem cópia.
+    """
+    __slots__ = ('dados',)
+    CAMPOS = ('Rho_oleo', 'P', 'dgn', 'API', 'do', 'Rs', 'Rsb', 'dg', 'T', 'Tsep', 'Psep', 'Pb', 'Bo', 'Bg', 'Bob', 'Co',
+              'uob', 'uod', 'uo', 'rho_o_sc', 'rho_g_sc', 'Rho_ob', 'n', 'Z', 'Tpr', 'Tpc', 'Ppr', 'Ppc', 'Mar', 'Mg',
+              'dgas', 'dar', 'Psc', 'Tsc', 'Yn2', 'Yco2', 'Yh2s', 'R', 'rho_g', 'ug', 'Cg')
+
+    def __init__(self, n_nos, **atributos):
+        """
+        :param n_nos: Número de nós (pressões) do estado
+        :param atributos: Valores iniciais, como em BlackOil(); escalares são repetidos em todos os nós
+        """
+        self.dados = np.zeros((len(self.CAMPOS), n_nos))
+        super().__init__(**atributos)
+
+    def para_dataframe(self):
+        """
+        :return: pandas.DataFrame (um nó por linha) que compartilha a memória do estado
+        """
+        import pandas as pd
+
+        return pd.DataFrame(self.dados.T, columns=list(self.CAMPOS), copy=False)
+
+    def para_arrow(self):
+        """
+        :return: pyarrow.Table com uma coluna por propriedade, sem cópia
+        """
+        import pyarrow as pa
+
+        return pa.table({campo: self.dados[i] for i, campo in enumerate(self.CAMPOS)})
+
 
-        X = 3.47 + (1588 / T) + 0.0009 * Mg
-        Y = 1.66378 - 0.04679 * X
-        A = X * dgas ** Y
-        K = (0.807 * Tpr ** 0.618 - 0.357 * np.exp(-0.449 * Tpr) + 0.34 * np.exp(-4.058 * Tpr) + 0.018) / \
-            (0.9490 * (Tpc / (Mg ** 3 * Ppc ** 4)) ** (1 / 6))
-        ug = 10 ** -4 * K * np.exp(A)
-        return ug
+def _coluna_do_estado(indice):
+    def le(self):
+        return self.dados[indice]
+
+    def escreve(self, valor):
+        self.dados[indice] = valor
+
+    return property(le, escreve)
+
+
+for _indice, _campo in enumerate(EstadoBlackOil.CAMPOS):
+    setattr(EstadoBlackOil, _campo, _coluna_do_estado(_indice))
+
+
+"""------------------------------------------------------------------------------------------------------------------"""
+"Def's numéricos"
+
+
+def _newton_vetorizado(F, dF, x0, parametros, lim_inf=-np.inf, lim_sup=np.inf, Parad=10 ** -11, maxit=100):
+    """
+    Nota: cada elemento tem sua própria máscara de convergência; só os elementos ainda ativos são avaliados a cada
+    iteração. Um passo que sai do intervalo (lim_inf, lim_sup) é trocado pela metade do caminho até o limite.
+    :param F: Função objetivo F(x, *parametros)
+    :param dF: Derivada analítica dF/dx(x, *parametros)
+    :param x0: Chute inicial (escalar ou array)
+    :param parametros: Tupla de arrays com os parâmetros de F, com broadcast contra x0
+    :param Parad: Critério de parada, variação relativa em %
+    :param maxit: Número máximo de iterações
+    :return: raiz, número de iterações de cada elemento, máscara de convergência
+    """
+    if any(hasattr(p, 'derivadas') for p in parametros):
+        # Parâmetros duais (ClassesDerivadas.NumeroDual): a iteração usa só os valores e um passo de Newton a partir
+        # da raiz, com os parâmetros duais, carrega dx/dparâmetro = -(dF/dparâmetro) / (dF/dx)
+        valores = [getattr(p, 'valor', p) for p in parametros]
+        x, iteracoes, convergido = _newton_vetorizado(F, dF, getattr(x0, 'valor', x0), valores, lim_inf, lim_sup,
+                                                      Parad, maxit)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x = x - F(x, *parametros) / dF(x, *valores)
+        return x, iteracoes, convergido
+
+    inicio = time.perf_counter()
+    forma = np.broadcast(x0, *parametros).shape
+    x = np.array(np.broadcast_to(x0, forma), dtype=float)
+    parametros = [np.broadcast_to(p, forma) for p in parametros]
+    iteracoes = np.zeros(forma, dtype=int)
+    ativo = np.ones(forma, dtype=bool)
+
+    for _ in range(maxit):
+        if not ativo.any():
+            break
+        xold = x[ativo]
+        p = [p[ativo] for p in parametros]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            xnew = xold - F(xold, *p) / dF(xold, *p)
+        xnew = np.where(xnew <= lim_inf, (xold + lim_inf) / 2, xnew)
+        xnew = np.where(xnew >= lim_sup, (xold + lim_sup) / 2, xnew)
+        x[ativo] = xnew
+        iteracoes[ativo] += 1
+        ativo[ativo] = ~(np.abs(xold - xnew) * 100 <= Parad * np.abs(xnew))
+    if ClassesInstrumentacao.ATIVA is not None:
+        ClassesInstrumentacao.ATIVA.registra_raiz('_newton_vetorizado', inicio, iteracoes, ~ativo)
+    return x, iteracoes, ~ativo
+
+
+def _raiz_intervalo_vetorizada(F, a, b, parametros, Parad=10 ** -11, maxit=200):
+    """
+    Nota: método de Illinois (regula falsi modificada), com uma máscara de convergência por elemento como em
+    _newton_vetorizado. O intervalo [a, b] de cada elemento precisa conter uma troca de sinal de F; os elementos sem
+    troca de sinal não são iterados, ficam NaN e saem como não convergidos.
+    :param F: Função objetivo F(x, *parametros)
+    :param a: Limite inferior do intervalo (escalar ou array)
+    :param b: Limite superior do intervalo (escalar ou array)
+    :param parametros: Tupla de arrays com os parâmetros de F, com broadcast contra a e b
+    :param Parad: Critério de parada, largura relativa do intervalo em %
+    :param maxit: Número máximo de iterações
+    :return: raiz, número de iterações de cada elemento, máscara de convergência
+    """
+    inicio = time.perf_counter()
+    forma = np.broadcast(a, b, *parametros).shape
+    a = np.array(np.broadcast_to(a, forma), dtype=float)
+    b = np.array(np.broadcast_to(b, forma), dtype=float)
+    parametros = [np.broadcast_to(p, forma) for p in parametros]
+    with np.errstate(all='ignore'):
+        fa = np.array(np.broadcast_to(F(a, *parametros), forma), dtype=float)
+        fb = np.array(np.broadcast_to(F(b, *parametros), forma), dtype=float)
+    x = np.where(fa == 0, a, np.where(fb == 0, b, np.nan))
+    convergido = ~np.isnan(x)
+    ativo = fa * fb < 0
+    iteracoes = np.zeros(forma, dtype=int)
+
+    for _ in range(maxit):
+        if not ativo.any():
+            break
+        ai, bi, fai, fbi = a[ativo], b[ativo], fa[ativo], fb[ativo]
+        p = [p[ativo] for p in parametros]
+        with np.errstate(all='ignore'):
+            c = bi - fbi * (bi - ai) / (fbi - fai)
+            fc = F(c, *p)
+        troca = fc * fbi < 0  # raiz entre b e c: b vira o novo a; senão a fica e f(a) cai pela metade (Illinois)
+        a[ativo] = np.where(troca, bi, ai)
+        fa[ativo] = np.where(troca, fbi, fai / 2)
+        b[ativo], fb[ativo] = c, fc
+        x[ativo] = c
+        iteracoes[ativo] += 1
+        parou = (np.abs(b[ativo] - a[ativo]) * 100 <= Parad * np.abs(c)) | (fc == 0)
+        convergido[ativo] = parou
+        ativo[ativo] = ~parou
+    if ClassesInstrumentacao.ATIVA is not None:
+        ClassesInstrumentacao.ATIVA.registra_raiz('_raiz_intervalo_vetorizada', inicio, iteracoes, convergido)
+    return x, iteracoes, convergido
 
 
 """------------------------------------------------------------------------------------------------------------------"""
 "Def's para converter"
 
 
-def converte_T_para_R(*args):  # inserir a temperatura com a unidade dentro de uma string. Converte para Rankine
-    T = list(args)
+def _converte_legado(args, para):
+    """
+    Nota: mantém a interface antiga (valor, 'unidade'), agora sobre a tabela de ClassesUnidades; aceita arrays inteiros
+    e strings numéricas.
+    :param args: (valor, unidade)
+    :param para: Unidade de destino
+    """
+    valor, unidade = args
+    if isinstance(valor, str):
+        valor = float(valor)
+    return ClassesUnidades.converte(valor, unidade, para)
 
-    if T[1].upper() == "C":
-        T = float(T[0]) * 9 / 5 + 491.67
-    elif T[1].upper() == "R":
-        T = float(T[0])
-    elif T[1].upper() == "F":
-        T = (float(T[0]) + 459.67)
-    elif T[1].upper() == "K":
-        T = float(T[0]) * 1.8
-    return T
 
+@ClassesInstrumentacao.instrumentada('conversao')
+def converte_T_para_R(*args):  # inserir a temperatura com a unidade dentro de uma string. Converte para Rankine
+    return _converte_legado(args, '°R')
 
-def converte_T_para_F(*args):  # inserir a temperatura com a unidade dentro de uma string. Converter para Fahrenheit
-    T = list(args)
 
-    if T[1].upper() == "C":
-        T = float(T[0]) * 1.8 + 32
-    elif T[1].upper() == "R":
-        T = float(T[0]) - 459.67
-    elif T[1].upper() == "F":
-        T = float(T[0])
-    elif T[1].upper() == "K":
-        T = (float(T[0]) - 273.15) * 1.8 - 32
-    return T
+@ClassesInstrumentacao.instrumentada('conversao')
+def converte_T_para_F(*args):  # inserir a temperatura com a unidade dentro de uma string. Converter para Fahrenheit
+    return _converte_legado(args, '°F')
 
 
+@ClassesInstrumentacao.instrumentada('conversao')
 def converte_T_para_K(*args):  # inserir a temperatura com a unidade dentro de uma string. Converter para Kelvin
-    T = list(args)
-
-    if T[1].upper() == "C":
-        T = float(T[0]) + 273.15
-    elif T[1].upper() == "R":
-        T = float(T[0]) * 0.556
-    elif T[1].upper() == "F":
-        T = (float(T[0]) - 32)/1.8 + 273.15
-    elif T[1].upper() == "K":
-        T = float(T[0])
-    return T
-
-
-def converte_P_para_Psi(*args):  # inserir a temperatura com a unidade dentro de uma string. Converter para Psi
-    P = list(args)
-
-    if P[1] == "BAR":
-        P = float(P[0]) * 14.514
-    elif P[1].upper() == "PA":
-        P = float(P[0]) / 6895
-    elif P[1].upper() == "ATM":
-        P = float(P[0]) * 14.696
-    elif P[1].upper() == "TORR":
-        P = float(P[0]) / 51.715
-    elif P[1].upper() == "MMHG":
-        P = float(P[0]) / 51.715
-    elif P[1].upper() == "KGF/CM2":
-        P = float(P[0]) * 14.223
-    elif P[1].upper() == "KGF/IN2":
-        P = float(P[0]) * 2.205
-    elif P[1].upper() == "PSI":
-        P = float(P[0])
-    return P
-
-
-def converte_P_para_Pa(*args):
-    P = list(args)
-
-    if P[1] == "BAR":
-        P = float(P[0]) * 100000
-    elif P[1].upper() == "PA":
-        P = float(P[0])
-    elif P[1].upper() == "ATM":
-        P = float(P[0]) * 101325
-    elif P[1].upper() == "TORR":
-        P = float(P[0]) * 133.322
-    elif P[1].upper() == "MMHG":
-        P = float(P[0]) * 133.32
-    elif P[1].upper() == "KGF/CM2":
-        P = float(P[0]) * 98066.5
-    elif P[1].upper() == "KGF/IN2":
-        P = float(P[0]) * 6894759.09
-    elif P[1].upper() == "PSI":
-        P = float(P[0]) * 6894.76
-    return P
+    return _converte_legado(args, 'K')
+
+
+@ClassesInstrumentacao.instrumentada('conversao')
+def converte_P_para_Psi(*args):  # inserir a pressão com a unidade dentro de uma string. Converter para Psi
+    return _converte_legado(args, 'psia')
+
+
+@ClassesInstrumentacao.instrumentada('conversao')
+def converte_P_para_Pa(*args):  # inserir a pressão com a unidade dentro de uma string. Converter para Pa
+    return _converte_legado(args, 'Pa')
@@ -0,0 +1,152 @@
+"""
+Cache em disco das tabelas PVT, endereçado pelo conteúdo: fluido, correlações e malha de pressões.
+
+A chave é o resumo (BLAKE2b) das entradas do fluido já convertidas para as unidades de UNIDADES_DO_FLUIDO, das
+correlações escolhidas, das saídas pedidas, da malha de pressões e de VERSAO_CACHE, então o mesmo pedido tem a mesma
+chave em qualquer processo e em qualquer execução, seja qual for a forma em que as entradas chegaram (dict, DataFrame,
+listas, Grandeza). Cada tabela é um .npy, aberto com np.load(mmap_mode='r'): repetir um pedido custa abrir e mapear
+um arquivo, sem recalcular nada. O diretório tem tamanho máximo; ao passar dele, saem as tabelas usadas há mais
+tempo (a data de modificação do arquivo é atualizada a cada acerto, então vale entre processos).
+"""
+
+import hashlib
+import json
+import os
+import uuid
+
+import numpy as np
+from ClassesInstrumentacao import etapa
+from ClassesRegistroCorrelacoes import REGISTRO_CORRELACOES
+from ClassesTabelaPVT import ENTRADAS_DO_FLUIDO, SAIDAS_TABELA_PVT, _coluna_do_fluido, gera_tabela_pvt_black_oil
+from ClassesUnidades import valor_em
+
+
+VERSAO_CACHE = 1  # aumentar quando uma correlação mudar, para não reaproveitar tabelas antigas
+DIRETORIO_PADRAO = os.environ.get('CACHE_PVT', os.path.join(os.path.expanduser('~'), '.cache', 'termodinamica_pvt'))
+
+
+def chave_da_tabela(fluidos, P, saidas=SAIDAS_TABELA_PVT, correlacoes=None):
+    """
+    :param fluidos: Mesmas entradas de gera_tabela_pvt_black_oil
+    :param P: Malha de pressões, psia (ou Grandeza)
+    :param saidas: Saídas pedidas
+    :param correlacoes: dict {propriedade: nome no REGISTRO_CORRELACOES}; entra na chave a impressão de cada
+    correlação, então uma correlação registrada de novo com o mesmo nome (ex.: ajustada a outros dados) muda a chave
+    :return: Chave hexadecimal (32 caracteres) da tabela
+    """
+    escolhas = sorted((propriedade, nome, REGISTRO_CORRELACOES.busca(propriedade, nome).impressao)
+                      for propriedade, nome in (correlacoes or {}).items())
+    resumo = hashlib.blake2b(digest_size=16)
+    resumo.update(json.dumps({'versao': VERSAO_CACHE, 'saidas': list(saidas), 'correlacoes': escolhas}).encode())
+    arrays = [(chave, _coluna_do_fluido(fluidos, chave)) for chave in ENTRADAS_DO_FLUIDO if chave in fluidos]
+    arrays.append(('P', np.atleast_2d(np.asarray(valor_em(P, 'psia'), dtype=float))))
+    for nome, valor in arrays:
+        valor = np.ascontiguousarray(valor, dtype=float)
+        resumo.update(f'{nome}{valor.shape}'.encode())
+        resumo.update(valor.data)
+    return resumo.hexdigest()
+
+
+class CacheTabelasPVT:
+    def __init__(self, diretorio=DIRETORIO_PADRAO, tamanho_maximo=2 ** 30):
+        """
+        :param diretorio: Diretório das tabelas (criado se não existir); pode ser compartilhado entre processos
+        :param tamanho_maximo: Tamanho máximo do diretório, bytes
+        """
+        self.diretorio = diretorio
+        self.tamanho_maximo = tamanho_maximo
+        self.acertos = 0
+        self.falhas = 0
+        os.makedirs(diretorio, exist_ok=True)
+
+    def _arquivo(self, chave):
+        return os.path.join(self.diretorio, chave + '.npy')
+
+    def busca(self, chave):
+        """
+        :return: Tabela mapeada em memória (somente leitura) ou None
+        """
+        arquivo = self._arquivo(chave)
+        try:
+            tabela = np.load(arquivo, mmap_mode='r')
+            os.utime(arquivo)  # marca o uso recente para o LRU
+        except (FileNotFoundError, ValueError):  # ausente, ou removida por outro processo no meio da leitura
+            self.falhas += 1
+            return None
+        self.acertos += 1
+        return tabela
+
+    def guarda(self, chave, tabela):
+        """
+        Nota: escreve em um arquivo temporário e o renomeia, então outro processo nunca lê uma tabela pela metade.
+        :return: A tabela guardada, mapeada em memória
+        """
+        arquivo = self._arquivo(chave)
+        temporario = os.path.join(self.diretorio, f'.{chave}.{uuid.uuid4().hex}.tmp')
+        with open(temporario, 'wb') as saida:
+            np.save(saida, np.ascontiguousarray(tabela))
+        os.replace(temporario, arquivo)
+        self.remove_excedente(manter=chave)
+        return np.load(arquivo, mmap_mode='r')
+
+    def arquivos(self):
+        """
+        :return: Lista (data de uso, tamanho em bytes, caminho) das tabelas, da usada há mais tempo para a mais recente
+        """
+        arquivos = []
+        with os.scandir(self.diretorio) as entradas:
+            for entrada in entradas:
+                if entrada.name.endswith('.npy'):
+                    try:
+                        estado = entrada.stat()
+                    except FileNotFoundError:
+                        continue
+                    arquivos.append((estado.st_mtime, estado.st_size, entrada.path))
+        return sorted(arquivos)
+
+    def tamanho(self):
+        """
+        :return: Tamanho total das tabelas guardadas, bytes
+        """
+        return sum(tamanho for _, tamanho, _ in self.arquivos())
+
+    def remove_excedente(self, manter=None):
+        """
+        :param manter: Chave que não deve ser removida (a tabela que acabou de ser guardada)
+        """
+        arquivos = self.arquivos()
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, arquivo in arquivos:
+            if total <= self.tamanho_maximo:
+                break
+            if manter is not None and arquivo == self._arquivo(manter):
+                continue
+            try:
+                os.remove(arquivo)
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+
+    def limpa(self):
+        for _, _, arquivo in self.arquivos():
+            try:
+                os.remove(arquivo)
+            except FileNotFoundError:
+                pass
+        self.acertos = 0
+        self.falhas = 0
+
+    def gera_tabela_pvt_black_oil(self, fluidos, P, saidas=SAIDAS_TABELA_PVT, correlacoes=None):
+        """
+        Nota: mesmos argumentos e mesmo resultado de gera_tabela_pvt_black_oil, mas o array devolvido é somente
+        leitura (mapeado do arquivo); use np.array(...) para ter uma cópia alterável.
+        :return: Array (n_fluidos, n_pressões, len(saidas))
+        """
+        chave = chave_da_tabela(fluidos, P, saidas, correlacoes)
+        with etapa('busca_cache_disco'):
+            tabela = self.busca(chave)
+        if tabela is not None:
+            return tabela
+        tabela = gera_tabela_pvt_black_oil(fluidos, P, saidas, correlacoes)
+        with etapa('guarda_cache_disco'):
+            return self.guarda(chave, tabela)
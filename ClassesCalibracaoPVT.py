@@ -0,0 +1,347 @@
+"""
+Calibração das correlações Black-Oil contra dados PVT de laboratório, por mínimos quadrados não lineares em lote.
+
+Cada ModeloCalibravel reescreve uma correlação de BlackOil com os coeficientes da literatura como parâmetros (ex.:
+18.2, 1.4 e 0.83 de Standing; 10.715, 0.515, 5.44 e 0.338 de Beggs e Robinson) e devolve, junto com o valor, o
+jacobiano analítico em relação a eles. calibra() ajusta os coeficientes pelo método de Levenberg-Marquardt sobre o
+erro relativo, com todos os grupos (ex.: campos) ao mesmo tempo: resíduos e jacobianos de todas as amostras saem de
+uma avaliação vetorizada, J^T J e J^T r de cada grupo saem de somas por trecho e os passos de todos os grupos de um
+único np.linalg.solve em lote. O resultado vira uma Correlacao por grupo, registrada no REGISTRO_CORRELACOES e
+pronta para o argumento correlacoes de gera_tabela_pvt_black_oil.
+"""
+
+import hashlib
+
+import numpy as np
+from ClassesDerivadas import NumeroDual
+from ClassesInstrumentacao import etapa
+from ClassesRegistroCorrelacoes import Correlacao, REGISTRO_CORRELACOES
+from ClassesUnidades import valor_em
+
+
+_LN10 = np.log(10)
+
+
+class ModeloCalibravel:
+    def __init__(self, propriedade, nome, funcao, coeficientes, nomes_coeficientes, derivadas=None):
+        """
+        :param propriedade: Propriedade calculada (ex.: 'Pb', 'Rs', 'uob')
+        :param nome: Nome da correlação de origem no REGISTRO_CORRELACOES; as entradas, as unidades e a faixa
+        vêm dela
+        :param funcao: f(c, valores, jacobiano) -> (propriedade, jacobiano (..., n_coeficientes) ou None), com
+        c[..., i] o i-ésimo coeficiente
+        :param coeficientes: Coeficientes da literatura (ponto de partida do ajuste)
+        :param nomes_coeficientes: Nome de cada coeficiente, para relatório
+        :param derivadas: dict {atributo: f(c, valores)} com a derivada analítica da propriedade em relação à
+        entrada (ex.: dRs/dP, usada por Co abaixo de Pb); as outras vêm de números duais
+        """
+        self.propriedade = propriedade
+        self.nome = nome
+        self.funcao = funcao
+        self.coeficientes = np.asarray(coeficientes, dtype=float)
+        self.nomes_coeficientes = tuple(nomes_coeficientes)
+        self.derivadas = dict(derivadas or {})
+        origem = REGISTRO_CORRELACOES.busca(propriedade, nome)
+        self.entradas = origem.entradas
+        self.unidade = origem.unidade
+
+    def avalia(self, coeficientes, jacobiano=False, **valores):
+        """
+        :param coeficientes: Array (n_coeficientes,) ou (n_amostras, n_coeficientes), alinhado com as entradas
+        :param jacobiano: Se True, devolve também d(propriedade)/d(coeficientes)
+        :param valores: Entradas da correlação, nas unidades de self.entradas (ou Grandeza)
+        :return: propriedade, ou (propriedade, jacobiano (..., n_coeficientes))
+        """
+        valor, J = self.funcao(np.asarray(coeficientes, dtype=float), self._valores(valores), jacobiano)
+        return (valor, J) if jacobiano else valor
+
+    def derivada(self, coeficientes, atributo, **valores):
+        """
+        :param coeficientes: Array (n_coeficientes,) ou (n_amostras, n_coeficientes)
+        :param atributo: Entrada com derivada analítica em self.derivadas (ex.: 'P')
+        :param valores: Entradas da correlação, como em avalia
+        :return: d(propriedade)/d(atributo)
+        """
+        return self.derivadas[atributo](np.asarray(coeficientes, dtype=float), self._valores(valores))
+
+    def _valores(self, valores):
+        # números duais passam direto, para as derivadas da tabela em relação a P e T
+        valores = {atributo: valor_em(valores[atributo], unidade) for atributo, unidade in self.entradas.items()}
+        return {atributo: valor if isinstance(valor, NumeroDual) else np.asarray(valor, dtype=float)
+                for atributo, valor in valores.items()}
+
+    def correlacao(self, coeficientes, nome, faixas=None):
+        """
+        :param coeficientes: Coeficientes ajustados (n_coeficientes,)
+        :param nome: Nome da correlação ajustada no registro (ex.: 'standing_campo_A')
+        :param faixas: dict {atributo: (mínimo, máximo)} dos dados do ajuste
+        :return: Correlacao com os coeficientes fixados, avaliada pela mesma função do ajuste; as derivadas
+        analíticas em relação às entradas também usam os coeficientes ajustados
+        """
+        coeficientes = np.array(coeficientes, dtype=float)
+        resumo = hashlib.blake2b(coeficientes.tobytes(), digest_size=16).hexdigest()
+
+        def avalia(**valores):
+            return self.avalia(coeficientes, **valores)
+
+        def derivada(atributo):
+            return lambda **valores: self.derivada(coeficientes, atributo, **valores)
+        return Correlacao(self.propriedade, nome, avalia, self.entradas, self.unidade, faixas,
+                          impressao=f'ajustada|{self.propriedade}|{self.nome}|{resumo}',
+                          derivadas={atributo: derivada(atributo) for atributo in self.derivadas})
+
+
+def _empilha(*derivadas):
+    return np.stack(np.broadcast_arrays(*derivadas), axis=-1)
+
+
+def _pb_standing(c, v, jacobiano):
+    # Pb = c0 * ((Rs / dg) ^ c2 * 10 ^ (0.00091 T - 0.0125 API) - c1)
+    c0, c1, c2 = c[..., 0], c[..., 1], c[..., 2]
+    razao = v['Rs'] / v['dg']
+    termo = razao ** c2 * 10 ** (0.00091 * v['T'] - 0.0125 * v['API'])
+    Pb = c0 * (termo - c1)
+    if not jacobiano:
+        return Pb, None
+    return Pb, _empilha(termo - c1, -c0, c0 * termo * np.log(razao))
+
+
+def _rs_standing(c, v, jacobiano):
+    # Rs = dg * ((P / c0 + c1) * 10 ^ (0.0125 API - 0.00091 T)) ^ (1 / c2)
+    c0, c1, c2 = c[..., 0], c[..., 1], c[..., 2]
+    potencia = 10 ** (0.0125 * v['API'] - 0.00091 * v['T'])
+    u = (v['P'] / c0 + c1) * potencia
+    Rs = v['dg'] * u ** (1 / c2)
+    if not jacobiano:
+        return Rs, None
+    dRs_du = Rs / (c2 * u)
+    return Rs, _empilha(-dRs_du * potencia * v['P'] / c0 ** 2, dRs_du * potencia, -Rs * np.log(u) / c2 ** 2)
+
+
+def _drs_dp_standing(c, v):
+    # dRs/dP = Rs / (c2 u) * 10 ^ (0.0125 API - 0.00091 T) / c0, com u = (P / c0 + c1) * 10 ^ (...)
+    c0, c1, c2 = c[..., 0], c[..., 1], c[..., 2]
+    potencia = 10 ** (0.0125 * v['API'] - 0.00091 * v['T'])
+    u = (v['P'] / c0 + c1) * potencia
+    return v['dg'] * u ** (1 / c2) / (c2 * u) * potencia / c0
+
+
+def _bo_standing(c, v, jacobiano):
+    # Bo = c0 + c1 * (Rs (dg / do) ^ 0.5 + 1.25 T) ^ c2
+    c0, c1, c2 = c[..., 0], c[..., 1], c[..., 2]
+    F = v['Rs'] * (v['dg'] / v['do']) ** 0.5 + 1.25 * v['T']
+    potencia = F ** c2
+    Bo = c0 + c1 * potencia
+    if not jacobiano:
+        return Bo, None
+    return Bo, _empilha(np.ones_like(Bo), potencia, c1 * potencia * np.log(F))
+
+
+def _uod_beggs_e_robinson(c, v, jacobiano):
+    # uod = 10 ^ (10 ^ (c0 - c1 API) * T ^ -c2) - 1
+    c0, c1, c2 = c[..., 0], c[..., 1], c[..., 2]
+    y = 10 ** (c0 - c1 * v['API']) * v['T'] ** -c2
+    potencia = 10 ** y
+    uod = potencia - 1
+    if not jacobiano:
+        return uod, None
+    duod_dy = _LN10 * potencia
+    return uod, _empilha(duod_dy * y * _LN10, -duod_dy * y * _LN10 * v['API'], -duod_dy * y * np.log(v['T']))
+
+
+def _uob_beggs_e_robinson(c, v, jacobiano):
+    # uob = c0 (Rs + 100) ^ -c1 * uod ^ (c2 (Rs + 150) ^ -c3)
+    c0, c1, c2, c3 = c[..., 0], c[..., 1], c[..., 2], c[..., 3]
+    Rs, uod = v['Rs'], v['uod']
+    a = c0 * (Rs + 100) ** -c1
+    b = c2 * (Rs + 150) ** -c3
+    uob = a * uod ** b
+    if not jacobiano:
+        return uob, None
+    log_uod = np.log(uod)
+    return uob, _empilha(uob / c0, -uob * np.log(Rs + 100), uob * log_uod * b / c2,
+                         -uob * log_uod * b * np.log(Rs + 150))
+
+
+def multiplicador(propriedade, nome):
+    """
+    Nota: serve para qualquer correlação do registro; o único coeficiente multiplica a correlação original, então
+    o jacobiano é a própria correlação.
+    :return: ModeloCalibravel propriedade = m * correlação(propriedade, nome), com m = 1 na literatura
+    """
+    kernel = REGISTRO_CORRELACOES.busca(propriedade, nome).kernel()
+
+    def funcao(c, v, jacobiano):
+        base = kernel(**v)
+        return c[..., 0] * base, (base[..., None] if jacobiano else None)
+    return ModeloCalibravel(propriedade, nome, funcao, (1.0,), ('m',))
+
+
+MODELOS_CALIBRAVEIS = {
+    ('Pb', 'standing'): ModeloCalibravel('Pb', 'standing', _pb_standing, (18.2, 1.4, 0.83), ('18.2', '1.4', '0.83')),
+    ('Rs', 'standing'): ModeloCalibravel('Rs', 'standing', _rs_standing, (18.2, 1.4, 0.83), ('18.2', '1.4', '0.83'),
+                                         {'P': _drs_dp_standing}),
+    ('Bo', 'standing'): ModeloCalibravel('Bo', 'standing', _bo_standing, (0.9759, 0.00012, 1.2),
+                                         ('0.9759', '0.00012', '1.2')),
+    ('uod', 'beggs_e_robinson'): ModeloCalibravel('uod', 'beggs_e_robinson', _uod_beggs_e_robinson,
+                                                  (3.0324, 0.02023, 1.163), ('3.0324', '0.02023', '1.163')),
+    ('uob', 'beggs_e_robinson'): ModeloCalibravel('uob', 'beggs_e_robinson', _uob_beggs_e_robinson,
+                                                  (10.715, 0.515, 5.44, 0.338), ('10.715', '0.515', '5.44', '0.338')),
+}
+
+
+def modelo_calibravel(propriedade, nome):
+    """
+    :return: ModeloCalibravel com os coeficientes da literatura, se houver, ou o multiplicador da correlação
+    """
+    if (propriedade, nome) in MODELOS_CALIBRAVEIS:
+        return MODELOS_CALIBRAVEIS[propriedade, nome]
+    return multiplicador(propriedade, nome)
+
+
+def _soma_por_grupo(valores, inicios):
+    # amostras já ordenadas por grupo; inicios[g] é a primeira amostra do grupo g
+    return np.add.reduceat(valores, inicios, axis=0)
+
+
+class AjusteCorrelacao:
+    def __init__(self, modelo, grupos, coeficientes, erro_inicial, erro_final, n_amostras, iteracoes, convergiu,
+                 faixas):
+        """
+        :param modelo: ModeloCalibravel ajustado
+        :param grupos: Lista com o rótulo de cada grupo
+        :param coeficientes: Array (n_grupos, n_coeficientes)
+        :param erro_inicial: Erro relativo RMS de cada grupo com os coeficientes da literatura
+        :param erro_final: Erro relativo RMS de cada grupo com os coeficientes ajustados
+        :param n_amostras: Amostras usadas em cada grupo
+        :param iteracoes: Iterações de Levenberg-Marquardt até a convergência de cada grupo
+        :param convergiu: Máscara dos grupos que convergiram dentro de max_iteracoes
+        :param faixas: Lista (por grupo) de dict {atributo: (mínimo, máximo)} dos dados do ajuste
+        """
+        self.modelo = modelo
+        self.grupos = grupos
+        self.coeficientes = coeficientes
+        self.erro_inicial = erro_inicial
+        self.erro_final = erro_final
+        self.n_amostras = n_amostras
+        self.iteracoes = iteracoes
+        self.convergiu = convergiu
+        self.faixas = faixas
+
+    def nome(self, grupo):
+        return f'{self.modelo.nome}_{grupo}'
+
+    def correlacao(self, grupo):
+        """
+        :return: Correlacao do grupo, com os coeficientes ajustados e a faixa dos dados do grupo
+        """
+        g = self.grupos.index(grupo)
+        return self.modelo.correlacao(self.coeficientes[g], self.nome(grupo), self.faixas[g])
+
+    def registra(self, registro=REGISTRO_CORRELACOES):
+        """
+        :param registro: RegistroCorrelacoes que recebe uma Correlacao por grupo
+        :return: dict {grupo: {propriedade: nome}}, pronto para o argumento correlacoes de gera_tabela_pvt_black_oil
+        """
+        escolhas = {}
+        for grupo in self.grupos:
+            registro.registra(self.correlacao(grupo))
+            escolhas[grupo] = {self.modelo.propriedade: self.nome(grupo)}
+        return escolhas
+
+    def resumo(self):
+        """
+        :return: dict {grupo: dict com os coeficientes (pelo nome da literatura), erros, amostras e iterações}
+        """
+        return {grupo: dict(zip(self.modelo.nomes_coeficientes, self.coeficientes[g].tolist()),
+                            erro_inicial=float(self.erro_inicial[g]), erro_final=float(self.erro_final[g]),
+                            amostras=int(self.n_amostras[g]), iteracoes=int(self.iteracoes[g]))
+                for g, grupo in enumerate(self.grupos)}
+
+
+def calibra(dados, propriedade, nome, medido=None, grupo=None, pesos=None, coeficientes=None, max_iteracoes=100,
+            tolerancia=10 ** -10, amortecimento=10 ** -3):
+    """
+    Nota: minimiza, em cada grupo, a soma de (peso * (calculado - medido) / medido)^2; a iteração de cada grupo
+    para quando o passo relativo ou a redução relativa do resíduo fica abaixo da tolerância.
+    :param dados: dict ou DataFrame, uma linha por medição, com as entradas da correlação (nas unidades do
+    REGISTRO_CORRELACOES, ou Grandeza) e a propriedade medida
+    :param propriedade: Propriedade ajustada (ex.: 'Pb', 'Rs', 'Bo', 'uod', 'uob')
+    :param nome: Correlação de partida (ex.: 'standing'); sem modelo com coeficientes em MODELOS_CALIBRAVEIS, é
+    ajustado um multiplicador
+    :param medido: Coluna de dados com a propriedade medida (padrão: a própria propriedade)
+    :param grupo: Coluna de dados com o grupo (campo, poço, ...) de cada medição; None ajusta um grupo só
+    :param pesos: Peso de cada medição (padrão: 1)
+    :param coeficientes: Ponto de partida (n_coeficientes,); padrão: os da literatura
+    :param max_iteracoes: Máximo de iterações de Levenberg-Marquardt
+    :param tolerancia: Tolerância relativa de parada
+    :param amortecimento: Amortecimento inicial de Levenberg-Marquardt (escala a diagonal de J^T J)
+    :return: AjusteCorrelacao
+    """
+    modelo = modelo_calibravel(propriedade, nome)
+    medido = propriedade if medido is None else medido
+    valores = {atributo: np.asarray(valor_em(dados[atributo], unidade), dtype=float).ravel()
+               for atributo, unidade in modelo.entradas.items()}
+    y = np.asarray(valor_em(dados[medido], modelo.unidade), dtype=float).ravel()
+    rotulos = np.asarray(dados[grupo]) if grupo is not None else np.zeros(len(y), dtype=int)
+    w = np.ones(len(y)) if pesos is None else np.asarray(pesos, dtype=float).ravel()
+
+    validas = np.isfinite(y) & (y != 0) & np.isfinite(w)
+    for valor in valores.values():
+        validas &= np.isfinite(valor)
+    grupos, indice_grupo = np.unique(rotulos[validas], return_inverse=True)
+    if not len(grupos):
+        raise ValueError(f'Nenhuma medição válida de {medido} para calibrar {propriedade}/{nome}')
+    ordem = np.argsort(indice_grupo, kind='stable')
+    indice_grupo = indice_grupo[ordem]
+    valores = {atributo: valor[validas][ordem] for atributo, valor in valores.items()}
+    escala = w[validas][ordem] / y[validas][ordem]  # resíduo relativo ponderado
+    y = y[validas][ordem]
+    n_amostras = np.bincount(indice_grupo)
+    inicios = np.concatenate([[0], np.cumsum(n_amostras)[:-1]])
+    if (n_amostras < len(modelo.coeficientes)).any():
+        raise ValueError(f'Há grupos com menos medições que os {len(modelo.coeficientes)} coeficientes de '
+                         f'{propriedade}/{nome}')
+    faixas = [{atributo: (float(valor[i:i + n].min()), float(valor[i:i + n].max()))
+               for atributo, valor in valores.items()} for i, n in zip(inicios, n_amostras)]
+
+    def residuos(c, jacobiano):
+        resultado = modelo.funcao(c[indice_grupo], valores, jacobiano)
+        r = (resultado[0] - y) * escala
+        custo = _soma_por_grupo(np.where(np.isfinite(r), r ** 2, np.inf), inicios)
+        return r, (resultado[1] * escala[:, None] if jacobiano else None), custo
+
+    c = np.tile(modelo.coeficientes if coeficientes is None else np.asarray(coeficientes, dtype=float),
+                (len(grupos), 1))
+    n_coef = c.shape[1]
+    lam = np.full(len(grupos), float(amortecimento))
+    ativos = np.ones(len(grupos), dtype=bool)
+    iteracoes = np.zeros(len(grupos), dtype=int)
+    with etapa(f'calibra_{propriedade}_{nome}', 'calibracao', amostras=len(y), grupos=len(grupos)):
+        r, J, custo = residuos(c, True)
+        erro_inicial = np.sqrt(custo / n_amostras)
+        for _ in range(max_iteracoes):
+            JtJ = _soma_por_grupo(J[:, :, None] * J[:, None, :], inicios)
+            Jtr = _soma_por_grupo(J * r[:, None], inicios)
+            diagonal = np.einsum('gii->gi', JtJ)
+            A = JtJ + (lam[:, None] * np.maximum(diagonal, 10 ** -30))[:, :, None] * np.eye(n_coef)
+            passo = np.linalg.solve(A, -Jtr[..., None])[..., 0]
+            passo[~ativos] = 0
+            c_novo = c + passo
+            r_novo, J_novo, custo_novo = residuos(c_novo, True)
+            aceita = ativos & (custo_novo < custo)
+            iteracoes += ativos
+            # convergência: passo ou redução do resíduo desprezíveis (medidos antes de trocar o ponto)
+            pequeno = (np.abs(passo) <= tolerancia * (np.abs(c) + tolerancia)).all(axis=1)
+            estavel = aceita & (custo - custo_novo <= tolerancia * custo)
+            c = np.where(aceita[:, None], c_novo, c)
+            por_amostra = aceita[indice_grupo]
+            r = np.where(por_amostra, r_novo, r)
+            J = np.where(por_amostra[:, None], J_novo, J)
+            custo = np.where(aceita, custo_novo, custo)
+            lam = np.where(aceita, lam / 10, lam * 10)
+            ativos &= ~(pequeno | estavel | (lam > 10 ** 16))
+            if not ativos.any():
+                break
+    return AjusteCorrelacao(modelo, grupos.tolist(), c, erro_inicial, np.sqrt(custo / n_amostras), n_amostras,
+                            iteracoes, ~ativos, faixas)
@@ -0,0 +1,236 @@
+"""
+Derivadas das propriedades PVT em relação a P e T por diferenciação automática no modo direto (números duais).
+
+Um NumeroDual carrega o valor e, junto, a derivada em relação a cada variável semeada. As correlações da classe
+BlackOil só usam operações do NumPy (ufuncs e np.where), então recebem números duais no lugar de arrays sem nenhuma
+mudança: uma única avaliação do grafo devolve os valores e as derivadas exatas, sem diferenças finitas e para
+qualquer correlação escolhida no REGISTRO_CORRELACOES. Nas correlações resolvidas por Newton (Hall & Yarborough,
+Dranchuk & Abu-Kassem), a derivada da raiz vem do teorema da função implícita (ver _newton_vetorizado).
+"""
+
+import numpy as np
+from ClassesTabelaPVT import SAIDAS_TABELA_PVT, grafo_tabela_pvt, _variaveis_da_tabela, _completa_Pb
+
+
+def _valor(x):
+    return x.valor if isinstance(x, NumeroDual) else x
+
+
+def _derivadas_alinhadas(x, ndim):
+    """
+    :return: derivadas de x com eixos unitários à esquerda do valor, para o broadcast contra um resultado ndim-D
+    """
+    d = x.derivadas
+    return d.reshape(d.shape[:1] + (1,) * (ndim - x.valor.ndim) + d.shape[1:])
+
+
+def _parcial_da_base(r, a, b):
+    # d(a ** b)/da = b * a ** (b - 1), reaproveitando r = a ** b em vez de calcular outra potência
+    parcial = r * b / a
+    zero = np.asarray(a == 0)
+    if zero.any():
+        parcial = np.where(zero, b * np.where(zero, a, 1) ** (b - 1), parcial)
+    return parcial
+
+
+# ufunc -> derivada parcial em relação a cada entrada, f(resultado, *entradas); só as das entradas duais são avaliadas
+_REGRAS = {
+    np.add: (1, 1),
+    np.subtract: (1, -1),
+    np.multiply: (lambda r, a, b: b, lambda r, a, b: a),
+    np.true_divide: (lambda r, a, b: 1 / b, lambda r, a, b: -r / b),
+    np.power: (_parcial_da_base, lambda r, a, b: r * np.log(a)),
+    np.negative: (-1,),
+    np.positive: (1,),
+    np.exp: (lambda r, a: r,),
+    np.log: (lambda r, a: 1 / a,),
+    np.log10: (lambda r, a: 1 / (a * np.log(10)),),
+    np.sqrt: (lambda r, a: 0.5 / r,),
+    np.square: (lambda r, a: 2 * a,),
+    np.absolute: (lambda r, a: np.sign(a),),
+    np.minimum: (lambda r, a, b: a <= b, lambda r, a, b: a > b),
+    np.maximum: (lambda r, a, b: a >= b, lambda r, a, b: a < b),
+}
+# ufuncs cuja parcial pode ser infinita ou NaN onde a função ainda é finita
+_SINGULARES = {np.true_divide, np.power, np.log, np.log10, np.sqrt}
+# ufuncs sem parte derivável (comparações e testes): atuam só sobre o valor
+_SO_VALOR = {np.less, np.less_equal, np.greater, np.greater_equal, np.equal, np.not_equal, np.isnan, np.isfinite,
+             np.isinf, np.sign, np.logical_and, np.logical_or, np.logical_not, np.floor}
+
+
+class NumeroDual:
+    def __init__(self, valor, derivadas):
+        """
+        :param valor: Valor (escalar ou array)
+        :param derivadas: Array (n_variaveis,) + forma de valor (ou com broadcast para ela): derivadas[k] é a derivada
+        do valor em relação à k-ésima variável semeada
+        """
+        self.valor = np.asarray(valor, dtype=float)
+        self.derivadas = np.asarray(derivadas, dtype=float)
+
+    @classmethod
+    def semeia(cls, *variaveis):
+        """
+        :param variaveis: Arrays das variáveis independentes (ex.: P e T)
+        :return: Um NumeroDual por variável, com derivada 1 em relação a ela mesma e 0 em relação às outras
+        """
+        duais = []
+        for k, valor in enumerate(variaveis):
+            valor = np.asarray(valor, dtype=float)
+            derivadas = np.zeros((len(variaveis),) + valor.shape)
+            derivadas[k] = 1
+            duais.append(cls(valor, derivadas))
+        return duais
+
+    @property
+    def shape(self):
+        return self.valor.shape
+
+    @property
+    def ndim(self):
+        return self.valor.ndim
+
+    def __getitem__(self, indice):
+        indice = indice if isinstance(indice, tuple) else (indice,)
+        return NumeroDual(self.valor[indice], _derivadas_alinhadas(self, self.valor.ndim)[(slice(None),) + indice])
+
+    def __repr__(self):
+        return f'NumeroDual(valor={self.valor!r}, derivadas={self.derivadas!r})'
+
+    def __array_ufunc__(self, ufunc, metodo, *entradas, **kwargs):
+        if metodo != '__call__' or 'out' in kwargs:
+            return NotImplemented
+        valores = [_valor(e) for e in entradas]
+        if ufunc in _SO_VALOR:
+            return ufunc(*valores, **kwargs)
+        if ufunc not in _REGRAS:
+            return NotImplemented
+
+        with np.errstate(all='ignore'):
+            resultado = np.asarray(ufunc(*valores, **kwargs))
+            derivadas = None
+            for entrada, regra in zip(entradas, _REGRAS[ufunc]):
+                if not isinstance(entrada, NumeroDual):
+                    continue
+                d = _derivadas_alinhadas(entrada, resultado.ndim)
+                if regra == 1 or regra == -1:
+                    termo = d if regra == 1 else -d
+                else:
+                    parcial = regra(resultado, *valores)
+                    termo = parcial * d
+                    if ufunc in _SINGULARES and not np.isfinite(parcial).all():
+                        # direção com derivada nula não contribui, mesmo onde a parcial é infinita (ex.: 0 ** 0.5)
+                        termo = np.where(d == 0, 0, termo)
+                derivadas = termo if derivadas is None else derivadas + termo
+        return NumeroDual(resultado, derivadas)
+
+    def __array_function__(self, funcao, tipos, args, kwargs):
+        if funcao is not np.where or len(args) != 3:
+            return NotImplemented
+        condicao, x, y = args
+        condicao = _valor(condicao)
+        valor = np.where(condicao, _valor(x), _valor(y))
+        dx = _derivadas_alinhadas(x, valor.ndim) if isinstance(x, NumeroDual) else 0
+        dy = _derivadas_alinhadas(y, valor.ndim) if isinstance(y, NumeroDual) else 0
+        return NumeroDual(valor, np.where(condicao, dx, dy))
+
+    __add__ = lambda self, outro: np.add(self, outro)
+    __radd__ = lambda self, outro: np.add(outro, self)
+    __sub__ = lambda self, outro: np.subtract(self, outro)
+    __rsub__ = lambda self, outro: np.subtract(outro, self)
+    __mul__ = lambda self, outro: np.multiply(self, outro)
+    __rmul__ = lambda self, outro: np.multiply(outro, self)
+    __truediv__ = lambda self, outro: np.true_divide(self, outro)
+    __rtruediv__ = lambda self, outro: np.true_divide(outro, self)
+    __pow__ = lambda self, outro: np.power(self, outro)
+    __rpow__ = lambda self, outro: np.power(outro, self)
+    __neg__ = lambda self: np.negative(self)
+    __pos__ = lambda self: self
+    __abs__ = lambda self: np.absolute(self)
+    __lt__ = lambda self, outro: np.less(self, outro)
+    __le__ = lambda self, outro: np.less_equal(self, outro)
+    __gt__ = lambda self, outro: np.greater(self, outro)
+    __ge__ = lambda self, outro: np.greater_equal(self, outro)
+
+
+def deriva(kernel, variaveis=('P', 'T'), **entradas):
+    """
+    :param kernel: Função vetorizada f(**entradas), ex.: REGISTRO_CORRELACOES.busca('Rs', 'glaso').kernel()
+    :param variaveis: Entradas em relação às quais derivar
+    :param entradas: Valores de todas as entradas do kernel
+    :return: valor e dict {variável: derivada}, com a forma do valor
+    """
+    for nome, dual in zip(variaveis, NumeroDual.semeia(*(entradas[v] for v in variaveis))):
+        entradas[nome] = dual
+    resultado = kernel(**entradas)
+    valor = np.asarray(_valor(resultado), dtype=float)
+    if isinstance(resultado, NumeroDual):
+        derivadas = np.broadcast_to(_derivadas_alinhadas(resultado, valor.ndim), (len(variaveis),) + valor.shape)
+    else:
+        derivadas = np.zeros((len(variaveis),) + valor.shape)
+    return valor[()], {nome: derivadas[k][()] for k, nome in enumerate(variaveis)}
+
+
+def derivada_parcial(kernel, variavel, **entradas):
+    """
+    Nota: para nós do grafo que dependem da derivada de outra correlação (ex.: Co abaixo de Pb usa dRs/dP e Cg usa
+    dZ/dPpr). A derivada vem exata por números duais; quando as entradas já são duais (dentro de
+    derivadas_tabela_pvt), a derivada dessa derivada em relação às variáveis semeadas pede a segunda derivada do
+    kernel, que sai de diferenças centrais das derivadas exatas, na direção de cada variável semeada.
+    :param kernel: Função vetorizada f(**entradas)
+    :param variavel: Entrada em relação à qual derivar
+    :param entradas: Valores de todas as entradas do kernel (arrays ou NumeroDual)
+    :return: d(kernel)/d(variavel): array ou, com entradas duais, NumeroDual
+    """
+    valores = {nome: _valor(valor) for nome, valor in entradas.items()}
+    derivada = deriva(kernel, (variavel,), **valores)[1][variavel]
+    duais = {nome: valor for nome, valor in entradas.items() if isinstance(valor, NumeroDual)}
+    if not duais:
+        return derivada
+
+    n_variaveis = next(iter(duais.values())).derivadas.shape[0]
+    derivadas = []
+    for k in range(n_variaveis):
+        direcoes = {nome: _derivadas_alinhadas(dual, dual.valor.ndim)[k] for nome, dual in duais.items()}
+        # passo que move as entradas juntas em ~1e-5 (relativo), perto do ótimo das diferenças centrais
+        escala = sum(np.abs(direcao) / np.maximum(np.abs(valores[nome]), 10 ** -300)
+                     for nome, direcao in direcoes.items())
+        passo = np.where(escala > 0, 10 ** -5 / np.where(escala > 0, escala, 1), 0)
+        lados = []
+        for sinal in (1, -1):
+            deslocadas = dict(valores)
+            for nome, direcao in direcoes.items():
+                deslocadas[nome] = valores[nome] + sinal * passo * direcao
+            lados.append(deriva(kernel, (variavel,), **deslocadas)[1][variavel])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            derivadas.append(np.where(passo > 0, (lados[0] - lados[1]) / (2 * np.where(passo > 0, passo, 1)), 0))
+    return NumeroDual(derivada, np.stack(np.broadcast_arrays(derivada, *derivadas))[1:])
+
+
+def derivadas_tabela_pvt(fluidos, P, saidas=SAIDAS_TABELA_PVT, correlacoes=None):
+    """
+    Nota: T é semeada antes de Pb ser completado a partir de Rsb, então dPb/dT aparece quando Pb não é informado.
+    As regras de cada região (P <= Pb e P > Pb) são as da tabela; em P = Pb vale a derivada do lado de baixo.
+    :param fluidos: Mesmas entradas de gera_tabela_pvt_black_oil
+    :param P: Malha de pressões, psia
+    :param saidas: Variáveis do grafo a calcular
+    :param correlacoes: dict {propriedade: nome no REGISTRO_CORRELACOES} (ver grafo_tabela_pvt)
+    :return: valores, d/dP [1/psia] e d/dT [1/°F], cada um (n_fluidos, n_pressões, len(saidas))
+    """
+    grafo = grafo_tabela_pvt(correlacoes)
+    variaveis = _variaveis_da_tabela(fluidos, P)
+    variaveis['P'], variaveis['T_F'] = NumeroDual.semeia(variaveis['P'], variaveis['T_F'])
+    _completa_Pb(variaveis, grafo)
+    resultado = grafo.avalia(saidas, **variaveis)
+
+    forma = np.broadcast_shapes(variaveis['P'].shape, variaveis['T_F'].shape)
+    valores, derivadas = [], []
+    for saida in saidas:
+        r = resultado[saida]
+        valores.append(np.broadcast_to(_valor(r), forma))
+        if isinstance(r, NumeroDual):
+            derivadas.append(np.broadcast_to(_derivadas_alinhadas(r, len(forma)), (2,) + forma))
+        else:
+            derivadas.append(np.zeros((2,) + forma))
+    derivadas = np.stack(derivadas, axis=-1)
+    return np.stack(valores, axis=-1), derivadas[0], derivadas[1]
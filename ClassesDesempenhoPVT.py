@@ -0,0 +1,281 @@
+"""
+Suíte de desempenho: correlações, geração de tabelas e consultas, com resultados em JSON.
+
+Cada caso é medido como no timeit (número de chamadas por repetição ajustado para durar pelo menos tempo_minimo,
+várias repetições, mediana e mínimo) e, em uma chamada à parte, com tracemalloc para o pico de memória (o NumPy
+registra suas alocações no tracemalloc). As entradas vêm de FAIXAS_REPRESENTATIVAS com semente fixa, então duas
+execuções na mesma máquina medem exatamente o mesmo trabalho; compara() aponta os casos que ficaram mais lentos entre
+dois arquivos de resultados.
+
+Uso: python ClassesDesempenhoPVT.py [resultado.json] [--max-nos 1e7] [--compara anterior.json]
+
+Por padrão as tabelas vão até MAX_NOS_PADRAO nós; a de 1e7 nós (só a saída tem 11 colunas × 1e7 × 8 bytes, perto de
+1 GB, e os intermediários do grafo e o tracemalloc multiplicam isso) só é medida com --max-nos 1e7.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+from ClassesBlackOil import BlackOil
+from ClassesGrafoBlackOil import NOS_TABELA_PVT
+from ClassesKernelFundido import tabela_pvt_fundida
+from ClassesRegistroCorrelacoes import REGISTRO_CORRELACOES
+from ClassesSuperficieZ import SuperficieZ
+from ClassesTabelaPVT import TabelaPVT, gera_tabela_pvt_black_oil
+from ClassesUnidades import converte
+
+
+# Faixas de amostragem de cada atributo lido pelas correlações; T em °F (convertida para as correlações em °R)
+FAIXAS_REPRESENTATIVAS = {
+    'P': (14.7, 7000), 'Pb': (1000, 5000), 'T': (100, 300), 'dg': (0.6, 1.2), 'dgn': (0.6, 1.2), 'API': (15, 55),
+    'do': (0.76, 0.97), 'Rs': (20, 2000), 'Tsep': (60, 150), 'Psep': (50, 500), 'Ppr': (0.2, 15), 'Tpr': (1.05, 3),
+    'Ppc': (640, 690), 'Tpc': (340, 460), 'Z': (0.3, 1.2), 'Mg': (17, 35), 'rho_g': (0.05, 20), 'dgas': (0.001, 0.3),
+    'Bo': (1, 2), 'Bob': (1, 2), 'Bg': (0.001, 0.1), 'Co': (5 * 10 ** -6, 5 * 10 ** -5), 'Rho_ob': (35, 55),
+    'uod': (0.5, 50), 'uob': (0.2, 10), 'Yn2': (0, 0.1), 'Yco2': (0, 0.1), 'Yh2s': (0, 0.1),
+    'rho_o_sc': (50, 62), 'rho_g_sc': (0.04, 0.09),
+}
+TAMANHO_LOTE = 10 ** 5
+NOS_TABELA = tuple(10 ** k for k in range(2, 8))
+MAX_NOS_PADRAO = 10 ** 6
+PRESSOES_POR_FLUIDO = 1000
+
+
+def _unidade_de_T(metodo):
+    """
+    :return: Unidade de T esperada pelo método: a declarada no REGISTRO_CORRELACOES ou no grafo da tabela PVT
+    """
+    for correlacao in REGISTRO_CORRELACOES.correlacoes.values():
+        if correlacao.metodo == metodo and 'T' in correlacao.entradas:
+            return correlacao.entradas['T']
+    for no in NOS_TABELA_PVT:
+        if no.calcula == metodo and no.entradas.get('T') == 'T_R':
+            return '°R'
+    return '°F'
+
+
+def _entradas(metodo, n, semente=0):
+    """
+    :param metodo: Nome de um método de BlackOil decorado com _memoriza
+    :param n: Número de pontos; None gera escalares
+    :return: dict {atributo: valor} com os atributos lidos pelo método e as constantes do REGISTRO_CORRELACOES
+    """
+    amostras = np.random.default_rng(semente)
+    valores = {}
+    for correlacao in REGISTRO_CORRELACOES.correlacoes.values():
+        if correlacao.metodo == metodo:
+            valores.update(correlacao.constantes)  # ex.: zc e x0 de Dranchuk & Abu-Kassem
+    for atributo in getattr(BlackOil, metodo).entradas:
+        if atributo not in FAIXAS_REPRESENTATIVAS:
+            continue  # constantes com valor padrão em BlackOil (Psc, Tsc, R, ...)
+        valor = amostras.uniform(*FAIXAS_REPRESENTATIVAS[atributo], size=n)
+        if atributo == 'T' and _unidade_de_T(metodo) == '°R':
+            valor = converte(valor, '°F', '°R')
+        valores[atributo] = float(valor) if n is None else valor
+    if 'superficie_z' in getattr(BlackOil, metodo).entradas:
+        valores['superficie_z'] = _superficie_z()
+    return valores
+
+
+_SUPERFICIES = {}
+
+
+def _superficie_z():
+    if 'papay' not in _SUPERFICIES:
+        _SUPERFICIES['papay'] = SuperficieZ.gera('papay')
+    return _SUPERFICIES['papay']
+
+
+def metodos_de_correlacao():
+    """
+    :return: Nomes de todas as correlações de FatorZ e BlackOil (métodos que declaram suas entradas)
+    """
+    return tuple(nome for nome in dir(BlackOil) if hasattr(getattr(BlackOil, nome), 'entradas'))
+
+
+"""------------------------------------------------------------------------------------------------------------------"""
+"Medição"
+
+
+def mede(funcao, repeticoes=5, tempo_minimo=0.02, memoria=True):
+    """
+    :param funcao: Função sem argumentos a medir
+    :param repeticoes: Número de repetições (cada uma com o mesmo número de chamadas)
+    :param tempo_minimo: Duração mínima de uma repetição, s
+    :param memoria: Se True, mede o pico de memória alocada durante uma chamada
+    :return: dict com 'chamadas' por repetição, 'tempos_s' (por chamada), 'mediana_s', 'minimo_s' e
+    'pico_memoria_bytes' (None se memoria=False)
+    """
+    chamadas = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in range(chamadas):
+            funcao()
+        decorrido = time.perf_counter() - inicio
+        if decorrido >= tempo_minimo:
+            break
+        chamadas *= 2 if decorrido == 0 else max(2, int(np.ceil(tempo_minimo / decorrido)))
+
+    tempos = []  # as chamadas da calibração ficam de fora (aquecimento, compilação do numba)
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for _ in range(chamadas):
+            funcao()
+        tempos.append((time.perf_counter() - inicio) / chamadas)
+
+    pico = None
+    if memoria:
+        tracemalloc.start()
+        try:
+            funcao()
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {'chamadas': chamadas, 'tempos_s': tempos, 'mediana_s': float(np.median(tempos)),
+            'minimo_s': float(np.min(tempos)), 'pico_memoria_bytes': pico}
+
+
+def _resultado(nome, grupo, n, medicao, **parametros):
+    resultado = {'nome': nome, 'grupo': grupo, 'parametros': parametros, 'n': n}
+    resultado.update(medicao)
+    resultado['por_elemento_s'] = medicao['mediana_s'] / n
+    return resultado
+
+
+def mede_correlacoes(metodos=None, tamanho_lote=TAMANHO_LOTE, **opcoes):
+    """
+    :param metodos: Métodos de BlackOil a medir; None mede todos (ver metodos_de_correlacao)
+    :param tamanho_lote: Número de pontos do caso em lote
+    :param opcoes: Repassadas a mede
+    :return: Lista de resultados, um caso escalar e um em lote por correlação
+    """
+    resultados = []
+    for metodo in metodos or metodos_de_correlacao():
+        funcao = getattr(BlackOil, metodo)
+        for modo, n in (('escalar', None), ('lote', tamanho_lote)):
+            PVT = BlackOil()
+            for atributo, valor in _entradas(metodo, n).items():
+                setattr(PVT, atributo, valor)
+            with np.errstate(all='ignore'):
+                medicao = mede(lambda: funcao(PVT), **opcoes)
+            resultados.append(_resultado(f'correlacao.{metodo}.{modo}', 'correlacao', n or 1, medicao, modo=modo))
+    return resultados
+
+
+def _fluidos(n, semente=0):
+    amostras = np.random.default_rng(semente)
+    return {'dg': amostras.uniform(0.6, 1.0, n), 'do': amostras.uniform(0.8, 0.92, n),
+            'Rsb': amostras.uniform(200, 1200, n), 'T': amostras.uniform(120, 250, n)}
+
+
+def mede_tabelas(nos=NOS_TABELA, max_nos=MAX_NOS_PADRAO, **opcoes):
+    """
+    Nota: cada tamanho usa até PRESSOES_POR_FLUIDO pressões por fluido e tantos fluidos quanto necessário.
+    :param nos: Números de nós (fluidos × pressões) das tabelas
+    :param max_nos: Tamanho máximo medido (os maiores são pulados); None mede todos
+    :param opcoes: Repassadas a mede
+    :return: Lista de resultados, pelos métodos (gera_tabela_pvt_black_oil) e pelo núcleo fundido
+    """
+    resultados = []
+    for n in nos:
+        if max_nos is not None and n > max_nos:
+            continue
+        n_pressoes = min(n, PRESSOES_POR_FLUIDO)
+        fluidos, P = _fluidos(n // n_pressoes), np.linspace(14, 7000, n_pressoes)
+        for caminho, funcao in (('metodos', gera_tabela_pvt_black_oil), ('fundida', tabela_pvt_fundida)):
+            with np.errstate(all='ignore'):
+                medicao = mede(lambda: funcao(fluidos, P), **opcoes)
+            resultados.append(_resultado(f'tabela.{caminho}.{n}', 'tabela', n, medicao, caminho=caminho,
+                                         fluidos=n // n_pressoes, pressoes=n_pressoes))
+    return resultados
+
+
+def mede_consultas(consultas=(1, 10 ** 3, 10 ** 6), **opcoes):
+    """
+    :param consultas: Números de pontos consultados de uma vez
+    :param opcoes: Repassadas a mede
+    :return: Lista de resultados de TabelaPVT.consulta (linear e cúbica) e de SuperficieZ.interpola
+    """
+    fluido = {chave: valor[0] for chave, valor in _fluidos(1).items()}
+    tabela = TabelaPVT.de_fluido(fluido, np.arange(14, 7000, 100))
+    superficie = _superficie_z()
+    amostras = np.random.default_rng(0)
+    resultados = []
+    for n in consultas:
+        P = amostras.uniform(14, 7000, n)
+        for metodo in ('linear', 'cubica'):
+            medicao = mede(lambda: tabela.consulta(P, metodo=metodo), **opcoes)
+            resultados.append(_resultado(f'consulta.tabela_pvt.{metodo}.{n}', 'consulta', n, medicao, metodo=metodo))
+        Ppr, Tpr = amostras.uniform(0.2, 15, n), amostras.uniform(1.05, 3, n)
+        medicao = mede(lambda: superficie.interpola(Ppr, Tpr), **opcoes)
+        resultados.append(_resultado(f'consulta.superficie_z.{n}', 'consulta', n, medicao, metodo=superficie.metodo))
+    return resultados
+
+
+def maquina():
+    """
+    :return: dict com o que identifica o ambiente da medição (versões, processador e commit do repositório)
+    """
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'plataforma': platform.platform(),
+            'processador': platform.processor() or platform.machine(), 'commit': commit,
+            'data': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def executa(arquivo=None, max_nos=MAX_NOS_PADRAO, **opcoes):
+    """
+    :param arquivo: Caminho do JSON de saída; None não grava
+    :param max_nos: Maior tabela medida (ver mede_tabelas)
+    :param opcoes: Repassadas a mede
+    :return: dict {'maquina': ..., 'resultados': [...]}
+    """
+    resultados = mede_correlacoes(**opcoes) + mede_tabelas(max_nos=max_nos, **opcoes) + mede_consultas(**opcoes)
+    relatorio = {'maquina': maquina(), 'resultados': resultados}
+    if arquivo is not None:
+        with open(arquivo, 'w', encoding='utf-8') as saida:
+            json.dump(relatorio, saida, indent=1, ensure_ascii=False)
+    return relatorio
+
+
+def compara(anterior, atual, limite=1.2):
+    """
+    :param anterior: Relatório (dict) ou caminho do JSON de referência
+    :param atual: Relatório (dict) ou caminho do JSON novo
+    :param limite: Razão entre as medianas a partir da qual o caso conta como regressão
+    :return: Lista (nome, mediana anterior, mediana atual, razão) dos casos mais lentos, do pior para o melhor
+    """
+    relatorios = []
+    for relatorio in (anterior, atual):
+        if not isinstance(relatorio, dict):
+            with open(relatorio, encoding='utf-8') as entrada:
+                relatorio = json.load(entrada)
+        relatorios.append({r['nome']: r['mediana_s'] for r in relatorio['resultados']})
+    antes, depois = relatorios
+    regressoes = [(nome, antes[nome], depois[nome], depois[nome] / antes[nome])
+                  for nome in depois if nome in antes and depois[nome] > limite * antes[nome]]
+    return sorted(regressoes, key=lambda r: -r[3])
+
+
+if __name__ == '__main__':
+    argumentos = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argumentos.add_argument('arquivo', nargs='?', default='desempenho_pvt.json')
+    argumentos.add_argument('--max-nos', type=float, default=MAX_NOS_PADRAO,
+                            help=f'Maior tabela medida, em nós (padrão {MAX_NOS_PADRAO}; 1e7 inclui a maior)')
+    argumentos.add_argument('--compara', help='JSON de uma execução anterior')
+    argumentos = argumentos.parse_args()
+
+    relatorio = executa(argumentos.arquivo, argumentos.max_nos)
+    largura = max(len(r['nome']) for r in relatorio['resultados'])
+    for r in relatorio['resultados']:
+        memoria = '' if r['pico_memoria_bytes'] is None else f'{r["pico_memoria_bytes"] / 2 ** 20:10.2f} MiB'
+        print(f'{r["nome"]:<{largura}} {r["mediana_s"]:11.3e} s {r["por_elemento_s"]:11.3e} s/elem {memoria}')
+    if argumentos.compara:
+        for nome, antes, depois, razao in compara(argumentos.compara, relatorio):
+            print(f'REGRESSÃO {nome}: {antes:.3e} s -> {depois:.3e} s ({razao:.2f}x)')
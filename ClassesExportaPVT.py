@@ -0,0 +1,300 @@
+"""
+Exportação das tabelas PVT em blocos, direto dos arrays, sem preencher planilhas célula a célula.
+
+Formatos colunares (Parquet, Arrow IPC e .npz) recebem um bloco por chamada de escreve() e vão gravando no arquivo
+à medida que os blocos chegam, então o tamanho da tabela não fica limitado pela memória. As unidades de cada coluna e
+as propriedades dos fluidos ficam gravadas no próprio arquivo. O Excel continua disponível para tabelas pequenas.
+EscritorPalavrasChave grava as mesmas tabelas como palavras-chave de simulador (PVTO, PVDG, PVCDO), uma região por
+fluido, também em blocos.
+"""
+
+import json
+import shutil
+import tempfile
+import zipfile
+
+import numpy as np
+from ClassesInstrumentacao import etapa
+from ClassesTabelaPVT import COLUNAS_TABELA_PVT
+from ClassesUnidades import converte, valor_em
+
+
+LIMITE_LINHAS_EXCEL = 1048575  # linhas de dados de uma planilha (uma fica para o cabeçalho)
+FT3_POR_BBL = 5.614583
+PSC, TSC = 14.7, 60  # condição padrão: psia, °F
+
+
+def nome_e_unidade(coluna):
+    """
+    :param coluna: Nome no formato de COLUNAS_TABELA_PVT, ex.: 'Bo[bbl/STB]'
+    :return: ('Bo', 'bbl/STB'); colunas sem unidade retornam 'adimensional'
+    """
+    nome, _, unidade = coluna.partition('[')
+    return nome, unidade.rstrip(']') or 'adimensional'
+
+
+class EscritorTabelaPVT:
+    FORMATOS = ('parquet', 'arrow', 'npz', 'xlsx')
+
+    def __init__(self, arquivo, formato=None, colunas=COLUNAS_TABELA_PVT, fluidos=None):
+        """
+        :param arquivo: Caminho do arquivo de saída
+        :param formato: 'parquet', 'arrow', 'npz' ou 'xlsx'; None usa a extensão do arquivo
+        :param colunas: Nomes das colunas das tabelas (com unidade entre colchetes)
+        :param fluidos: dict com as propriedades dos fluidos, gravado como metadado do arquivo
+        """
+        self.arquivo = arquivo
+        self.formato = formato or arquivo.rsplit('.', 1)[-1].lower()
+        if self.formato not in self.FORMATOS:
+            raise ValueError(f'Formato "{self.formato}" não suportado; use um de {self.FORMATOS}')
+        self.nomes, self.unidades = zip(*(nome_e_unidade(c) for c in colunas))
+        self.metadados = {'colunas': dict(zip(self.nomes, self.unidades)), 'P': 'psia',
+                          'fluidos': {k: np.asarray(v, dtype=float).tolist() for k, v in (fluidos or {}).items()}}
+        self.n_casos = 0
+        self.n_linhas = 0
+        self.n_blocos = 0
+        self._escritor = None
+        self._blocos_excel = []
+
+        if self.formato in ('parquet', 'arrow'):
+            import pyarrow as pa
+
+            campos = [pa.field('caso', pa.int64()), pa.field('P', pa.float64(), metadata={'unidade': 'psia'})]
+            campos += [pa.field(n, pa.float64(), metadata={'unidade': u}) for n, u in zip(self.nomes, self.unidades)]
+            self._esquema = pa.schema(campos, metadata={'metadados_pvt': json.dumps(self.metadados)})
+            if self.formato == 'parquet':
+                import pyarrow.parquet as pq
+
+                self._escritor = pq.ParquetWriter(arquivo, self._esquema)
+            else:
+                self._escritor = pa.ipc.new_file(arquivo, self._esquema)
+        elif self.formato == 'npz':
+            self._escritor = zipfile.ZipFile(arquivo, 'w', zipfile.ZIP_STORED, allowZip64=True)
+            self._escritor.writestr('metadados.json', json.dumps(self.metadados))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fecha()
+
+    def escreve(self, P, tabela):
+        """
+        :param P: Pressões do bloco, psia: (n_pressões,) ou (n_fluidos, n_pressões)
+        :param tabela: (n_pressões, n_colunas) de um fluido ou (n_fluidos, n_pressões, n_colunas) de vários
+        """
+        tabela = np.asarray(tabela, dtype=float)
+        if tabela.ndim == 2:
+            tabela = tabela[np.newaxis]
+        n_fluidos, n_pressoes, n_colunas = tabela.shape
+        caso = np.repeat(np.arange(self.n_casos, self.n_casos + n_fluidos), n_pressoes)
+        P = np.broadcast_to(np.asarray(P, dtype=float), (n_fluidos, n_pressoes)).ravel()
+        dados = tabela.reshape(-1, n_colunas)
+        self.n_casos += n_fluidos
+        self.n_linhas += dados.shape[0]
+
+        if self.formato in ('parquet', 'arrow'):
+            import pyarrow as pa
+
+            with etapa(f'escreve_{self.formato}', 'exportacao', elementos=dados.size):
+                arrays = [pa.array(caso), pa.array(P)] + [pa.array(np.ascontiguousarray(dados[:, i]))
+                                                          for i in range(n_colunas)]
+                self._escritor.write(pa.record_batch(arrays, schema=self._esquema))
+        elif self.formato == 'npz':
+            with etapa('escreve_npz', 'exportacao', elementos=dados.size):
+                for nome, valor in (('caso', caso), ('P', P), ('dados', dados)):
+                    with self._escritor.open(f'{nome}_{self.n_blocos:06d}.npy', 'w', force_zip64=True) as f:
+                        np.lib.format.write_array(f, np.ascontiguousarray(valor))
+        else:
+            if self.n_linhas > LIMITE_LINHAS_EXCEL:
+                raise ValueError(f'O Excel aceita no máximo {LIMITE_LINHAS_EXCEL} linhas; use parquet, arrow ou npz')
+            self._blocos_excel.append((caso, P, dados))
+        self.n_blocos += 1
+
+    def fecha(self):
+        if self.formato == 'xlsx':
+            import pandas as pd
+
+            with etapa('preenche_dataframe', 'exportacao'):
+                if self._blocos_excel:
+                    caso, P, dados = (np.concatenate(partes) for partes in zip(*self._blocos_excel))
+                else:  # nenhum bloco escrito: planilha só com os cabeçalhos, como nos outros formatos
+                    caso, P, dados = np.zeros(0, dtype=int), np.zeros(0), np.zeros((0, len(self.nomes)))
+                tabela = pd.DataFrame(dados, columns=[f'{n}[{u}]' for n, u in zip(self.nomes, self.unidades)])
+                tabela.insert(0, 'P[psia]', P)
+                tabela.insert(0, 'caso', caso)
+            with etapa('escreve_xlsx', 'exportacao', elementos=dados.size):
+                tabela.to_excel(self.arquivo, sheet_name='Página-1', index=False)
+            self._blocos_excel = []
+        elif self._escritor is not None:
+            self._escritor.close()
+            self._escritor = None
+
+
+class EscritorPalavrasChave:
+    PALAVRAS = ('PVTO', 'PVDG', 'PVCDO')
+    CABECALHOS = {'PVTO': '-- Rs [Mscf/stb]  Pbub [psia]  Bo [rb/stb]  uo [cP]; ramos sub-saturados: P  Bo  uo',
+                  'PVDG': '-- P [psia]  Bg [rb/Mscf]  ug [cP]',
+                  'PVCDO': '-- Pref [psia]  Bo [rb/stb]  Co [1/psi]  uo [cP]  Cv [1/psi]'}
+
+    def __init__(self, arquivo, palavras=('PVTO', 'PVDG'), digitos=7, ramos='todos', registros_por_bloco=2048,
+                 colunas=COLUNAS_TABELA_PVT):
+        """
+        Nota: cada fluido (linha do lote) vira uma região de PVT. Cada palavra-chave é gravada em um arquivo
+        temporário à medida que os blocos chegam e os temporários são concatenados em fecha(), então nem a tabela
+        nem o texto inteiro ficam na memória. Os números são formatados por bloco com um único operador % sobre um
+        modelo repetido (formatação em C, sem laço em Python por número).
+        :param arquivo: Caminho do arquivo de saída (texto ASCII, para INCLUDE no deck do simulador)
+        :param palavras: Palavras-chave gravadas, de PALAVRAS
+        :param digitos: Algarismos significativos dos números
+        :param ramos: 'todos' (um ramo sub-saturado em cada Rs) ou 'bolha' (só no Rs de Pb, o mínimo exigido)
+        :param registros_por_bloco: Número de registros de Rs formatados de uma vez
+        :param colunas: Nomes das colunas das tabelas; precisam existir Pb, Rs, Bo, Co, uo, Z e ug
+        """
+        for palavra in palavras:
+            if palavra not in self.PALAVRAS:
+                raise ValueError(f'Palavra-chave "{palavra}" não suportada; use uma de {self.PALAVRAS}')
+        if ramos not in ('todos', 'bolha'):
+            raise ValueError('ramos deve ser "todos" ou "bolha"')
+        self.arquivo = arquivo
+        self.palavras = tuple(palavras)
+        self.ramos = ramos
+        self.registros_por_bloco = registros_por_bloco
+        self.numero = f'%{digitos + 7}.{digitos}g'
+        nomes = [nome_e_unidade(c)[0] for c in colunas]
+        self.indices = {nome: nomes.index(nome) for nome in ('Pb', 'Rs', 'Bo', 'Co', 'uo', 'Z', 'ug')}
+        self.n_regioes = 0
+        self._secoes = {palavra: tempfile.TemporaryFile('w+', encoding='ascii') for palavra in self.palavras}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fecha()
+
+    def escreve(self, P, tabela, T=None):
+        """
+        Nota: o Bg do PVDG é recalculado a partir de Z com T em °R (Bg = Psc Z T / (P Tsc), temperaturas absolutas);
+        a coluna Bg da tabela não é usada, porque o nó Bg do grafo recebe T em °F.
+        :param P: Pressões, psia: (n_pressões,) ou (n_fluidos, n_pressões), em ordem crescente
+        :param tabela: (n_pressões, n_colunas) de um fluido ou (n_fluidos, n_pressões, n_colunas) de vários
+        :param T: Temperatura de cada fluido, °F (ou Grandeza): escalar ou (n_fluidos,); obrigatória com PVDG
+        """
+        tabela = np.asarray(tabela, dtype=float)
+        if tabela.ndim == 2:
+            tabela = tabela[np.newaxis]
+        P = np.broadcast_to(np.asarray(P, dtype=float), tabela.shape[:2])
+        if 'PVDG' in self._secoes and T is None:
+            raise ValueError('O PVDG precisa da temperatura de cada fluido (T, °F) para calcular Bg')
+        T_R = np.broadcast_to(converte(np.asarray(valor_em(0 if T is None else T, '°F'), dtype=float), '°F', '°R'),
+                              tabela.shape[:1])
+        for P_fluido, dados, T_fluido in zip(P, tabela, T_R):
+            self.n_regioes += 1
+            if 'PVTO' in self._secoes:
+                with etapa('escreve_pvto', 'exportacao', elementos=dados.shape[0]):
+                    self._escreve_pvto(P_fluido, dados)
+            if 'PVDG' in self._secoes:
+                with etapa('escreve_pvdg', 'exportacao', elementos=dados.shape[0]):
+                    self._escreve_pvdg(P_fluido, dados, T_fluido)
+            if 'PVCDO' in self._secoes:
+                self._escreve_pvcdo(P_fluido, dados)
+
+    def _bolha(self, P, dados):
+        """
+        Nota: quando Pb não é um nó da malha, Bo em Pb vem do primeiro nó acima pela forma exponencial com Co (exata
+        para o Bo sub-saturado da tabela) e uo por extrapolação linear dos dois primeiros nós acima.
+        :return: registros saturados (n, 4: Rs, P, Bo, uo) com o de Pb no fim, e o ramo de Pb (m, 3: P, Bo, uo)
+        """
+        i = self.indices
+        Pb = dados[0, i['Pb']]
+        if not np.any(P > Pb):
+            raise ValueError(f'A malha de pressões precisa passar de Pb ({Pb:.6g} psia) para o ramo sub-saturado')
+        abaixo = P < Pb
+        abaixo[1:] &= P[1:] > P[:-1]  # nós repetidos (limites laterais em Pb)
+        saturados = np.column_stack([dados[abaixo, i['Rs']] / 10 ** 3, P[abaixo], dados[abaixo, i['Bo']],
+                                     dados[abaixo, i['uo']]])
+        acima = P > Pb
+        ramo = np.column_stack([P[acima], dados[acima, i['Bo']], dados[acima, i['uo']]])
+        na_bolha = np.flatnonzero(P == Pb)
+        if na_bolha.size:
+            Bob, uob = dados[na_bolha[-1], i['Bo']], dados[na_bolha[-1], i['uo']]
+        else:
+            Bob = ramo[0, 1] * np.exp(dados[acima, i['Co']][0] * (ramo[0, 0] - Pb))
+            uob = ramo[0, 2] if ramo.shape[0] == 1 else \
+                ramo[0, 2] - (ramo[1, 2] - ramo[0, 2]) / (ramo[1, 0] - ramo[0, 0]) * (ramo[0, 0] - Pb)
+        bolha = [dados[acima, i['Rs']][0] / 10 ** 3, Pb, Bob, uob]
+        return np.vstack([saturados, bolha]), np.vstack([[Pb, Bob, uob], ramo])
+
+    def _escreve_pvto(self, P, dados):
+        registros, ramo = self._bolha(P, dados)
+        secao = self._secoes['PVTO']
+        n = self.numero
+        if self.ramos == 'bolha':
+            linhas = (f'{n} {n} {n} {n} /\n' % tuple(r) for r in registros[:-1].tolist())
+            secao.writelines(linhas)
+            registros = registros[-1:]
+        # Ramo de cada Rs: mesmos ΔP acima da sua pressão de bolha e mesmas razões Bo/Bob e uo/uob do ramo de Pb
+        delta_P = ramo[1:, 0] - ramo[0, 0]
+        razao_Bo = ramo[1:, 1] / ramo[0, 1]
+        razao_uo = ramo[1:, 2] / ramo[0, 2]
+        modelo = f'{n} {n} {n} {n}\n' + f'{" " * len(n % 0)} {n} {n} {n}\n' * (delta_P.size - 1) + \
+            f'{" " * len(n % 0)} {n} {n} {n} /\n'
+        for inicio in range(0, registros.shape[0], self.registros_por_bloco):
+            bloco = registros[inicio:inicio + self.registros_por_bloco]
+            valores = np.empty((bloco.shape[0], 4 + 3 * delta_P.size))
+            valores[:, :4] = bloco
+            valores[:, 4::3] = bloco[:, 1:2] + delta_P
+            valores[:, 5::3] = bloco[:, 2:3] * razao_Bo
+            valores[:, 6::3] = bloco[:, 3:4] * razao_uo
+            secao.write((modelo * bloco.shape[0]) % tuple(valores.ravel().tolist()))
+        secao.write('/\n')
+
+    def _escreve_pvdg(self, P, dados, T_R):
+        i = self.indices
+        com_gas = (dados[:, i['ug']] > 0) & (P > 0)  # acima de Pb a tabela zera as propriedades do gás
+        com_gas[1:] &= P[1:] > P[:-1]
+        Bg = PSC / converte(TSC, '°F', '°R') * dados[com_gas, i['Z']] * T_R / P[com_gas]  # ft³/scf
+        valores = np.column_stack([P[com_gas], Bg * 10 ** 3 / FT3_POR_BBL, dados[com_gas, i['ug']]])
+        secao = self._secoes['PVDG']
+        n = self.numero
+        for inicio in range(0, valores.shape[0], self.registros_por_bloco):
+            bloco = valores[inicio:inicio + self.registros_por_bloco]
+            secao.write((f'{n} {n} {n}\n' * bloco.shape[0]) % tuple(bloco.ravel().tolist()))
+        secao.write('/\n')
+
+    def _escreve_pvcdo(self, P, dados):
+        # Óleo morto com compressibilidade constante: referência em Pb; Cv vem dos dois primeiros nós do ramo
+        _, ramo = self._bolha(P, dados)
+        Co = dados[P > dados[0, self.indices['Pb']], self.indices['Co']][0]
+        Cv = 0.0 if ramo.shape[0] < 2 else np.log(ramo[1, 2] / ramo[0, 2]) / (ramo[1, 0] - ramo[0, 0])
+        n = self.numero
+        self._secoes['PVCDO'].write(f'{n} {n} {n} {n} {n} /\n' % (ramo[0, 0], ramo[0, 1], Co, ramo[0, 2], Cv))
+
+    def fecha(self):
+        if self._secoes is None:
+            return
+        with etapa('concatena_palavras_chave', 'exportacao'):
+            with open(self.arquivo, 'w', encoding='ascii') as saida:
+                saida.write(f'-- Tabelas PVT Black-Oil: {self.n_regioes} regioes (TABDIMS NTPVT = {self.n_regioes})\n')
+                for palavra, secao in self._secoes.items():
+                    saida.write(f'\n{palavra}\n{self.CABECALHOS[palavra]}\n')
+                    secao.seek(0)
+                    shutil.copyfileobj(secao, saida, 2 ** 20)
+                    secao.close()
+        self._secoes = None
+
+
+def le_npz_pvt(arquivo):
+    """
+    :param arquivo: Arquivo .npz gravado por EscritorTabelaPVT
+    :return: caso, P, dados (n_linhas, n_colunas) e dict de metadados
+    """
+    with zipfile.ZipFile(arquivo) as zf:
+        metadados = json.loads(zf.read('metadados.json'))
+        nomes = sorted(n for n in zf.namelist() if n.endswith('.npy'))
+        blocos = {}
+        for nome in nomes:
+            with zf.open(nome) as f:
+                blocos.setdefault(nome.rsplit('_', 1)[0], []).append(np.lib.format.read_array(f))
+    return (np.concatenate(blocos['caso']), np.concatenate(blocos['P']), np.concatenate(blocos['dados']),
+            metadados)
@@ -0,0 +1,166 @@
+"""
+Grafo de dependências das propriedades Black-Oil.
+
+Cada nó declara o que produz (com unidade), qual correlação usa e de onde vem cada atributo que a correlação lê.
+As unidades fazem parte do nome das variáveis (T_F em °F, T_R em °R), então nenhuma correlação depende de alguém ter
+trocado PVT.T antes da chamada. Para um conjunto de saídas pedidas, o grafo calcula apenas os nós necessários, em
+ordem topológica, e cada variável intermediária é calculada uma única vez.
+"""
+
+import numpy as np
+from ClassesBlackOil import BlackOil
+from ClassesInstrumentacao import etapa
+from ClassesUnidades import converte
+
+
+class NoGrafo:
+    def __init__(self, saidas, calcula, entradas, unidades):
+        """
+        :param saidas: Nome (ou tupla de nomes) das variáveis produzidas pelo nó
+        :param calcula: Nome de um método de BlackOil ou uma função comum
+        :param entradas: dict {atributo do BlackOil (ou argumento da função): variável do grafo}; atributos não
+        listados ficam com o valor padrão de BlackOil()
+        :param unidades: Unidade (ou tupla de unidades) de cada saída
+        """
+        self.saidas = (saidas,) if isinstance(saidas, str) else tuple(saidas)
+        self.calcula = calcula
+        self.entradas = dict(entradas)
+        self.unidades = (unidades,) if isinstance(unidades, str) else tuple(unidades)
+
+    def avalia(self, valores, cache=None):
+        """
+        :param valores: dict {variável: valor} já calculadas
+        :param cache: CacheCorrelacoes repassado ao BlackOil
+        :return: tupla com o valor de cada saída
+        """
+        argumentos = {atributo: valores[variavel] for atributo, variavel in self.entradas.items()}
+        if callable(self.calcula):
+            resultado = self.calcula(**argumentos)
+        else:
+            PVT = BlackOil(cache=cache)  # objeto novo: nenhum atributo de um nó vaza para o outro
+            for atributo, valor in argumentos.items():
+                setattr(PVT, atributo, valor)
+            resultado = getattr(PVT, self.calcula)()
+        return resultado if len(self.saidas) > 1 else (resultado,)
+
+
+class GrafoBlackOil:
+    def __init__(self, nos=(), cache=None):
+        """
+        :param nos: Nós do grafo; um nó adicionado depois substitui o que produzia a mesma variável
+        :param cache: CacheCorrelacoes opcional, usado em todas as avaliações
+        """
+        self.nos = {}
+        self.cache = cache
+        for no in nos:
+            self.adiciona(no)
+
+    def adiciona(self, no):
+        for saida in no.saidas:
+            self.nos[saida] = no
+
+    def unidade(self, variavel):
+        """
+        :return: Unidade declarada da variável
+        """
+        no = self.nos[variavel]
+        return no.unidades[no.saidas.index(variavel)]
+
+    def ordem(self, saidas, fornecidas):
+        """
+        :param saidas: Variáveis pedidas
+        :param fornecidas: Variáveis informadas pelo usuário (não são recalculadas)
+        :return: Lista de nós a avaliar, em ordem topológica
+        """
+        ordem = []
+        visitados = set(fornecidas)
+        em_andamento = []
+
+        def visita(variavel):
+            if variavel in visitados:
+                return
+            if variavel in em_andamento:
+                raise ValueError(f'Dependência circular: {" -> ".join(em_andamento + [variavel])}')
+            if variavel not in self.nos:
+                raise ValueError(f'A variável "{variavel}" não foi informada e nenhum nó a calcula')
+            em_andamento.append(variavel)
+            no = self.nos[variavel]
+            for entrada in no.entradas.values():
+                visita(entrada)
+            em_andamento.pop()
+            visitados.update(no.saidas)
+            ordem.append(no)
+
+        for saida in saidas:
+            visita(saida)
+        return ordem
+
+    def avalia(self, saidas, **variaveis):
+        """
+        :param saidas: Variáveis pedidas (ex.: ('Bo', 'uo'))
+        :param variaveis: Entradas do fluido (ex.: P=..., dg=..., do=..., Pb=..., T_F=...)
+        :return: dict {saída: valor}
+        """
+        valores = dict(variaveis)
+        for no in self.ordem(saidas, variaveis):
+            with etapa(','.join(no.saidas), 'no_grafo'):
+                valores.update(zip(no.saidas, no.avalia(valores, self.cache)))
+        return {saida: valores[saida] for saida in saidas}
+
+
+"""------------------------------------------------------------------------------------------------------------------"""
+"Nós da Tabela PVT (mesmas correlações e regras de Black_Oil_Tabela_PVT.py)"
+
+NOS_TABELA_PVT = [
+    # Conversões e propriedades do fluido
+    NoGrafo('API', 'fase_oleo_grau_API_com_do__API__', {'do': 'do'}, 'adimensional'),
+    NoGrafo('do', 'fase_oleo_densidade_relativa_do_oleo_com_API__do__', {'API': 'API'}, 'adimensional'),
+    NoGrafo('T_R', lambda T_F: converte(T_F, '°F', '°R'), {'T_F': 'T_F'}, '°R'),
+    NoGrafo('Mg', 'fase_gas_massa_do_gas__Mg__', {'dg': 'dg'}, 'lb/lbmol'),
+    NoGrafo('dgn', 'fase_gas_densidade_relativa_normalizada_vasquez_e_beggs_1980__dgn__',
+            {'dg': 'dg', 'API': 'API', 'Tsep': 'Tsep', 'Psep': 'Psep'}, 'adimensional'),
+    NoGrafo('Pb', 'pressao_de_bolha_Standing_1947__Pb__', {'API': 'API', 'Rs': 'Rsb', 'dg': 'dg', 'T': 'T_F'}, 'psia'),
+    NoGrafo('acima', lambda P, Pb: P > Pb, {'P': 'P', 'Pb': 'Pb'}, 'máscara'),
+    NoGrafo('P_sat', lambda P, Pb: np.minimum(P, Pb), {'P': 'P', 'Pb': 'Pb'}, 'psia'),
+
+    # Fase óleo
+    NoGrafo('Rs', 'fase_oleo_razao_de_solubilidade_standing_1947_P_menorIgual_Pb__Rs__',
+            {'P': 'P_sat', 'dg': 'dg', 'API': 'API', 'T': 'T_F'}, 'SCF/STB'),
+    NoGrafo('Bob', 'fase_oleo_fator_volume_formacao_de_oleo_standing_1947_P_menorIgual_Pb__Bo__',
+            {'Rs': 'Rs', 'dg': 'dg', 'do': 'do', 'T': 'T_F'}, 'bbl/STB'),
+    NoGrafo('Co_Pb', 'fase_oleo_ompressibilidade_isotermica_oleo_petrosky_e_farshad_1993_P_maiorIgual_Pb__Co__',
+            {'P': 'Pb', 'Rs': 'Rs', 'API': 'API', 'dg': 'dg', 'T': 'T_F'}, '1/psia'),
+    NoGrafo('Bo_sub', 'fase_oleo_fator_volume_formacao_de_oleo_P_maior_Pb__Bo__',
+            {'P': 'P', 'Pb': 'Pb', 'Bob': 'Bob', 'Co': 'Co_Pb'}, 'bbl/STB'),
+    NoGrafo('Bo', lambda acima, Bo_sub, Bob: np.where(acima, Bo_sub, Bob),
+            {'acima': 'acima', 'Bo_sub': 'Bo_sub', 'Bob': 'Bob'}, 'bbl/STB'),
+    NoGrafo('Rho_oleo', 'fase_oleo_massa_especifica_oleo__Rho_oleo__',
+            {'P': 'P_sat', 'Pb': 'Pb', 'Co': 'Co_Pb', 'Bo': 'Bo', 'Rs': 'Rs', 'do': 'do', 'dg': 'dg'}, 'lb/ft³'),
+    NoGrafo('uod', 'fase_oleo_viscosidade_do_oleo_morto_beggs_e_robinson_1975__uo__', {'API': 'API', 'T': 'T_F'},
+            'cP'),
+    NoGrafo('uob', 'fase_oleo_viscosidade_do_oleo_saturado_beggs_e_robinson_1975_P_menorIgual_Pb__uob__',
+            {'Rs': 'Rs', 'uod': 'uod'}, 'cP'),
+    NoGrafo('uo_sub', 'fase_oleo_viscosidade_do_oleo_sub_saturado_beal_standing_1981_P_maiorIgual_Pb__uo__',
+            {'P': 'P', 'Pb': 'Pb', 'uob': 'uob'}, 'cP'),
+    NoGrafo('uo', lambda acima, uo_sub, uob: np.where(acima, uo_sub, uob),
+            {'acima': 'acima', 'uo_sub': 'uo_sub', 'uob': 'uob'}, 'cP'),
+
+    # Fase gás (acima de Pb as propriedades pseudo-reduzidas ficam congeladas em Pb)
+    NoGrafo(('Ppr', 'Tpr', 'Ppc', 'Tpc'), 'fase_gas_pressao_temperatura_pseudocritica__Ppr__Tpr__Ppc__Tpc__',
+            {'dg': 'dg', 'P': 'P_sat', 'T': 'T_R'}, ('adimensional', 'adimensional', 'psia', '°R')),
+    NoGrafo('Z', 'fator_z_correlacao_papay', {'Ppr': 'Ppr', 'Tpr': 'Tpr'}, 'adimensional'),
+    NoGrafo('rho_g_livre', 'fase_gas_massa_especifica_gas__rho_g__', {'P': 'P', 'Mg': 'Mg', 'Z': 'Z', 'T': 'T_R'},
+            'lb/ft³'),
+    NoGrafo('rho_g', lambda acima, rho_g: np.where(acima, 0, rho_g), {'acima': 'acima', 'rho_g': 'rho_g_livre'},
+            'lb/ft³'),  # sem gás livre acima de Pb
+    NoGrafo('ug_livre', 'fase_gas_viscosidade_do_gas_lee__ug__', {'Mg': 'Mg', 'rho_g': 'rho_g', 'T': 'T_R'}, 'cP'),
+    NoGrafo('ug', lambda acima, ug: np.where(acima, 0, ug), {'acima': 'acima', 'ug': 'ug_livre'}, 'cP'),
+    NoGrafo('Bg', 'fase_gas_fator_volume_formacao_de_gas__Bg__', {'P': 'P', 'Z': 'Z', 'T': 'T_F'}, 'm³/m³std'),
+    NoGrafo('Co_sat', 'fase_oleo_compressiblidade_isotermica_oleo_P_menor_Pb__Co__',
+            {'Bo': 'Bo', 'Bg': 'Bg', 'P': 'P', 'Pb': 'Pb', 'dg': 'dg', 'API': 'API', 'T': 'T_F'},
+            '1/psia'),  # Bob = Co = 0: abaixo de Pb, dBo/dP vem apenas da derivada de Rs
+    NoGrafo('Co', lambda P, Pb, Co_sat, Co_Pb: np.where(P < Pb, Co_sat, Co_Pb),
+            {'P': 'P', 'Pb': 'Pb', 'Co_sat': 'Co_sat', 'Co_Pb': 'Co_Pb'}, '1/psia'),
+    NoGrafo('Cg', 'fase_gas_compressibilidade_isotermica_do_gas__Cg__',
+            {'Z': 'Z', 'Tpr': 'Tpr', 'Ppr': 'Ppr', 'Ppc': 'Ppc'}, '1/psia'),
+]
@@ -0,0 +1,224 @@
+"""
+Propagação de incerteza por Monte Carlo nas correlações Black-Oil, com estatísticas em fluxo (memória limitada).
+
+As entradas de laboratório (dg, do, Pb, T, Tsep, Psep, ...) são sorteadas em lotes; cada lote de amostras vira um
+lote de fluidos de gera_tabela_pvt_black_oil, então a tabela inteira de todas as amostras do lote é uma única
+operação (n_amostras × n_pressões) do NumPy. Os lotes não são guardados: cada um alimenta um EsbocoQuantis (um
+esboço de quantis por compactação, vetorizado sobre todos os nós pressão × propriedade) e os acumuladores de média e
+desvio, e é descartado. Com N = 10^6 a memória fica em O(k log(N/k)) valores por nó, em vez de N.
+"""
+
+import numpy as np
+from ClassesInstrumentacao import etapa
+from ClassesTabelaPVT import ENTRADAS_DO_FLUIDO, SAIDAS_TABELA_PVT, gera_tabela_pvt_black_oil
+from ClassesUnidades import valor_em, valores_em
+
+
+DISTRIBUICOES = ('normal', 'uniforme', 'triangular', 'lognormal')
+SAIDAS_INCERTEZA = ('Rs', 'Bo', 'uo', 'Bg')
+QUANTIS_PADRAO = (0.1, 0.5, 0.9)
+# Faixa física de cada entrada; as amostras que caem fora (caudas da normal) são truncadas nela
+LIMITES_DAS_ENTRADAS = {'dg': (10 ** -3, np.inf), 'do': (10 ** -3, np.inf), 'API': (10 ** -3, np.inf),
+                        'Pb': (1, np.inf), 'Rsb': (0, np.inf), 'T': (-459.67, np.inf), 'Tsep': (-459.67, np.inf),
+                        'Psep': (1, np.inf), 'Yn2': (0, 1), 'Yco2': (0, 1), 'Yh2s': (0, 1)}
+
+
+class EsbocoQuantis:
+    def __init__(self, forma, k=1024, semente=None):
+        """
+        Esboço de quantis em fluxo, do tipo compactador (KLL): o nível h guarda até 2k valores por nó, cada um com
+        peso 2^h. Quando um nível enche, ele é ordenado e metade dos valores (os de posição par ou os de posição
+        ímpar, sorteado) sobe para o nível seguinte com o dobro do peso. Todos os nós (ex.: pressões × propriedades)
+        são compactados juntos, com uma ordenação do NumPy ao longo do eixo das amostras.
+        Nota: o erro de posto é da ordem de 1/k (k = 1024 dá ~0.1 % do posto) e não depende de N.
+        :param forma: Forma de um valor amostrado, ex.: (n_pressões, n_propriedades)
+        :param k: Metade da capacidade de cada nível
+        :param semente: Semente do gerador que escolhe a metade mantida em cada compactação
+        """
+        self.forma = tuple(forma)
+        self.k = k
+        self.gerador = np.random.default_rng(semente)
+        self.niveis = []
+        self.n = 0
+
+    def adiciona(self, amostras):
+        """
+        :param amostras: Array (n_amostras, *forma)
+        """
+        amostras = np.asarray(amostras, dtype=float).reshape(-1, int(np.prod(self.forma)))
+        self.n += len(amostras)
+        self._sobe(0, np.ascontiguousarray(amostras.T))  # níveis guardados como (n_nós, m): ordenação contígua
+
+    def _sobe(self, nivel, amostras):
+        while amostras.shape[1]:
+            if nivel == len(self.niveis):
+                self.niveis.append(amostras[:, :0])
+            buffer = np.concatenate([self.niveis[nivel], amostras], axis=1)
+            m = buffer.shape[1]
+            if m < 2 * self.k:
+                self.niveis[nivel] = buffer
+                return
+            par = m - m % 2  # um valor ímpar sobra no nível, com o mesmo peso
+            ordenado = np.sort(buffer[:, :par], axis=1)
+            self.niveis[nivel] = buffer[:, par:]
+            amostras = ordenado[:, self.gerador.integers(2)::2]
+            nivel += 1
+
+    def combina(self, outro):
+        """
+        Nota: junta o esboço de outro processo (ou de outra execução) a este, nível por nível.
+        :param outro: EsbocoQuantis com a mesma forma
+        """
+        if outro.forma != self.forma:
+            raise ValueError(f'Esboços de formas diferentes: {self.forma} e {outro.forma}')
+        self.n += outro.n
+        for nivel, valores in enumerate(outro.niveis):
+            self._sobe(nivel, valores)
+
+    def quantis(self, q):
+        """
+        :param q: Probabilidades de não excedência, entre 0 e 1 (escalar ou sequência)
+        :return: Array (len(q), *forma) com os quantis aproximados
+        """
+        if self.n == 0:
+            raise ValueError('O esboço está vazio; adicione amostras antes de pedir quantis')
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        valores = np.concatenate(self.niveis, axis=1)
+        pesos = np.concatenate([np.full(v.shape[1], 2.0 ** h) for h, v in enumerate(self.niveis)])
+        ordem = np.argsort(valores, axis=1)
+        valores = np.take_along_axis(valores, ordem, axis=1)
+        acumulado = np.cumsum(pesos[ordem], axis=1)
+        posicao = (acumulado[None] < q[:, None, None] * acumulado[None, :, -1:]).sum(axis=2)
+        posicao = np.minimum(posicao, valores.shape[1] - 1)
+        return valores[np.arange(len(valores)), posicao].reshape((len(q),) + self.forma)
+
+    def tamanho(self):
+        """
+        :return: Número de valores guardados por nó
+        """
+        return sum(v.shape[1] for v in self.niveis)
+
+
+def _sorteia(nominal, incerteza, n, gerador):
+    """
+    :param nominal: Valor nominal
+    :param incerteza: Desvio padrão da normal, ou (distribuição, *parâmetros): ('normal', desvio),
+    ('uniforme', mínimo, máximo), ('triangular', mínimo, moda, máximo) ou ('lognormal', desvio relativo)
+    :return: Array (n,)
+    """
+    if np.isscalar(incerteza):
+        incerteza = ('normal', incerteza)
+    distribuicao, *parametros = incerteza
+    if distribuicao == 'normal':
+        return gerador.normal(nominal, parametros[0], n)
+    if distribuicao == 'uniforme':
+        return gerador.uniform(parametros[0], parametros[1], n)
+    if distribuicao == 'triangular':
+        return gerador.triangular(parametros[0], parametros[1], parametros[2], n)
+    if distribuicao == 'lognormal':  # mediana no valor nominal
+        return nominal * gerador.lognormal(0, parametros[0], n)
+    raise ValueError(f'Distribuição "{distribuicao}" desconhecida; use uma de {DISTRIBUICOES}')
+
+
+class IncertezaPVT:
+    def __init__(self, fluido, incertezas, P, saidas=SAIDAS_INCERTEZA, correlacoes=None, quantis=QUANTIS_PADRAO,
+                 k=1024):
+        """
+        Nota: as entradas são sorteadas de forma independente; as colunas de gás (Bg, ug, ...) são zero nas pressões
+        acima da Pb da amostra, como na tabela PVT, então as faixas delas incluem as amostras sem gás livre
+        (fracao_saturada diz quantas amostras têm gás livre em cada pressão).
+        :param fluido: dict com os valores nominais de uma amostra (mesmas entradas de gera_tabela_pvt_black_oil)
+        :param incertezas: dict {entrada: incerteza}, na unidade de UNIDADES_DO_FLUIDO; a incerteza é o desvio
+        padrão de uma normal ou uma tupla (distribuição, *parâmetros), ver DISTRIBUICOES, ex.:
+        {'dg': 0.02, 'Pb': ('uniforme', 2800, 3200), 'T': ('triangular', 115, 122, 130)}
+        :param P: Malha de pressões, psia (ou Grandeza)
+        :param saidas: Saídas da tabela PVT com faixas de incerteza (ver SAIDAS_TABELA_PVT)
+        :param correlacoes: dict {propriedade: nome no REGISTRO_CORRELACOES}
+        :param quantis: Probabilidades de não excedência relatadas por resultado (0.1 -> 'P10')
+        :param k: Precisão do EsbocoQuantis
+        """
+        for chave in incertezas:
+            if chave not in ENTRADAS_DO_FLUIDO:
+                raise ValueError(f'Entrada "{chave}" desconhecida; use uma de {ENTRADAS_DO_FLUIDO}')
+            if chave not in fluido:
+                raise ValueError(f'A entrada "{chave}" tem incerteza mas não tem valor nominal em fluido')
+        for saida in saidas:
+            if saida not in SAIDAS_TABELA_PVT:
+                raise ValueError(f'Saída "{saida}" desconhecida; use uma de {SAIDAS_TABELA_PVT}')
+        self.fluido = {chave: float(valor) for chave, valor in valores_em(fluido).items()}
+        self.incertezas = incertezas
+        self.P = np.asarray(valor_em(P, 'psia'), dtype=float).ravel()
+        self.saidas = tuple(saidas)
+        self.correlacoes = correlacoes
+        self.quantis = tuple(quantis)
+        self.esboco = EsbocoQuantis((self.P.size, len(self.saidas)), k)
+        self.media = np.zeros((self.P.size, len(self.saidas)))
+        self.M2 = np.zeros_like(self.media)  # soma dos quadrados dos desvios em relação à média
+        self.minimo = np.full_like(self.media, np.inf)
+        self.maximo = np.full_like(self.media, -np.inf)
+        self.saturadas = np.zeros(self.P.size)
+        self.invalidas = 0
+
+    def amostra(self, n, gerador):
+        """
+        :param n: Número de amostras
+        :param gerador: np.random.Generator
+        :return: dict {entrada: array (n,)}, com as entradas sem incerteza repetidas no valor nominal
+        """
+        amostras = {}
+        for chave, nominal in self.fluido.items():
+            if chave in self.incertezas:
+                minimo, maximo = LIMITES_DAS_ENTRADAS.get(chave, (-np.inf, np.inf))
+                amostras[chave] = np.clip(_sorteia(nominal, self.incertezas[chave], n, gerador), minimo, maximo)
+            else:
+                amostras[chave] = np.full(n, nominal)
+        return amostras
+
+    def executa(self, n, tamanho_lote=10000, semente=None):
+        """
+        Nota: pode ser chamado de novo para somar mais amostras às mesmas estatísticas. A memória usada por lote é
+        tamanho_lote × n_pressões × len(SAIDAS_TABELA_PVT) valores, independente de n.
+        :param n: Número de amostras
+        :param tamanho_lote: Amostras avaliadas por chamada de gera_tabela_pvt_black_oil
+        :param semente: Semente do sorteio das entradas
+        :return: self
+        """
+        gerador = np.random.default_rng(semente)
+        indices = [SAIDAS_TABELA_PVT.index(saida) for saida in self.saidas]
+        saidas = sorted(set(self.saidas) | {'Pb'}, key=SAIDAS_TABELA_PVT.index)
+        for inicio in range(0, n, tamanho_lote):
+            with etapa('incerteza_lote', 'monte_carlo', amostras=min(tamanho_lote, n - inicio)):
+                amostras = self.amostra(min(tamanho_lote, n - inicio), gerador)
+                tabela = gera_tabela_pvt_black_oil(amostras, self.P, saidas, self.correlacoes)
+                self._acumula(tabela[..., [saidas.index(s) for s in self.saidas]], tabela[..., saidas.index('Pb')])
+        return self
+
+    def _acumula(self, valores, Pb):
+        validas = np.isfinite(valores).all(axis=(1, 2))  # amostra fora do domínio de alguma correlação
+        self.invalidas += int((~validas).sum())
+        valores, Pb = valores[validas], Pb[validas]
+        if not len(valores):
+            return
+        # média e variância do lote combinadas com as acumuladas (Chan et al.), sem somar quadrados brutos
+        n_anterior, n_lote = self.esboco.n, len(valores)
+        media_lote = valores.mean(axis=0)
+        delta = media_lote - self.media
+        total = n_anterior + n_lote
+        self.media = self.media + delta * (n_lote / total)
+        self.M2 += ((valores - media_lote) ** 2).sum(axis=0) + delta ** 2 * (n_anterior * n_lote / total)
+        self.esboco.adiciona(valores)
+        self.minimo = np.minimum(self.minimo, valores.min(axis=0, initial=np.inf))
+        self.maximo = np.maximum(self.maximo, valores.max(axis=0, initial=-np.inf))
+        self.saturadas += (self.P <= Pb).sum(axis=0)
+
+    def resultado(self):
+        """
+        :return: dict com arrays (n_pressões, len(saidas)): um 'P<nn>' por quantil (P10 = quantil 0.10), 'media',
+        'desvio', 'minimo' e 'maximo'; mais 'fracao_saturada' (n_pressões,), 'amostras' e 'invalidas'
+        """
+        n = self.esboco.n
+        resultado = {f'P{100 * q:g}': valor for q, valor in zip(self.quantis, self.esboco.quantis(self.quantis))}
+        resultado.update({'media': self.media, 'desvio': np.sqrt(self.M2 / max(n - 1, 1)),
+                          'minimo': self.minimo, 'maximo': self.maximo, 'fracao_saturada': self.saturadas / n,
+                          'amostras': n, 'invalidas': self.invalidas})
+        return resultado
@@ -0,0 +1,226 @@
+"""
+Instrumentação opcional da avaliação Black-Oil: chamadas, tempo, iterações e falhas de convergência.
+
+Desligada por padrão: os pontos instrumentados (correlações de BlackOil via _memoriza, _newton_vetorizado,
+_raiz_intervalo_vetorizada, conversões de unidade, nós do grafo e etapas da tabela PVT e da exportação) só testam se
+ATIVA é None. Para medir, basta um bloco with:
+
+    with Instrumentacao() as instrumentacao:
+        gera_tabela_pvt_black_oil(fluidos, P)
+    print(instrumentacao.texto())
+    instrumentacao.exporta_chrome_trace('perfil.json')  # abrir em chrome://tracing ou ui.perfetto.dev
+
+O tempo de cada item é total (com o que ele chama) e próprio (sem os itens medidos dentro dele), então o próprio
+aponta onde o tempo realmente vai. As iterações e falhas dos métodos de raiz são somadas no item do próprio método e
+na correlação que o chamou.
+
+A instrumentação ligada vale para todas as threads (ex.: o executor de ClassesServicoPVT): cada thread tem a sua
+pilha de itens abertos, os totais e os eventos são atualizados sob uma trava e cada evento leva a thread que o gerou.
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+
+ATIVA = None  # Instrumentacao ligada no momento (None: desligada)
+_NADA = contextlib.nullcontext()
+
+
+class Instrumentacao:
+    def __init__(self, eventos=True, max_eventos=10 ** 6):
+        """
+        :param eventos: Se True, guarda cada chamada medida para exportar o Chrome trace
+        :param max_eventos: Número máximo de eventos guardados; os seguintes só entram nas estatísticas
+        """
+        self.estatisticas = {}  # (categoria, nome) -> dict com os totais
+        self.eventos = []  # (nome, categoria, início [s], duração [s], argumentos, thread)
+        self.guarda_eventos = eventos
+        self.max_eventos = max_eventos
+        self.eventos_descartados = 0
+        self.origem = time.perf_counter()
+        self._local = threading.local()
+        self._trava = threading.Lock()
+        self._anterior = None
+
+    @property
+    def _pilha(self):
+        # itens abertos da thread atual: [chave, tempo dos itens medidos dentro dele]
+        pilha = getattr(self._local, 'pilha', None)
+        if pilha is None:
+            pilha = self._local.pilha = []
+        return pilha
+
+    def __enter__(self):
+        return self.liga()
+
+    def __exit__(self, *excecao):
+        self.desliga()
+
+    def liga(self):
+        global ATIVA
+        self._anterior, ATIVA = ATIVA, self
+        return self
+
+    def desliga(self):
+        global ATIVA
+        ATIVA, self._anterior = self._anterior, None
+
+    def _totais(self, chave):
+        # chamado com self._trava adquirida
+        if chave not in self.estatisticas:
+            self.estatisticas[chave] = {'chamadas': 0, 'tempo_s': 0.0, 'tempo_proprio_s': 0.0, 'elementos': 0,
+                                        'iteracoes': 0, 'falhas': 0}
+        return self.estatisticas[chave]
+
+    @contextlib.contextmanager
+    def mede(self, nome, categoria, **argumentos):
+        """
+        :param nome: Nome do item (correlação, etapa, ...)
+        :param categoria: Categoria do item (ex.: 'correlacao', 'raiz', 'etapa')
+        :param argumentos: Guardados no evento do Chrome trace
+        """
+        chave = (categoria, nome)
+        aberto = [chave, 0.0]
+        pilha = self._pilha
+        pilha.append(aberto)
+        inicio = time.perf_counter()
+        try:
+            yield argumentos
+        finally:
+            duracao = time.perf_counter() - inicio
+            pilha.pop()
+            if pilha:
+                pilha[-1][1] += duracao
+            with self._trava:
+                totais = self._totais(chave)
+                totais['chamadas'] += 1
+                totais['tempo_s'] += duracao
+                totais['tempo_proprio_s'] += duracao - aberto[1]
+                totais['elementos'] += int(argumentos.get('elementos', 0))
+                self._guarda_evento(nome, categoria, inicio, duracao, argumentos)
+
+    def _guarda_evento(self, nome, categoria, inicio, duracao, argumentos):
+        # chamado com self._trava adquirida
+        if not self.guarda_eventos:
+            return
+        if len(self.eventos) >= self.max_eventos:
+            self.eventos_descartados += 1
+            return
+        self.eventos.append((nome, categoria, inicio - self.origem, duracao, dict(argumentos), threading.get_ident()))
+
+    def registra_raiz(self, nome, inicio, iteracoes, convergido):
+        """
+        :param nome: Nome do método de raiz (ex.: '_newton_vetorizado')
+        :param inicio: time.perf_counter() no início da busca
+        :param iteracoes: Número de iterações de cada elemento
+        :param convergido: Máscara de convergência de cada elemento
+        """
+        duracao = time.perf_counter() - inicio
+        iteracoes = np.asarray(iteracoes)
+        argumentos = {'elementos': int(iteracoes.size), 'iteracoes': int(iteracoes.sum()),
+                      'iteracoes_max': int(iteracoes.max(initial=0)),
+                      'falhas': int(np.size(convergido) - np.count_nonzero(convergido))}
+        pilha = self._pilha
+        if pilha:
+            pilha[-1][1] += duracao
+        with self._trava:
+            totais = self._totais(('raiz', nome))
+            totais['chamadas'] += 1
+            totais['tempo_s'] += duracao
+            totais['tempo_proprio_s'] += duracao
+            totais['elementos'] += argumentos['elementos']
+            totais['iteracoes'] += argumentos['iteracoes']
+            totais['falhas'] += argumentos['falhas']
+            if pilha:  # a correlação que chamou o método de raiz
+                chamador = self._totais(pilha[-1][0])
+                chamador['iteracoes'] += argumentos['iteracoes']
+                chamador['falhas'] += argumentos['falhas']
+            self._guarda_evento(nome, 'raiz', inicio, duracao, argumentos)
+
+    def resumo(self, ordem='tempo_proprio_s'):
+        """
+        :param ordem: Coluna usada para ordenar, do maior para o menor
+        :return: Lista de dicts (categoria, nome, chamadas, tempo_s, tempo_proprio_s, tempo_medio_s, elementos,
+        iteracoes, falhas), um por item medido
+        """
+        with self._trava:
+            estatisticas = [(chave, dict(totais)) for chave, totais in self.estatisticas.items()]
+        linhas = []
+        for (categoria, nome), totais in estatisticas:
+            linha = {'categoria': categoria, 'nome': nome}
+            linha.update(totais)
+            linha['tempo_medio_s'] = totais['tempo_s'] / max(totais['chamadas'], 1)
+            linhas.append(linha)
+        return sorted(linhas, key=lambda linha: -linha[ordem])
+
+    def texto(self, n_linhas=30):
+        """
+        :param n_linhas: Número máximo de itens listados
+        :return: Tabela em texto com os itens de maior tempo próprio
+        """
+        linhas = self.resumo()[:n_linhas]
+        largura = max([len(linha['nome']) for linha in linhas] + [4])
+        texto = [f'{"categoria":<12} {"nome":<{largura}} {"chamadas":>9} {"total [s]":>11} {"próprio [s]":>11} '
+                 f'{"elementos":>11} {"iterações":>11} {"falhas":>8}']
+        for linha in linhas:
+            texto.append(f'{linha["categoria"]:<12} {linha["nome"]:<{largura}} {linha["chamadas"]:>9} '
+                         f'{linha["tempo_s"]:>11.4g} {linha["tempo_proprio_s"]:>11.4g} {linha["elementos"]:>11} '
+                         f'{linha["iteracoes"]:>11} {linha["falhas"]:>8}')
+        return '\n'.join(texto)
+
+    def chrome_trace(self):
+        """
+        :return: dict no formato Trace Event do Chrome (eventos completos 'X', tempos em µs)
+        """
+        pid = os.getpid()
+        with self._trava:
+            eventos = [{'name': nome, 'cat': categoria, 'ph': 'X', 'ts': inicio * 10 ** 6, 'dur': duracao * 10 ** 6,
+                        'pid': pid, 'tid': tid, 'args': argumentos}
+                       for nome, categoria, inicio, duracao, argumentos, tid in self.eventos]
+        return {'traceEvents': eventos, 'displayTimeUnit': 'ms',
+                'otherData': {'eventos_descartados': self.eventos_descartados}}
+
+    def exporta_chrome_trace(self, arquivo):
+        """
+        :param arquivo: Caminho do JSON de saída (abrir em chrome://tracing ou ui.perfetto.dev)
+        """
+        with open(arquivo, 'w', encoding='utf-8') as saida:
+            json.dump(self.chrome_trace(), saida)
+
+    def exporta_resumo(self, arquivo):
+        """
+        :param arquivo: Caminho do JSON de saída, com a lista de resumo()
+        """
+        with open(arquivo, 'w', encoding='utf-8') as saida:
+            json.dump(self.resumo(), saida, indent=1, ensure_ascii=False)
+
+
+def etapa(nome, categoria='etapa', **argumentos):
+    """
+    :return: Contexto que mede o bloco na instrumentação ativa (sem custo além de um teste quando desligada)
+    """
+    if ATIVA is None:
+        return _NADA
+    return ATIVA.mede(nome, categoria, **argumentos)
+
+
+def instrumentada(categoria):
+    """
+    Nota: decorador para funções comuns; as correlações de BlackOil já são medidas por _memoriza.
+    :param categoria: Categoria dos itens medidos (ex.: 'conversao')
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            if ATIVA is None:
+                return funcao(*args, **kwargs)
+            with ATIVA.mede(funcao.__name__, categoria):
+                return funcao(*args, **kwargs)
+        return medida
+    return decorador
@@ -0,0 +1,240 @@
+"""
+Tabela PVT Black-Oil em uma única passada pela memória (núcleo fundido).
+
+O caminho por métodos (gera_tabela_pvt_black_oil) avalia cada correlação sobre a malha inteira e grava um array
+intermediário por variável do grafo, recalculando termos comuns como 10 ** (0.0125 * API - 0.00091 * T). Aqui o que
+depende só do fluido é calculado uma vez por amostra (pelos próprios métodos de BlackOil) e o que depende da pressão
+fica em EXPRESSOES_POR_NO, uma lista de passos escrita uma única vez e executada por um de dois motores:
+
+    - numba: os passos viram um laço compilado por nó, paralelo entre fluidos, que grava as 11 colunas da linha de
+      uma vez;
+    - numpy: os passos são avaliados em blocos da malha pequenos o bastante para que os intermediários fiquem no
+      cache, e só as 11 colunas de saída vão para a memória.
+
+Os dois usam as mesmas correlações e regras de Black_Oil_Tabela_PVT.py (as mesmas de gera_tabela_pvt_black_oil com
+as correlações padrão) e numba é opcional: sem ele, o motor numpy é usado.
+
+Nota: não há motor numexpr. Avaliado passo a passo em blocos, como o numpy, ele foi mais lento que o próprio numpy
+(cada passo é uma chamada de numexpr.evaluate e grava um intermediário, e as potências de expoente fracionário
+dominam o custo). Em uma máquina de 1 núcleo (python ClassesKernelFundido.py, 200 fluidos × 5000 pressões):
+métodos 2.9e6 nós/s, numpy 6.1e6, numba 3.9e6 (numexpr 2.3e6). O ganho do numba vem do paralelismo entre fluidos,
+e com um núcleo ele fica atrás do numpy; meça com mede_vazao antes de escolher o motor.
+"""
+
+import ast
+import math
+import re
+import time
+
+import numpy as np
+from ClassesBlackOil import BlackOil
+from ClassesInstrumentacao import etapa
+from ClassesTabelaPVT import SAIDAS_TABELA_PVT, _coluna_do_fluido, gera_tabela_pvt_black_oil
+from ClassesUnidades import converte, valor_em
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+MOTORES = ('numba', 'numpy')
+MOTORES_DISPONIVEIS = tuple(m for m, modulo in zip(MOTORES, (numba, np)) if modulo is not None)
+
+# Constantes de cada fluido usadas pelos passos por nó (ver _constantes_do_fluido)
+CONSTANTES_DO_FLUIDO = ('Pb', 'dg', 'do', 'T', 'F', 'raiz_dg_do', 'KCo', 'uod', 'Mg', 'TR', 'Ppc', 'a1', 'a2',
+                        'xv', 'yv', 'kv')
+
+# Passos por nó, na ordem de avaliação; cada um pode usar P, as constantes do fluido e os passos anteriores.
+# Só where, exp e sqrt, com a grafia do NumPy (no numba, ver _ParaEscalar).
+EXPRESSOES_POR_NO = [
+    ('acima', 'P > Pb'),
+    ('Ps', 'where(P < Pb, P, Pb)'),  # acima de Pb, as propriedades de saturação ficam congeladas em Pb
+    ('Rs', 'dg * ((Ps / 18.2 + 1.4) * F) ** (1 / 0.83)'),
+    ('Bob', '0.9759 + 0.00012 * (Rs * raiz_dg_do + 1.25 * T) ** 1.2'),
+    ('Co_Pb', 'KCo * Rs ** 0.69357'),
+    ('Bo', 'where(acima, Bob * exp(-Co_Pb * (P - Pb)), Bob)'),
+    ('Rho_oleo', '(62.4 * do + 0.0136 * Rs * dg) / Bo'),
+    ('uob', '10.715 * (Rs + 100) ** -0.515 * uod ** (5.44 * (Rs + 150) ** -0.338)'),
+    ('uo', 'where(acima, uob + 0.001 * (P - Pb) * (0.024 * uob ** 1.6 + 0.038 * uob ** 0.56), uob)'),
+    ('Ppr', 'Ps / Ppc'),
+    ('Z', '1 - a1 * Ppr + a2 * Ppr ** 2'),
+    ('rho_g', 'where(acima, 0.0, P * Mg / (Z * 10.73 * TR))'),
+    ('ug', 'where(acima, 0.0, 0.0001 * kv * exp(xv * (rho_g / 62.4) ** yv))'),
+    ('Bg', '14.7 / 60 * (Z * T / P)'),
+    ('dRs_dP', 'dg / 0.83 * ((P / 18.2 + 1.4) * F) ** (1 / 0.83 - 1) * F / 18.2'),
+    ('Co', 'where(P < Pb, Bg / Bo * dRs_dP, Co_Pb)'),
+    ('Cg', '(1 / Ppr - (2 * a2 * Ppr - a1) / Z) / Ppc'),
+]
+
+
+def _constantes_do_fluido(fluidos):
+    """
+    Nota: as propriedades que não dependem da pressão saem dos métodos de BlackOil, uma vez por amostra.
+    :param fluidos: Mesmas entradas de gera_tabela_pvt_black_oil
+    :return: dict {constante: array (n_fluidos,)} com as chaves de CONSTANTES_DO_FLUIDO
+    """
+    PVT = BlackOil()
+    PVT.dg = _coluna_do_fluido(fluidos, 'dg').ravel()
+    if 'API' in fluidos:
+        PVT.API = _coluna_do_fluido(fluidos, 'API').ravel()
+        PVT.do = PVT.fase_oleo_densidade_relativa_do_oleo_com_API__do__()
+    else:
+        PVT.do = _coluna_do_fluido(fluidos, 'do').ravel()
+        PVT.API = PVT.fase_oleo_grau_API_com_do__API__()
+    T = _coluna_do_fluido(fluidos, 'T').ravel()
+    TR = converte(T, '°F', '°R')
+    n = max(PVT.dg.size, PVT.do.size, T.size)
+
+    PVT.T = T
+    Pb = _coluna_do_fluido(fluidos, 'Pb').ravel() if 'Pb' in fluidos else np.full(n, np.nan)
+    if np.isnan(Pb).any():
+        PVT.Rs = _coluna_do_fluido(fluidos, 'Rsb').ravel()
+        Pb = np.where(np.isnan(Pb), PVT.pressao_de_bolha_Standing_1947__Pb__(), Pb)
+    uod = PVT.fase_oleo_viscosidade_do_oleo_morto_beggs_e_robinson_1975__uo__()
+    Mg = PVT.fase_gas_massa_do_gas__Mg__()
+    PVT.P, PVT.T = 0, TR
+    _, Tpr, Ppc, Tpc = PVT.fase_gas_pressao_temperatura_pseudocritica__Ppr__Tpr__Ppc__Tpc__()
+
+    dg, do, API = PVT.dg, PVT.do, PVT.API
+    xv = 3.448 + (986.4 / TR) + 0.01009 * Mg  # parte da viscosidade de Lee que só depende do fluido
+    constantes = {
+        'Pb': Pb, 'dg': dg, 'do': do, 'T': T, 'TR': TR, 'uod': uod, 'Mg': Mg, 'Ppc': Ppc,
+        'F': 10 ** (0.0125 * API - 0.00091 * T),
+        'raiz_dg_do': (dg / do) ** 0.5,
+        'KCo': 1.705 * 10 ** -7 * dg ** 0.1885 * API ** 0.3272 * T ** 0.6729 * Pb ** -0.5906,
+        'a1': 3.53 / 10 ** (0.9813 * Tpr),
+        'a2': 0.274 / 10 ** (0.8157 * Tpr),
+        'xv': xv,
+        'yv': 2.4 - 0.2 * xv,
+        'kv': ((9.379 + 0.0160 * Mg) * TR ** 1.5) / (209.2 + 19.26 * Mg + TR),
+    }
+    return {chave: np.ascontiguousarray(np.broadcast_to(valor, (n,)), dtype=float)
+            for chave, valor in constantes.items()}
+
+
+def tabela_pvt_fundida(fluidos, P, motor=None, tamanho_bloco=2 ** 14):
+    """
+    :param fluidos: Mesmas entradas de gera_tabela_pvt_black_oil
+    :param P: Malha de pressões, psia. 1-D (comum a todos os fluidos) ou 2-D (uma linha por fluido)
+    :param motor: 'numba' ou 'numpy'; None usa o primeiro de MOTORES_DISPONIVEIS
+    :param tamanho_bloco: Número de nós por bloco no motor numpy
+    :return: Array (n_fluidos, n_pressões, 11) na ordem de COLUNAS_TABELA_PVT, igual ao de gera_tabela_pvt_black_oil
+    """
+    motor = motor or MOTORES_DISPONIVEIS[0]
+    if motor not in MOTORES_DISPONIVEIS:
+        raise ValueError(f'Motor "{motor}" indisponível; use um de {MOTORES_DISPONIVEIS}')
+    with etapa('constantes_do_fluido'):
+        constantes = _constantes_do_fluido(fluidos)
+    P = np.atleast_2d(np.asarray(valor_em(P, 'psia'), dtype=float))
+    n_fluidos = constantes['Pb'].size
+    saida = np.empty((n_fluidos, P.shape[1], len(SAIDAS_TABELA_PVT)))
+
+    if motor == 'numba':
+        with etapa('nucleo_numba'):
+            _kernel_numba()(P, int(P.shape[0] > 1), *(constantes[c] for c in CONSTANTES_DO_FLUIDO), saida)
+        return saida
+
+    # blocos de ~tamanho_bloco nós: os passos intermediários de um bloco cabem no cache
+    n_colunas = min(P.shape[1], tamanho_bloco)
+    n_linhas = max(1, tamanho_bloco // n_colunas)
+    for i in range(0, n_fluidos, n_linhas):
+        linhas = slice(i, i + n_linhas)
+        for j in range(0, P.shape[1], n_colunas):
+            bloco = (linhas, slice(j, j + n_colunas))
+            variaveis = {c: v[linhas, None] for c, v in constantes.items()}
+            variaveis['P'] = P[bloco] if P.shape[0] > 1 else P[:, bloco[1]]
+            with np.errstate(all='ignore'), etapa('nucleo_numpy'):
+                for nome, codigo in _passos_compilados():
+                    variaveis[nome] = eval(codigo, _FUNCOES_NUMPY, variaveis)
+            for k, nome in enumerate(SAIDAS_TABELA_PVT):
+                saida[bloco + (k,)] = variaveis[nome]
+    return saida
+
+
+"""------------------------------------------------------------------------------------------------------------------"""
+"Motores"
+
+_FUNCOES_NUMPY = {'where': np.where, 'exp': np.exp, 'sqrt': np.sqrt}
+_COMPILADOS = {}
+
+
+def _passos_compilados():
+    if 'passos' not in _COMPILADOS:
+        _COMPILADOS['passos'] = [(nome, compile(expressao, nome, 'eval'))
+                                for nome, expressao in EXPRESSOES_POR_NO]
+    return _COMPILADOS['passos']
+
+
+class _ParaEscalar(ast.NodeTransformer):
+    """
+    Reescreve um passo de EXPRESSOES_POR_NO para um nó escalar: where(c, a, b) vira a if c else b, que só avalia o
+    ramo escolhido (acima de Pb, por exemplo, uob ** 1.6 não é calculado abaixo de Pb), e exp/sqrt vêm de math.
+    """
+    def visit_Call(self, no):
+        self.generic_visit(no)
+        if no.func.id == 'where':
+            return ast.IfExp(test=no.args[0], body=no.args[1], orelse=no.args[2])
+        return ast.Call(func=ast.Attribute(value=ast.Name('math', ast.Load()), attr=no.func.id, ctx=ast.Load()),
+                        args=no.args, keywords=[])
+
+
+def _kernel_numba():
+    """
+    Nota: o laço é gerado a partir de EXPRESSOES_POR_NO e compilado na primeira chamada. error_model='numpy' faz
+    divisões por zero e potências inválidas darem inf/NaN, como no NumPy; passo_P é 0 quando a malha de pressões é
+    comum a todos os fluidos.
+    """
+    if 'numba' not in _COMPILADOS:
+        passos = [f'{nome} = ' + ast.unparse(_ParaEscalar().visit(ast.parse(expressao, mode='eval')))
+                  for nome, expressao in EXPRESSOES_POR_NO]
+        constantes = re.compile(r'\b(' + '|'.join(CONSTANTES_DO_FLUIDO) + r')\b')
+        linhas = [f'def kernel(Pmalha, passo_P, {", ".join(CONSTANTES_DO_FLUIDO)}, saida):',
+                  '    for i in prange(saida.shape[0]):',
+                  '        linha_P = i * passo_P',
+                  '        for j in range(saida.shape[1]):',
+                  '            P = Pmalha[linha_P, j]']
+        linhas += ['            ' + constantes.sub(r'\1[i]', passo) for passo in passos]
+        linhas += [f'            saida[i, j, {k}] = {nome}' + ('[i]' if nome in CONSTANTES_DO_FLUIDO else '')
+                   for k, nome in enumerate(SAIDAS_TABELA_PVT)]
+        espaco = {'math': math, 'prange': numba.prange}
+        exec('\n'.join(linhas), espaco)
+        _COMPILADOS['numba'] = numba.njit(parallel=True, error_model='numpy')(espaco['kernel'])
+    return _COMPILADOS['numba']
+
+
+"""------------------------------------------------------------------------------------------------------------------"""
+"Desempenho"
+
+
+def mede_vazao(fluidos, P, motores=MOTORES_DISPONIVEIS, repeticoes=3):
+    """
+    Nota: a primeira chamada de cada motor (compilação do numba) fica fora da medição.
+    :param fluidos: Mesmas entradas de gera_tabela_pvt_black_oil
+    :param P: Malha de pressões, psia
+    :param motores: Motores do núcleo fundido a medir
+    :param repeticoes: Número de repetições; vale o menor tempo
+    :return: dict {'metodos' ou motor: nós por segundo}, 'metodos' sendo gera_tabela_pvt_black_oil
+    """
+    funcoes = {'metodos': lambda: gera_tabela_pvt_black_oil(fluidos, P)}
+    for motor in motores:
+        funcoes[motor] = lambda motor=motor: tabela_pvt_fundida(fluidos, P, motor)
+
+    vazao = {}
+    for nome, funcao in funcoes.items():
+        nos = funcao().shape[0] * np.atleast_2d(P).shape[1]
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            funcao()
+            tempos.append(time.perf_counter() - inicio)
+        vazao[nome] = nos / min(tempos)
+    return vazao
+
+
+if __name__ == '__main__':
+    amostras = np.random.default_rng(0)
+    fluidos = {'dg': amostras.uniform(0.6, 1.0, 200), 'do': amostras.uniform(0.8, 0.92, 200),
+               'Rsb': amostras.uniform(200, 1200, 200), 'T': amostras.uniform(120, 250, 200)}
+    for nome, nos_por_segundo in mede_vazao(fluidos, np.linspace(14, 7000, 5000)).items():
+        print(f'{nome:>8}: {nos_por_segundo:.3g} nós/s')
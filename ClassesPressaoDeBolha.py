@@ -0,0 +1,134 @@
+"""
+Ponto de bolha em lote: Pb a partir de Rsb, Rsb a partir de um Pb medido e a curva Rs(P) coerente com os dois.
+
+As correlações de Pb da classe BlackOil levam Rs em Pb; o caminho inverso (Rsb que reproduz o Pb de laboratório)
+é resolvido para todas as amostras de uma vez com _raiz_intervalo_vetorizada, sem laço por amostra. Cada correlação
+de Pb tem a correlação de Rs da mesma família, usada para a curva Rs(P) abaixo de Pb.
+"""
+
+import numpy as np
+from ClassesBlackOil import BlackOil, _raiz_intervalo_vetorizada
+from ClassesInstrumentacao import instrumentada
+from ClassesRegistroCorrelacoes import REGISTRO_CORRELACOES
+from ClassesUnidades import UNIDADES_DO_FLUIDO, converte, valor_em, valores_em
+
+
+# correlação: (método de Pb, método de Rs da mesma família, unidade de T que a correlação espera)
+CORRELACOES_PB = {nome: (REGISTRO_CORRELACOES.busca('Pb', nome).metodo, REGISTRO_CORRELACOES.busca('Rs', nome).metodo,
+                         REGISTRO_CORRELACOES.busca('Pb', nome).entradas['T'])
+                  for nome in REGISTRO_CORRELACOES.nomes('Pb')}
+RS_MAXIMO = 10 ** 5  # SCF/STB, limite superior do intervalo de busca de Rsb
+
+
+def _fluido_em_lote(fluidos, correlacao):
+    """
+    :param fluidos: dict ou DataFrame, uma entrada por amostra: dg, do (ou API), T [°F] e, para Vasquez & Beggs,
+    Tsep [°F] e Psep [psia]; valores em Grandeza são convertidos para essas unidades
+    :param correlacao: Chave de CORRELACOES_PB
+    :return: BlackOil com as propriedades das amostras em arrays 1-D e T na unidade da correlação
+    """
+    if correlacao not in CORRELACOES_PB:
+        raise ValueError(f'Correlação "{correlacao}" desconhecida; use uma de {tuple(CORRELACOES_PB)}')
+    PVT = BlackOil()
+    PVT.dg = np.atleast_1d(np.asarray(fluidos['dg'], dtype=float))
+    if 'API' in fluidos:
+        PVT.API = np.atleast_1d(np.asarray(fluidos['API'], dtype=float))
+    else:
+        PVT.do = np.atleast_1d(np.asarray(fluidos['do'], dtype=float))
+        PVT.API = PVT.fase_oleo_grau_API_com_do__API__()
+    T = np.atleast_1d(np.asarray(valor_em(fluidos['T'], '°F'), dtype=float))
+    PVT.T = converte(T, '°F', CORRELACOES_PB[correlacao][2])
+    if correlacao == 'vasquez_e_beggs':
+        PVT.Tsep = np.atleast_1d(np.asarray(valor_em(fluidos['Tsep'], '°F'), dtype=float))
+        PVT.Psep = np.atleast_1d(np.asarray(valor_em(fluidos['Psep'], 'psia'), dtype=float))
+        PVT.dgn = PVT.fase_gas_densidade_relativa_normalizada_vasquez_e_beggs_1980__dgn__()
+    return PVT
+
+
+def pressao_de_bolha_em_lote(fluidos, Rsb, correlacao='standing'):
+    """
+    :param fluidos: Propriedades das amostras (ver _fluido_em_lote)
+    :param Rsb: Razão de solubilidade em Pb de cada amostra, SCF/STB
+    :param correlacao: Chave de CORRELACOES_PB
+    :return: Pressão de bolha de cada amostra, psia
+    """
+    PVT = _fluido_em_lote(fluidos, correlacao)
+    PVT.Rs = np.atleast_1d(np.asarray(valor_em(Rsb, 'SCF/STB'), dtype=float))
+    return getattr(PVT, CORRELACOES_PB[correlacao][0])()
+
+
+@instrumentada('etapa')
+def razao_de_solubilidade_na_bolha_em_lote(fluidos, Pb, correlacao='standing', Parad=10 ** -11, maxit=200):
+    """
+    Nota: Pb(Rs) é crescente nas quatro correlações, então a raiz de Pb(Rsb) - Pb_medido é única em [0, RS_MAXIMO].
+    Em Glasø o intervalo termina no máximo da parábola em log10(A), onde Pb(Rs) deixa de crescer.
+    :param fluidos: Propriedades das amostras (ver _fluido_em_lote)
+    :param Pb: Pressão de bolha medida de cada amostra, psia
+    :param correlacao: Chave de CORRELACOES_PB
+    :param Parad: Critério de parada, variação relativa em %
+    :param maxit: Número máximo de iterações
+    :return: Rsb de cada amostra, SCF/STB (NaN quando a correlação não alcança o Pb medido no intervalo)
+    """
+    PVT = _fluido_em_lote(fluidos, correlacao)
+    Pb = np.atleast_1d(np.asarray(valor_em(Pb, 'psia'), dtype=float))
+    metodo = getattr(PVT, CORRELACOES_PB[correlacao][0])
+    Rs_max = RS_MAXIMO
+    if correlacao == 'glaso':
+        A_max = 10 ** (1.7447 / (2 * 0.30208))
+        Rs_max = np.minimum(RS_MAXIMO, PVT.dg * (A_max * PVT.API ** 0.989 / PVT.T ** 0.172) ** (1 / 0.816))
+
+    propriedades = np.broadcast_arrays(PVT.API, PVT.dg, PVT.T, PVT.dgn, PVT.Tsep, PVT.Psep, Pb)
+
+    def F(Rs, API, dg, T, dgn, Tsep, Psep, Pb_medido):
+        PVT.API, PVT.dg, PVT.T, PVT.dgn, PVT.Tsep, PVT.Psep, PVT.Rs = API, dg, T, dgn, Tsep, Psep, Rs
+        return metodo() - Pb_medido
+
+    Rsb, _, convergido = _raiz_intervalo_vetorizada(F, 0, Rs_max, propriedades, Parad, maxit)
+    return np.where(convergido, Rsb, np.nan)
+
+
+def completa_ponto_de_bolha(fluidos, correlacao='standing'):
+    """
+    Nota: Pb e Rsb são alternativos, como em gera_tabela_pvt_black_oil; cada amostra informa um dos dois (o outro
+    ausente ou NaN) e o que falta é calculado pela correlação escolhida. Amostras com os dois informados ficam como
+    estão.
+    :param fluidos: Propriedades das amostras (ver _fluido_em_lote), com Pb [psia] e/ou Rsb [SCF/STB]
+    :param correlacao: Chave de CORRELACOES_PB
+    :return: Pb [psia] e Rsb [SCF/STB] de cada amostra
+    """
+    fluidos = valores_em(fluidos, UNIDADES_DO_FLUIDO)
+    n = np.atleast_1d(np.asarray(fluidos['dg'], dtype=float)).size
+    Pb = np.broadcast_to(np.asarray(fluidos['Pb'] if 'Pb' in fluidos else np.nan, dtype=float), (n,)).copy()
+    Rsb = np.broadcast_to(np.asarray(fluidos['Rsb'] if 'Rsb' in fluidos else np.nan, dtype=float), (n,)).copy()
+
+    sem_Pb = np.isnan(Pb) & ~np.isnan(Rsb)
+    if sem_Pb.any():
+        lote = {chave: np.broadcast_to(np.asarray(fluidos[chave], dtype=float), (n,))[sem_Pb] for chave in fluidos}
+        Pb[sem_Pb] = pressao_de_bolha_em_lote(lote, Rsb[sem_Pb], correlacao)
+    sem_Rsb = np.isnan(Rsb) & ~np.isnan(Pb)
+    if sem_Rsb.any():
+        lote = {chave: np.broadcast_to(np.asarray(fluidos[chave], dtype=float), (n,))[sem_Rsb] for chave in fluidos}
+        Rsb[sem_Rsb] = razao_de_solubilidade_na_bolha_em_lote(lote, Pb[sem_Rsb], correlacao)
+    return Pb, Rsb
+
+
+def curva_de_razao_de_solubilidade(fluidos, P, correlacao='standing'):
+    """
+    Nota: Rs(P) vem da correlação de Rs da mesma família, multiplicada por Rsb / Rs(Pb), para que a curva passe
+    exatamente pelo par (Pb, Rsb); em Standing e Petrosky & Farshad as duas correlações já são inversas exatas e o
+    fator é 1. Acima de Pb, Rs = Rsb.
+    :param fluidos: Propriedades das amostras, com Pb e/ou Rsb (ver completa_ponto_de_bolha)
+    :param P: Malha de pressões, psia. 1-D (comum a todas as amostras) ou 2-D (uma linha por amostra)
+    :param correlacao: Chave de CORRELACOES_PB
+    :return: Array (n_amostras, n_pressões) com Rs, SCF/STB
+    """
+    Pb, Rsb = completa_ponto_de_bolha(fluidos, correlacao)
+    PVT = _fluido_em_lote(fluidos, correlacao)
+    for atributo in ('API', 'dg', 'T', 'dgn'):
+        setattr(PVT, atributo, np.reshape(getattr(PVT, atributo), (-1, 1)))
+    metodo = getattr(PVT, CORRELACOES_PB[correlacao][1])
+
+    PVT.P = Pb.reshape(-1, 1)
+    fator = Rsb.reshape(-1, 1) / metodo()
+    PVT.P = np.minimum(np.atleast_2d(np.asarray(P, dtype=float)), Pb.reshape(-1, 1))
+    return metodo() * fator
@@ -0,0 +1,260 @@
+"""
+Registro das correlações Black-Oil: (propriedade, nome) -> núcleo vetorizado com entradas, unidades e faixas.
+
+Cada Correlacao declara os atributos que lê (com unidade), a unidade da saída e a faixa dos dados em que foi
+ajustada. A escolha da correlação é feita uma vez por lote: kernel() resolve o método e devolve uma função que
+avalia o array inteiro, então não há if/else por ponto nem nomes longos de métodos no código que chama.
+"""
+
+import numpy as np
+from ClassesBlackOil import BlackOil
+from ClassesGrafoBlackOil import NoGrafo
+from ClassesUnidades import valor_em
+
+
+class Correlacao:
+    def __init__(self, propriedade, nome, metodo, entradas, unidade, faixas=None, constantes=None, indice=None,
+                 impressao=None, derivadas=None):
+        """
+        :param propriedade: Propriedade calculada (ex.: 'Pb', 'Rs', 'Bo', 'uod', 'Z')
+        :param nome: Nome curto da correlação (ex.: 'standing', 'glaso')
+        :param metodo: Nome de um método de BlackOil ou uma função comum f(**entradas)
+        :param entradas: dict {atributo: unidade} com tudo o que a correlação lê
+        :param unidade: Unidade da saída
+        :param faixas: dict {atributo: (mínimo, máximo)}, nas unidades de entradas, dos dados usados no ajuste
+        :param constantes: dict {atributo: valor} fixado antes de cada avaliação (não vem do chamador)
+        :param indice: Posição da propriedade quando o método devolve uma tupla (ex.: Bo, Bob* de Glasø)
+        :param impressao: Texto que identifica o que a correlação calcula (ex.: resumo dos coeficientes ajustados),
+        usado nas chaves de cache; padrão: o nome do método com as constantes e o índice
+        :param derivadas: dict {atributo: f(**entradas)} com a derivada analítica da saída em relação ao atributo;
+        as não informadas vêm de números duais pelo kernel (ver derivada)
+        """
+        self.propriedade = propriedade
+        self.nome = nome
+        self.metodo = metodo
+        self.entradas = dict(entradas)
+        self.unidade = unidade
+        self.faixas = dict(faixas or {})
+        self.constantes = dict(constantes or {})
+        self.indice = indice
+        if impressao is None:
+            impressao = f'{getattr(metodo, "__qualname__", metodo)}|{sorted(self.constantes.items())}|{indice}'
+        self.impressao = impressao
+        self.derivadas = dict(derivadas or {})
+
+        declaradas = getattr(getattr(BlackOil, metodo, None), 'entradas', None) if isinstance(metodo, str) else None
+        if declaradas is not None and set(declaradas) != set(self.entradas) | set(self.constantes):
+            raise ValueError(f'{propriedade}/{nome}: entradas {sorted(self.entradas)} não conferem com as lidas por '
+                             f'{metodo}: {sorted(declaradas)}')
+
+    def kernel(self, cache=None):
+        """
+        :param cache: CacheCorrelacoes repassado ao BlackOil
+        :return: Função f(**entradas) que avalia o lote inteiro; o método é resolvido aqui, uma única vez
+        """
+        if not isinstance(self.metodo, str):
+            return self.metodo
+        funcao = getattr(BlackOil, self.metodo)
+        atributos = tuple(self.entradas.items())
+        constantes = tuple(self.constantes.items())
+        indice = self.indice
+
+        def avalia(**valores):
+            PVT = BlackOil(cache=cache)
+            for atributo, valor in constantes:
+                setattr(PVT, atributo, valor)
+            for atributo, unidade in atributos:
+                setattr(PVT, atributo, valor_em(valores[atributo], unidade))
+            resultado = funcao(PVT)
+            return resultado if indice is None else resultado[indice]
+        return avalia
+
+    def avalia(self, cache=None, **valores):
+        """
+        :param valores: Valor de cada entrada, nas unidades declaradas (escalares ou arrays) ou como Grandeza, que é
+        convertida para a unidade declarada
+        :return: Propriedade calculada, na unidade declarada
+        """
+        return self.kernel(cache)(**valores)
+
+    def derivada(self, atributo, cache=None, **valores):
+        """
+        :param atributo: Entrada em relação à qual derivar (ex.: 'P')
+        :param cache: CacheCorrelacoes repassado ao BlackOil
+        :param valores: Valor de cada entrada, como em avalia (arrays ou NumeroDual)
+        :return: d(propriedade)/d(atributo), nas unidades declaradas
+        """
+        if atributo in self.derivadas:
+            return self.derivadas[atributo](**valores)
+        from ClassesDerivadas import derivada_parcial  # ClassesDerivadas importa a tabela, que importa este módulo
+        return derivada_parcial(self.kernel(cache), atributo, **valores)
+
+    def dentro_da_faixa(self, **valores):
+        """
+        :param valores: Valor das entradas a conferir; entradas sem faixa declarada são ignoradas
+        :return: Máscara (com broadcast entre as entradas) dos pontos dentro da faixa de ajuste da correlação
+        """
+        dentro = np.bool_(True)
+        for atributo, valor in valores.items():
+            if atributo in self.faixas:
+                minimo, maximo = self.faixas[atributo]
+                valor = np.asarray(valor_em(valor, self.entradas.get(atributo)))
+                dentro = dentro & (valor >= minimo) & (valor <= maximo)
+        return dentro
+
+    def no_grafo(self, saida, variaveis=None, cache=None):
+        """
+        Nota: por padrão cada atributo vem da variável de mesmo nome, exceto T, que vem de T_F ou T_R conforme a
+        unidade declarada.
+        :param saida: Variável do grafo produzida pelo nó
+        :param variaveis: dict {atributo: variável do grafo} para os atributos com outro nome no grafo
+        :param cache: CacheCorrelacoes repassado ao BlackOil
+        :return: NoGrafo que avalia esta correlação
+        """
+        ligacoes = {atributo: atributo for atributo in self.entradas}
+        if 'T' in self.entradas:
+            ligacoes['T'] = {'°F': 'T_F', '°R': 'T_R'}[self.entradas['T']]
+        ligacoes.update(variaveis or {})
+        return NoGrafo(saida, self.kernel(cache), ligacoes, self.unidade)
+
+
+class RegistroCorrelacoes:
+    def __init__(self, correlacoes=()):
+        """
+        :param correlacoes: Correlacao's iniciais; uma registrada depois substitui a de mesma (propriedade, nome)
+        """
+        self.correlacoes = {}
+        for correlacao in correlacoes:
+            self.registra(correlacao)
+
+    def registra(self, correlacao):
+        self.correlacoes[correlacao.propriedade, correlacao.nome] = correlacao
+
+    def busca(self, propriedade, nome):
+        """
+        :return: Correlacao registrada para (propriedade, nome)
+        """
+        if (propriedade, nome) not in self.correlacoes:
+            raise ValueError(f'Correlação "{nome}" não registrada para {propriedade}; use uma de '
+                             f'{self.nomes(propriedade)}')
+        return self.correlacoes[propriedade, nome]
+
+    def nomes(self, propriedade):
+        """
+        :return: Nomes das correlações registradas para a propriedade
+        """
+        return tuple(nome for (p, nome) in self.correlacoes if p == propriedade)
+
+    def propriedades(self):
+        return tuple(dict.fromkeys(p for (p, _) in self.correlacoes))
+
+    def escolhe(self, escolhas, cache=None):
+        """
+        :param escolhas: dict {propriedade: nome da correlação}, ex.: {'Rs': 'glaso', 'Bo': 'vasquez_e_beggs'}
+        :param cache: CacheCorrelacoes repassado ao BlackOil
+        :return: dict {propriedade: kernel}, resolvido uma vez para o lote inteiro
+        """
+        return {propriedade: self.busca(propriedade, nome).kernel(cache) for propriedade, nome in escolhas.items()}
+
+
+"""------------------------------------------------------------------------------------------------------------------"""
+"Correlações da classe BlackOil"
+
+_ADM = 'adimensional'
+_FAIXAS_STANDING = {'Rs': (20, 1425), 'T': (100, 258), 'API': (16.5, 63.8), 'dg': (0.59, 0.95)}
+_FAIXAS_VASQUEZ_E_BEGGS = {'Rs': (20, 2070), 'T': (529.67, 754.67), 'API': (16, 58), 'dg': (0.56, 1.18),
+                           'dgn': (0.56, 1.18)}
+_FAIXAS_GLASO = {'Rs': (90, 2637), 'T': (80, 280), 'API': (22.3, 48.1), 'dg': (0.65, 1.276)}
+_FAIXAS_PETROSKY = {'Rs': (217, 1406), 'T': (114, 288), 'API': (16.3, 45), 'dg': (0.5781, 0.8519)}
+_FAIXAS_BEGGS_E_ROBINSON = {'Rs': (20, 2070), 'T': (70, 295), 'API': (16, 58), 'P': (0, 5250)}
+
+CORRELACOES_BLACK_OIL = [
+    # Pressão de bolha
+    Correlacao('Pb', 'standing', 'pressao_de_bolha_Standing_1947__Pb__',
+               {'API': _ADM, 'Rs': 'SCF/STB', 'dg': _ADM, 'T': '°F'}, 'psia', _FAIXAS_STANDING),
+    Correlacao('Pb', 'vasquez_e_beggs', 'pressao_de_bolha_Vasquez_e_Beggs_1980__Pb__',
+               {'API': _ADM, 'Tsep': '°F', 'Psep': 'psia', 'dg': _ADM, 'Rs': 'SCF/STB', 'T': '°R'}, 'psia',
+               _FAIXAS_VASQUEZ_E_BEGGS),
+    Correlacao('Pb', 'glaso', 'pressao_de_bolha_Glaso_1980__Pb__',
+               {'Rs': 'SCF/STB', 'dg': _ADM, 'API': _ADM, 'T': '°F'}, 'psia', _FAIXAS_GLASO),
+    Correlacao('Pb', 'petrosky_e_farshad', 'pressao_de_bolha_petrosky_e_farshad_1993__Pb__',
+               {'Rs': 'SCF/STB', 'API': _ADM, 'dg': _ADM, 'T': '°F'}, 'psia', _FAIXAS_PETROSKY),
+
+    # Razão de solubilidade (P <= Pb)
+    Correlacao('Rs', 'standing', 'fase_oleo_razao_de_solubilidade_standing_1947_P_menorIgual_Pb__Rs__',
+               {'P': 'psia', 'dg': _ADM, 'API': _ADM, 'T': '°F'}, 'SCF/STB',
+               dict(_FAIXAS_STANDING, P=(130, 7000))),
+    Correlacao('Rs', 'vasquez_e_beggs', 'fase_oleo_razao_de_solubilidade_vasquez_e_beggs_1980_P_menorIgual_Pb__Rs__',
+               {'API': _ADM, 'P': 'psia', 'dgn': _ADM, 'T': '°R'}, 'SCF/STB',
+               dict(_FAIXAS_VASQUEZ_E_BEGGS, P=(50, 5250))),
+    Correlacao('Rs', 'glaso', 'fase_oleo_razao_de_solubilidade_glaso_1980_P_menorIgual_Pb__Rs__',
+               {'P': 'psia', 'API': _ADM, 'dg': _ADM, 'T': '°F'}, 'SCF/STB', dict(_FAIXAS_GLASO, P=(165, 7142))),
+    Correlacao('Rs', 'petrosky_e_farshad', 'fase_oleo_razao_de_solubilidade_Petrosky_1993_P_menorIgual_Pb__Rs__',
+               {'P': 'psia', 'API': _ADM, 'dg': _ADM, 'T': '°F'}, 'SCF/STB',
+               dict(_FAIXAS_PETROSKY, P=(1574, 6523))),
+
+    # Fator volume-formação do óleo (P <= Pb)
+    Correlacao('Bo', 'standing', 'fase_oleo_fator_volume_formacao_de_oleo_standing_1947_P_menorIgual_Pb__Bo__',
+               {'Rs': 'SCF/STB', 'dg': _ADM, 'do': _ADM, 'T': '°F'}, 'bbl/STB', _FAIXAS_STANDING),
+    Correlacao('Bo', 'vasquez_e_beggs', 'fase_oleo_ator_volume_formacao_de_oleo_vasquez_e_beggs_1980_P_menor_Pb__Bo__',
+               {'API': _ADM, 'Rs': 'SCF/STB', 'dgn': _ADM, 'T': '°R'}, 'bbl/STB', _FAIXAS_VASQUEZ_E_BEGGS),
+    Correlacao('Bo', 'glaso', 'fase_oleo_fator_volume_formacao_de_oleo_glaso_1980_P_menor_Pb__Bo__Bob__',
+               {'Rs': 'SCF/STB', 'do': _ADM, 'dg': _ADM, 'T': '°F'}, 'bbl/STB', _FAIXAS_GLASO, indice=0),
+    Correlacao('Bo', 'petrosky_e_farshad',
+               'fase_oleo_fator_volume_formacao_de_oleo_petrosky_e_farshad_1993_P_menor_Pb__Bo__',
+               {'Rs': 'SCF/STB', 'dg': _ADM, 'do': _ADM, 'T': '°F'}, 'bbl/STB', _FAIXAS_PETROSKY),
+
+    # Compressibilidade isotérmica do óleo (P >= Pb)
+    Correlacao('Co', 'standing', 'fase_oleo__compressibilidade_isotermica_oleo_standing_1974_P_maiorIgual_Pb__Co__',
+               {'P': 'psia', 'Pb': 'psia', 'Rho_ob': 'lb/ft³'}, '1/psia'),
+    Correlacao('Co', 'vasquez_e_beggs',
+               'fase_oleo_compressibilidade_isotermica_oleo_vasques_e_beggs_1980_P_maiorIgual_Pb__Co__',
+               {'P': 'psia', 'Rs': 'SCF/STB', 'API': _ADM, 'dgn': _ADM, 'T': '°F'}, '1/psia',
+               {'P': (141, 9515), 'Rs': (9.3, 2199), 'API': (15.3, 59.5), 'dgn': (0.511, 1.351)}),
+    Correlacao('Co', 'petrosky_e_farshad',
+               'fase_oleo_ompressibilidade_isotermica_oleo_petrosky_e_farshad_1993_P_maiorIgual_Pb__Co__',
+               {'P': 'psia', 'Rs': 'SCF/STB', 'API': _ADM, 'dg': _ADM, 'T': '°F'}, '1/psia',
+               dict(_FAIXAS_PETROSKY, P=(1700, 10692))),
+
+    # Viscosidade do óleo morto, saturado (P <= Pb) e sub-saturado (P >= Pb)
+    Correlacao('uod', 'beal_standing', 'fase_oleo_viscosidade_do_oleo_morto_beal_standing_1981__uo__',
+               {'API': _ADM, 'T': '°R'}, 'cP', {'API': (10.1, 52.5), 'T': (557.67, 709.67)}),
+    Correlacao('uod', 'beggs_e_robinson', 'fase_oleo_viscosidade_do_oleo_morto_beggs_e_robinson_1975__uo__',
+               {'API': _ADM, 'T': '°F'}, 'cP', _FAIXAS_BEGGS_E_ROBINSON),
+    Correlacao('uod', 'bergman', 'fase_oleo_viscosidade_do_oleo_morto_bergman_2004__uod__',
+               {'API': _ADM, 'T': '°F'}, 'cP'),
+    Correlacao('uob', 'standing', 'fase_oleo_viscosidade_do_oleo_saturado_standing_1981_P_menorIgual_Pb__uob__',
+               {'Rs': 'SCF/STB', 'uod': 'cP'}, 'cP'),
+    Correlacao('uob', 'beggs_e_robinson',
+               'fase_oleo_viscosidade_do_oleo_saturado_beggs_e_robinson_1975_P_menorIgual_Pb__uob__',
+               {'Rs': 'SCF/STB', 'uod': 'cP'}, 'cP', _FAIXAS_BEGGS_E_ROBINSON),
+    Correlacao('uob', 'bergman', 'fase_oleo_viscosidade_do_oleo_saturado_bergman_1975_P_menorIgual_Pb__uob__',
+               {'Rs': 'SCF/STB', 'uod': 'cP'}, 'cP'),
+    Correlacao('uo', 'beal_standing',
+               'fase_oleo_viscosidade_do_oleo_sub_saturado_beal_standing_1981_P_maiorIgual_Pb__uo__',
+               {'P': 'psia', 'Pb': 'psia', 'uob': 'cP'}, 'cP'),
+    Correlacao('uo', 'beggs_e_robinson',
+               'fase_oleo_viscosidade_do_oleo_sub_saturado_beggs_e_robinson_1975_P_maiorIgual_Pb__uo__',
+               {'P': 'psia', 'Pb': 'psia', 'uob': 'cP'}, 'cP', {'P': (141, 9515)}),
+    Correlacao('uo', 'bergman', 'fase_oleo_viscosidade_do_oleo_sub_saturado_bergman_2004_P_maiorIgual_Pb__uo__',
+               {'P': 'psia', 'Pb': 'psia', 'uob': 'cP'}, 'cP'),
+
+    # Fator Z
+    Correlacao('Z', 'brill_e_beggs', 'fator_z_correlacao_de_brill_e_beggs', {'Ppr': _ADM, 'Tpr': _ADM}, _ADM,
+               {'Ppr': (0, 13), 'Tpr': (1.2, 2.4)}),
+    Correlacao('Z', 'papay', 'fator_z_correlacao_papay', {'Ppr': _ADM, 'Tpr': _ADM}, _ADM),
+    Correlacao('Z', 'hall_yarborough', 'fator_z_correlacao_de_hall_yarborough', {'Ppr': _ADM, 'Tpr': _ADM}, _ADM,
+               {'Ppr': (0.1, 24.6), 'Tpr': (1.2, 3)}),
+    Correlacao('Z', 'dranchukabukassem', 'fator_z_correlacao_dranchukabukassem', {'Ppr': _ADM, 'Tpr': _ADM}, _ADM,
+               {'Ppr': (0.2, 30), 'Tpr': (1, 3)}, constantes={'zc': 0.27, 'x0': 0}),
+
+    # Viscosidade do gás
+    Correlacao('ug', 'lee', 'fase_gas_viscosidade_do_gas_lee__ug__',
+               {'Mg': 'lb/lbmol', 'rho_g': 'lb/ft³', 'T': '°R'}, 'cP', {'T': (559.67, 799.67)}),
+    Correlacao('ug', 'sutton', 'fase_gas_viscosidade_do_gas_sutton_2007__ug__',
+               {'Mg': 'lb/lbmol', 'rho_g': 'lb/ft³', 'Tpr': _ADM, 'Tpc': '°R', 'Ppc': 'psia', 'T': '°R'}, 'cP'),
+    Correlacao('ug_1atm', 'dempsey', 'fase_gas_viscosidade_do_gas_dempsey_1965__ug__',
+               {'dg': _ADM, 'T': '°F', 'Yn2': _ADM, 'Yco2': _ADM, 'Yh2s': _ADM}, 'cP', {'T': (100, 300)}),
+]
+
+REGISTRO_CORRELACOES = RegistroCorrelacoes(CORRELACOES_BLACK_OIL)
@@ -0,0 +1,445 @@
+"""
+Serviço local de propriedades PVT: asyncio, socket Unix (JSON por linha) e/ou HTTP em localhost.
+
+As consultas que chegam juntas, de vários clientes, são agrupadas em micro-lotes: o lote fecha quando junta max_lote
+pontos ou quando a primeira consulta pendente espera espera_max segundos, e é avaliado de uma vez em uma thread à
+parte, enquanto o laço de eventos continua recebendo as consultas do lote seguinte. Dentro do lote:
+
+    modo 'tabela' (padrão): cada fluido tem uma TabelaPVT.adaptativa guardada em cache (LRU, max_tabelas); os pontos
+    do mesmo fluido são interpolados em uma única chamada de consulta(). Pontos fora de [P_min, P_max] vão para o
+    modo direto, em vez de extrapolados.
+    modo 'direto': as correlações são avaliadas pelo grafo em uma única chamada de gera_tabela_pvt_black_oil, com uma
+    linha por ponto (fluidos diferentes no mesmo lote), para os fluidos que informam as mesmas entradas.
+
+Pedido (uma linha JSON no socket, ou o corpo de POST /consulta):
+    {"id": 1, "fluido": {"dg": 0.75, "API": 30, "Rsb": 500, "T": {"valor": 80, "unidade": "°C"}},
+     "P": [1000, 2000], "colunas": ["Bo", "uo"], "modo": "tabela"}
+Resposta: {"id": 1, "colunas": ["Bo", "uo"], "valores": [[...], [...]]} (uma linha por pressão) ou {"id": 1,
+"erro": "..."}. Valores em {"valor", "unidade"} viram Grandeza (ClassesUnidades); os demais seguem as unidades de
+UNIDADES_DO_FLUIDO e P é em psia. {"tipo": "metricas"} (ou GET /metricas) devolve latências, vazão, tamanho dos lotes
+e acertos do cache de tabelas.
+
+Uso: python ClassesServicoPVT.py [--unix /tmp/pvt.sock] [--porta 8765] [--max-lote 4096] [--espera-ms 2]
+"""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import socket
+import time
+
+import numpy as np
+from ClassesTabelaPVT import COLUNAS_TABELA_PVT, TabelaPVT, gera_tabela_pvt_black_oil
+from ClassesUnidades import UNIDADES_DO_FLUIDO, Grandeza, valor_em, valores_em
+
+
+NOMES_COLUNAS = [coluna.split('[')[0] for coluna in COLUNAS_TABELA_PVT]
+MODOS = ('tabela', 'direto')
+
+
+class _Consulta:
+    def __init__(self, fluido, P, colunas, modo, futuro):
+        """
+        :param fluido: dict com as entradas da amostra já nas unidades de UNIDADES_DO_FLUIDO
+        :param P: Pressões, psia (array 1-D)
+        :param colunas: Índices das colunas pedidas em NOMES_COLUNAS
+        :param modo: 'tabela' ou 'direto'
+        :param futuro: asyncio.Future que recebe a resposta
+        """
+        self.fluido = fluido
+        self.chave = tuple(sorted((nome, float(valor)) for nome, valor in fluido.items()))
+        self.P = P
+        self.colunas = colunas
+        self.modo = modo
+        self.futuro = futuro
+        self.valores = np.full((P.size, len(NOMES_COLUNAS)), np.nan)
+        self.erro = None
+        self.inicio = time.perf_counter()
+
+
+class ServicoPVT:
+    def __init__(self, max_lote=4096, espera_max=0.002, max_tabelas=64, tolerancia=10 ** -3, P_min=14, P_max=7000,
+                 metodo='linear', max_amostras=10 ** 4):
+        """
+        :param max_lote: Número de pontos que fecha um lote antes de espera_max
+        :param espera_max: Tempo máximo, s, que a primeira consulta de um lote espera pelas outras
+        :param max_tabelas: Número de tabelas guardadas no cache (as menos usadas saem primeiro)
+        :param tolerancia: Tolerância de TabelaPVT.adaptativa
+        :param P_min: Menor pressão das tabelas, psia
+        :param P_max: Maior pressão das tabelas, psia
+        :param metodo: Interpolação das tabelas ('linear' ou 'cubica')
+        :param max_amostras: Número de latências e tamanhos de lote guardados para os percentis
+        """
+        self.max_lote = max_lote
+        self.espera_max = espera_max
+        self.max_tabelas = max_tabelas
+        self.tolerancia = tolerancia
+        self.P_min = P_min
+        self.P_max = P_max
+        self.metodo = metodo
+        self.tabelas = collections.OrderedDict()  # chave do fluido -> TabelaPVT
+        self.contadores = {'consultas': 0, 'pontos': 0, 'lotes': 0, 'erros': 0, 'acertos_cache': 0,
+                           'faltas_cache': 0, 'tabelas_geradas': 0, 'tempo_tabelas_s': 0.0, 'tempo_lotes_s': 0.0,
+                           'pontos_diretos': 0}
+        self.latencias = collections.deque(maxlen=max_amostras)
+        self.tamanhos_lote = collections.deque(maxlen=max_amostras)
+        self.inicio = time.perf_counter()
+        self._pendentes = []
+        self._pontos_pendentes = 0
+        self._acorda = None
+        self._temporizador = None
+        self._tarefa = None
+        self._servidores = []
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='ServicoPVT')
+
+    """--------------------------------------------------------------------------------------------------------------"""
+    "Consultas e micro-lotes"
+
+    async def consulta(self, fluido, P, colunas=None, modo='tabela'):
+        """
+        :param fluido: dict com as entradas de uma amostra (mesmas chaves de gera_tabela_pvt_black_oil)
+        :param P: Pressão ou pressões, psia (ou Grandeza)
+        :param colunas: Nomes das colunas (ex.: ('Bo', 'uo')); None devolve todas, na ordem de COLUNAS_TABELA_PVT
+        :param modo: 'tabela' (interpolação na tabela do fluido) ou 'direto' (correlações)
+        :return: Array (n_pressões, n_colunas)
+        """
+        if self._tarefa is None:
+            self._inicia_lotes()
+        if modo not in MODOS:
+            raise ValueError(f'Modo "{modo}" desconhecido; use um de {MODOS}')
+        indices = list(range(len(NOMES_COLUNAS))) if colunas is None else [_indice_coluna(c) for c in colunas]
+        fluido = {nome: float(valor) for nome, valor in valores_em(fluido, UNIDADES_DO_FLUIDO).items()}
+        P = np.atleast_1d(np.asarray(valor_em(P, 'psia'), dtype=float)).ravel()
+        consulta = _Consulta(fluido, P, indices, modo, asyncio.get_running_loop().create_future())
+
+        self._pendentes.append(consulta)
+        self._pontos_pendentes += P.size
+        if self._pontos_pendentes >= self.max_lote:
+            self._acorda.set()
+        elif self._temporizador is None:
+            self._temporizador = asyncio.get_running_loop().call_later(self.espera_max, self._acorda.set)
+        return await consulta.futuro
+
+    def _inicia_lotes(self):
+        self._acorda = asyncio.Event()
+        self._tarefa = asyncio.get_running_loop().create_task(self._lotes())
+
+    async def _lotes(self):
+        laco = asyncio.get_running_loop()
+        while True:
+            await self._acorda.wait()
+            self._acorda.clear()
+            if self._temporizador is not None:
+                self._temporizador.cancel()
+                self._temporizador = None
+            lote, self._pendentes, self._pontos_pendentes = self._pendentes, [], 0
+            if not lote:
+                continue
+            inicio = time.perf_counter()
+            await laco.run_in_executor(self._executor, self._avalia_lote, lote)
+            fim = time.perf_counter()
+
+            self.contadores['lotes'] += 1
+            self.contadores['tempo_lotes_s'] += fim - inicio
+            self.tamanhos_lote.append(sum(consulta.P.size for consulta in lote))
+            for consulta in lote:
+                self.contadores['consultas'] += 1
+                self.contadores['pontos'] += consulta.P.size
+                self.latencias.append(fim - consulta.inicio)
+                if consulta.futuro.done():  # cliente desistiu
+                    continue
+                if consulta.erro is not None:
+                    self.contadores['erros'] += 1
+                    consulta.futuro.set_exception(consulta.erro)
+                else:
+                    consulta.futuro.set_result(consulta.valores[:, consulta.colunas])
+
+    def _avalia_lote(self, lote):
+        """
+        Nota: roda na thread do executor; só ela mexe no cache de tabelas, então não há trava.
+        """
+        diretos = []  # (consulta, índices dos pontos)
+        por_fluido = collections.defaultdict(list)
+        for consulta in lote:
+            if consulta.modo == 'direto':
+                diretos.append((consulta, np.arange(consulta.P.size)))
+            else:
+                por_fluido[consulta.chave].append(consulta)
+
+        for consultas in por_fluido.values():
+            try:
+                tabela = self._tabela(consultas[0])
+            except Exception as erro:
+                for consulta in consultas:
+                    consulta.erro = erro
+                continue
+            P = np.concatenate([consulta.P for consulta in consultas])
+            dentro = (P >= self.P_min) & (P <= self.P_max)
+            valores = np.full((P.size, len(NOMES_COLUNAS)), np.nan)
+            valores[dentro] = tabela.consulta(P[dentro], metodo=self.metodo)
+            inicio = 0
+            for consulta in consultas:
+                fim = inicio + consulta.P.size
+                consulta.valores[:] = valores[inicio:fim]
+                fora = np.flatnonzero(~dentro[inicio:fim])
+                if fora.size:
+                    diretos.append((consulta, fora))
+                inicio = fim
+        self._avalia_diretos(diretos)
+
+    def _tabela(self, consulta):
+        if consulta.chave in self.tabelas:
+            self.contadores['acertos_cache'] += 1
+            self.tabelas.move_to_end(consulta.chave)
+            return self.tabelas[consulta.chave]
+        self.contadores['faltas_cache'] += 1
+        inicio = time.perf_counter()
+        tabela = TabelaPVT.adaptativa(consulta.fluido, self.tolerancia, self.P_min, self.P_max, self.metodo)
+        self.contadores['tempo_tabelas_s'] += time.perf_counter() - inicio
+        self.contadores['tabelas_geradas'] += 1
+        self.tabelas[consulta.chave] = tabela
+        if len(self.tabelas) > self.max_tabelas:
+            self.tabelas.popitem(last=False)
+        return tabela
+
+    def _avalia_diretos(self, diretos):
+        # Uma chamada do grafo por conjunto de entradas informadas, com uma linha (fluido, P) por ponto
+        grupos = collections.defaultdict(list)
+        for consulta, indices in diretos:
+            grupos[tuple(sorted(consulta.fluido))].append((consulta, indices))
+        for entradas, grupo in grupos.items():
+            fluidos = {nome: np.concatenate([np.full(indices.size, consulta.fluido[nome])
+                                             for consulta, indices in grupo]) for nome in entradas}
+            P = np.concatenate([consulta.P[indices] for consulta, indices in grupo])
+            try:
+                valores = gera_tabela_pvt_black_oil(fluidos, P.reshape(-1, 1))[:, 0, :]
+            except Exception as erro:
+                for consulta, _ in grupo:
+                    consulta.erro = erro
+                continue
+            self.contadores['pontos_diretos'] += P.size
+            inicio = 0
+            for consulta, indices in grupo:
+                consulta.valores[indices] = valores[inicio:inicio + indices.size]
+                inicio += indices.size
+
+    """--------------------------------------------------------------------------------------------------------------"""
+    "Métricas"
+
+    def metricas(self):
+        """
+        :return: dict com os contadores, latências (ms: média e percentis 50, 90, 99 e máximo das últimas
+        consultas), pontos por lote e vazão média desde o início, pontos/s
+        """
+        metricas = dict(self.contadores)
+        duracao = time.perf_counter() - self.inicio
+        latencias = np.asarray(self.latencias) * 10 ** 3
+        if latencias.size:
+            p50, p90, p99 = np.percentile(latencias, [50, 90, 99])
+            metricas['latencia_ms'] = {'media': float(latencias.mean()), 'p50': float(p50), 'p90': float(p90),
+                                       'p99': float(p99), 'max': float(latencias.max())}
+        if self.tamanhos_lote:
+            metricas['pontos_por_lote'] = {'media': float(np.mean(self.tamanhos_lote)),
+                                           'max': int(np.max(self.tamanhos_lote))}
+        metricas['tabelas_em_cache'] = len(self.tabelas)
+        metricas['pendentes'] = self._pontos_pendentes
+        metricas['tempo_ativo_s'] = duracao
+        metricas['vazao_pontos_s'] = self.contadores['pontos'] / duracao
+        return metricas
+
+    """--------------------------------------------------------------------------------------------------------------"""
+    "Servidores"
+
+    async def inicia(self, caminho_unix=None, host='127.0.0.1', porta=None):
+        """
+        :param caminho_unix: Caminho do socket Unix (protocolo de uma linha JSON por pedido); None não abre
+        :param host: Endereço do servidor HTTP (mantenha em localhost: não há autenticação)
+        :param porta: Porta do servidor HTTP; None não abre
+        :return: self
+        """
+        if self._tarefa is None:
+            self._inicia_lotes()
+        if caminho_unix is not None:
+            self._servidores.append(await asyncio.start_unix_server(self._atende_linhas, caminho_unix))
+        if porta is not None:
+            self._servidores.append(await asyncio.start_server(self._atende_http, host, porta))
+        return self
+
+    async def encerra(self):
+        for servidor in self._servidores:
+            servidor.close()
+            await servidor.wait_closed()
+        self._servidores = []
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            self._tarefa = None
+        self._executor.shutdown(wait=False)
+
+    async def responde(self, pedido):
+        """
+        :param pedido: dict decodificado do JSON (ver a documentação do módulo)
+        :return: dict da resposta
+        """
+        resposta = {'id': pedido.get('id')}
+        try:
+            if pedido.get('tipo') == 'metricas':
+                resposta['metricas'] = self.metricas()
+                return resposta
+            fluido = {nome: Grandeza(valor['valor'], valor['unidade']) if isinstance(valor, dict) else valor
+                      for nome, valor in pedido['fluido'].items()}
+            P = pedido['P']
+            if isinstance(P, dict):
+                P = Grandeza(P['valor'], P['unidade'])
+            colunas = pedido.get('colunas')
+            valores = await self.consulta(fluido, P, colunas, pedido.get('modo', 'tabela'))
+            resposta['colunas'] = list(colunas) if colunas is not None else NOMES_COLUNAS
+            resposta['valores'] = valores.tolist()
+        except Exception as erro:
+            resposta['erro'] = f'{type(erro).__name__}: {erro}'
+        return resposta
+
+    async def _atende_linhas(self, leitor, escritor):
+        # Cada linha vira uma tarefa, então os pedidos de uma mesma conexão entram juntos no lote
+        tarefas = set()
+
+        async def atende(linha):
+            try:
+                pedido = json.loads(linha)
+            except ValueError as erro:
+                resposta = {'id': None, 'erro': f'JSON inválido: {erro}'}
+            else:
+                resposta = await self.responde(pedido)
+            escritor.write(json.dumps(resposta).encode() + b'\n')
+            await escritor.drain()
+
+        try:
+            while linha := await leitor.readline():
+                if linha.strip():
+                    tarefa = asyncio.get_running_loop().create_task(atende(linha))
+                    tarefas.add(tarefa)
+                    tarefa.add_done_callback(tarefas.discard)
+            if tarefas:
+                await asyncio.gather(*tarefas, return_exceptions=True)
+        finally:
+            escritor.close()
+
+    async def _atende_http(self, leitor, escritor):
+        # HTTP/1.1 mínimo, com keep-alive: POST /consulta e GET /metricas
+        try:
+            while requisicao := await leitor.readline():
+                metodo, caminho, _ = requisicao.decode('latin-1').split(' ', 2)
+                cabecalhos = {}
+                while (linha := await leitor.readline()) not in (b'\r\n', b'\n', b''):
+                    nome, valor = linha.decode('latin-1').split(':', 1)
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                corpo = await leitor.readexactly(int(cabecalhos.get('content-length', 0)))
+
+                status = '200 OK'
+                if metodo == 'GET' and caminho == '/metricas':
+                    resposta = self.metricas()
+                elif metodo == 'POST' and caminho == '/consulta':
+                    try:
+                        pedido = json.loads(corpo)
+                    except ValueError as erro:
+                        status, resposta = '400 Bad Request', {'erro': f'JSON inválido: {erro}'}
+                    else:
+                        if isinstance(pedido, list):  # vários pedidos no mesmo corpo entram juntos no lote
+                            resposta = list(await asyncio.gather(*(self.responde(p) for p in pedido)))
+                        else:
+                            resposta = await self.responde(pedido)
+                else:
+                    status, resposta = '404 Not Found', {'erro': 'use POST /consulta ou GET /metricas'}
+
+                dados = json.dumps(resposta).encode()
+                escritor.write(f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\n'
+                               f'Content-Length: {len(dados)}\r\n\r\n'.encode() + dados)
+                await escritor.drain()
+                if cabecalhos.get('connection', '').lower() == 'close':
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            escritor.close()
+
+
+def _indice_coluna(coluna):
+    if coluna not in NOMES_COLUNAS:
+        raise ValueError(f'Coluna "{coluna}" desconhecida; use uma de {tuple(NOMES_COLUNAS)}')
+    return NOMES_COLUNAS.index(coluna)
+
+
+class ClientePVT:
+    def __init__(self, caminho_unix):
+        """
+        Nota: cliente síncrono do socket Unix, para ferramentas sem asyncio; um pedido por vez por cliente.
+        :param caminho_unix: Caminho do socket aberto por ServicoPVT.inicia
+        """
+        self.conexao = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.conexao.connect(caminho_unix)
+        self.arquivo = self.conexao.makefile('rwb')
+        self.proximo_id = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fecha()
+
+    def _pede(self, pedido):
+        self.proximo_id += 1
+        pedido['id'] = self.proximo_id
+        self.arquivo.write(json.dumps(pedido).encode() + b'\n')
+        self.arquivo.flush()
+        resposta = json.loads(self.arquivo.readline())
+        if 'erro' in resposta:
+            raise RuntimeError(resposta['erro'])
+        return resposta
+
+    def consulta(self, fluido, P, colunas=None, modo='tabela'):
+        """
+        :param fluido: dict com as entradas de uma amostra; valores com unidade como {"valor": 80, "unidade": "°C"}
+        :param P: Pressões, psia
+        :param colunas: Nomes das colunas; None devolve todas
+        :param modo: 'tabela' ou 'direto'
+        :return: Array (n_pressões, n_colunas)
+        """
+        pedido = {'fluido': fluido, 'P': np.atleast_1d(np.asarray(P, dtype=float)).tolist(), 'modo': modo}
+        if colunas is not None:
+            pedido['colunas'] = list(colunas)
+        return np.asarray(self._pede(pedido)['valores'], dtype=float)
+
+    def metricas(self):
+        return self._pede({'tipo': 'metricas'})['metricas']
+
+    def fecha(self):
+        self.arquivo.close()
+        self.conexao.close()
+
+
+async def _executa(argumentos):
+    servico = ServicoPVT(max_lote=argumentos.max_lote, espera_max=argumentos.espera_ms / 10 ** 3,
+                         max_tabelas=argumentos.max_tabelas, tolerancia=argumentos.tolerancia)
+    await servico.inicia(argumentos.unix, porta=argumentos.porta)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await servico.encerra()
+
+
+if __name__ == '__main__':
+    argumentos = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    argumentos.add_argument('--unix', help='caminho do socket Unix')
+    argumentos.add_argument('--porta', type=int, help='porta HTTP em 127.0.0.1')
+    argumentos.add_argument('--max-lote', type=int, default=4096)
+    argumentos.add_argument('--espera-ms', type=float, default=2.0)
+    argumentos.add_argument('--max-tabelas', type=int, default=64)
+    argumentos.add_argument('--tolerancia', type=float, default=10 ** -3)
+    argumentos = argumentos.parse_args()
+    if argumentos.unix is None and argumentos.porta is None:
+        argumentos.unix = '/tmp/servico_pvt.sock'
+    try:
+        asyncio.run(_executa(argumentos))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,150 @@
+"""
+Superfícies de fator Z pré-calculadas em uma malha uniforme (Ppr, Tpr).
+
+A malha é uniforme nos dois eixos, então a célula de cada consulta sai de uma divisão (O(1)), sem busca. Na geração,
+o erro de interpolação de cada célula é estimado no seu centro contra a correlação original; na consulta, pontos
+fora da malha ou em células com erro acima da tolerância são devolvidos como inválidos para o FatorZ resolver.
+"""
+
+import numpy as np
+from ClassesBlackOil import FatorZ
+
+
+class SuperficieZ:
+    def __init__(self, correlacao, Ppr, Tpr, Z, erro_bilinear, erro_bicubica, zc=0.27, metodo='bicubica'):
+        """
+        :param correlacao: Chave de FatorZ.CORRELACOES_Z ('brill_e_beggs', 'papay', 'hall_yarborough',
+        'dranchukabukassem')
+        :param Ppr: Nós de pressão pseudoreduzida (uniformes), adimensional
+        :param Tpr: Nós de temperatura pseudoreduzida (uniformes), adimensional
+        :param Z: Fator Z nos nós, array (len(Tpr), len(Ppr))
+        :param erro_bilinear: Erro absoluto estimado no centro de cada célula, interpolação bilinear
+        :param erro_bicubica: Erro absoluto estimado no centro de cada célula, interpolação bicúbica
+        :param zc: z crítico usado na correlação de Dranchuk & Abu-Kassem
+        :param metodo: 'bilinear' ou 'bicubica'
+        """
+        self.correlacao = correlacao
+        self.Ppr = np.asarray(Ppr, dtype=float)
+        self.Tpr = np.asarray(Tpr, dtype=float)
+        self.Z = np.asarray(Z, dtype=float)
+        self.erro_bilinear = np.asarray(erro_bilinear, dtype=float)
+        self.erro_bicubica = np.asarray(erro_bicubica, dtype=float)
+        self.zc = zc
+        self.metodo = metodo
+
+    @classmethod
+    def gera(cls, correlacao, Ppr=np.linspace(0, 15, 301), Tpr=np.linspace(1.05, 3, 196), zc=0.27,
+             metodo='bicubica'):
+        """
+        :param correlacao: Chave de FatorZ.CORRELACOES_Z
+        :param Ppr: Nós de pressão pseudoreduzida, uniformemente espaçados
+        :param Tpr: Nós de temperatura pseudoreduzida, uniformemente espaçados
+        :param zc: z crítico usado na correlação de Dranchuk & Abu-Kassem
+        :param metodo: 'bilinear' ou 'bicubica'
+        :return: SuperficieZ com o erro de interpolação de cada célula já estimado
+        """
+        Ppr = np.asarray(Ppr, dtype=float)
+        Tpr = np.asarray(Tpr, dtype=float)
+        Z = _fator_z_da_correlacao(correlacao, *np.meshgrid(Ppr, Tpr), zc)
+
+        # Centros das células, onde o erro da interpolação é tipicamente o maior
+        Ppr_c, Tpr_c = np.meshgrid((Ppr[:-1] + Ppr[1:]) / 2, (Tpr[:-1] + Tpr[1:]) / 2)
+        Z_c = _fator_z_da_correlacao(correlacao, Ppr_c, Tpr_c, zc)
+        superficie = cls(correlacao, Ppr, Tpr, Z, 0, 0, zc, metodo)
+        superficie.erro_bilinear = np.abs(superficie._interpola_bilinear(*superficie._celula(Ppr_c, Tpr_c)) - Z_c)
+        superficie.erro_bicubica = np.abs(superficie._interpola_bicubica(*superficie._celula(Ppr_c, Tpr_c)) - Z_c)
+        return superficie
+
+    def salva(self, arquivo):
+        """
+        :param arquivo: Caminho do arquivo .npz
+        """
+        np.savez(arquivo, correlacao=self.correlacao, Ppr=self.Ppr, Tpr=self.Tpr, Z=self.Z,
+                 erro_bilinear=self.erro_bilinear, erro_bicubica=self.erro_bicubica, zc=self.zc, metodo=self.metodo)
+
+    @classmethod
+    def carrega(cls, arquivo):
+        """
+        :param arquivo: Caminho do arquivo .npz gerado por salva()
+        :return: SuperficieZ
+        """
+        with np.load(arquivo) as dados:
+            return cls(str(dados['correlacao']), dados['Ppr'], dados['Tpr'], dados['Z'], dados['erro_bilinear'],
+                       dados['erro_bicubica'], float(dados['zc']), str(dados['metodo']))
+
+    def interpola(self, Ppr, Tpr, tolerancia=np.inf):
+        """
+        :param Ppr: Pressão pseudoreduzida, escalar ou array
+        :param Tpr: Temperatura pseudoreduzida, escalar ou array
+        :param tolerancia: Erro absoluto máximo aceito para o Z interpolado
+        :return: Z interpolado e máscara dos pontos válidos (dentro da malha e dentro da tolerância)
+        """
+        Ppr, Tpr = np.broadcast_arrays(np.asarray(Ppr, dtype=float), np.asarray(Tpr, dtype=float))
+        i, j, fx, fy = self._celula(Ppr, Tpr)
+        if self.metodo == 'bilinear':
+            Z = self._interpola_bilinear(i, j, fx, fy)
+            erro = self.erro_bilinear[j, i]
+        else:
+            Z = self._interpola_bicubica(i, j, fx, fy)
+            erro = self.erro_bicubica[j, i]
+        dentro = (Ppr >= self.Ppr[0]) & (Ppr <= self.Ppr[-1]) & (Tpr >= self.Tpr[0]) & (Tpr <= self.Tpr[-1])
+        valido = dentro & (erro <= tolerancia) & np.isfinite(Z)
+        return Z, valido
+
+    def _celula(self, Ppr, Tpr):
+        """
+        :return: índices (i em Ppr, j em Tpr) do canto inferior da célula e posições relativas fx, fy em [0, 1]
+        """
+        x = (Ppr - self.Ppr[0]) / (self.Ppr[1] - self.Ppr[0])
+        y = (Tpr - self.Tpr[0]) / (self.Tpr[1] - self.Tpr[0])
+        i = np.clip(np.floor(np.nan_to_num(x)).astype(int), 0, len(self.Ppr) - 2)
+        j = np.clip(np.floor(np.nan_to_num(y)).astype(int), 0, len(self.Tpr) - 2)
+        return i, j, x - i, y - j
+
+    def _interpola_bilinear(self, i, j, fx, fy):
+        Z = self.Z
+        return (Z[j, i] * (1 - fx) + Z[j, i + 1] * fx) * (1 - fy) + (Z[j + 1, i] * (1 - fx) + Z[j + 1, i + 1] * fx) * fy
+
+    def _interpola_bicubica(self, i, j, fx, fy):
+        """
+        Nota: convolução cúbica de Keys (a = -0.5) com os 4 × 4 nós vizinhos; nas bordas o nó é repetido.
+        """
+        nT, nP = self.Z.shape
+        wx = _pesos_cubicos(fx)
+        wy = _pesos_cubicos(fy)
+        Z = 0
+        for a in range(4):
+            jj = np.clip(j + a - 1, 0, nT - 1)
+            linha = 0
+            for b in range(4):
+                linha = linha + wx[b] * self.Z[jj, np.clip(i + b - 1, 0, nP - 1)]
+            Z = Z + wy[a] * linha
+        return Z
+
+
+def _pesos_cubicos(t):
+    """
+    :param t: Posição relativa dentro da célula, [0, 1]
+    :return: Pesos dos nós -1, 0, 1 e 2 da convolução cúbica de Keys
+    """
+    t2 = t * t
+    t3 = t2 * t
+    return (-0.5 * t3 + t2 - 0.5 * t, 1.5 * t3 - 2.5 * t2 + 1, -1.5 * t3 + 2 * t2 + 0.5 * t, 0.5 * t3 - 0.5 * t2)
+
+
+def _fator_z_da_correlacao(correlacao, Ppr, Tpr, zc):
+    with np.errstate(all='ignore'):
+        return getattr(FatorZ(Ppr, Tpr, zc), FatorZ.CORRELACOES_Z[correlacao])()
+
+
+def gera_superficies_z(diretorio='.', **kwargs):
+    """
+    :param diretorio: Pasta onde os arquivos superficie_z_<correlacao>.npz são gravados
+    :param kwargs: Malha e opções repassadas a SuperficieZ.gera
+    :return: dict {correlacao: SuperficieZ}
+    """
+    superficies = {}
+    for correlacao in FatorZ.CORRELACOES_Z:
+        superficies[correlacao] = SuperficieZ.gera(correlacao, **kwargs)
+        superficies[correlacao].salva(f'{diretorio}/superficie_z_{correlacao}.npz')
+    return superficies
@@ -0,0 +1,549 @@
+"""
+Tabela PVT Black-Oil em lote: várias amostras de fluido × uma malha de pressões avaliadas de uma só vez.
+
+Cada fluido vira uma linha e cada pressão uma coluna; as correlações da classe BlackOil são avaliadas com broadcast
+do NumPy pelo grafo de dependências (ClassesGrafoBlackOil), então não há laço em Python nem por pressão nem por
+fluido. As regras de cada região (P <= Pb e P > Pb) são as mesmas do script Black_Oil_Tabela_PVT.py. Para perfis
+de temperatura (poço, modelos térmicos), TabelaPVTPT guarda uma grade P × T com Pb(T) e interpola nas duas direções.
+"""
+
+import numpy as np
+from ClassesGrafoBlackOil import GrafoBlackOil, NoGrafo, NOS_TABELA_PVT
+from ClassesInstrumentacao import etapa
+from ClassesPressaoDeBolha import completa_ponto_de_bolha
+from ClassesRegistroCorrelacoes import REGISTRO_CORRELACOES
+from ClassesUnidades import UNIDADES_DO_FLUIDO, valor_em, valores_em
+
+
+COLUNAS_TABELA_PVT = ('Pb[Psi] Rs[SCF/STB] Bo[bbl/STB] Co[1/Psi] uo[cP] rho_oleo[lb/ft³] Z rho_gas[lb/ft³] '
+                      'Bg[m³/m³std] Cg[1/Pa] ug[cP]').split()
+SAIDAS_TABELA_PVT = ('Pb', 'Rs', 'Bo', 'Co', 'uo', 'Rho_oleo', 'Z', 'rho_g', 'Bg', 'Cg', 'ug')
+ENTRADAS_DO_FLUIDO = ('dg', 'do', 'API', 'Pb', 'Rsb', 'T', 'Tsep', 'Psep', 'Yn2', 'Yco2', 'Yh2s')
+GRAFO_TABELA_PVT = GrafoBlackOil(NOS_TABELA_PVT)
+# Colunas que o grafo avalia em P = Pb pela regra de cima (Co usa P < Pb; as demais, P <= Pb); as consultas às
+# tabelas seguem a mesma convenção
+COLUNAS_ACIMA_EM_PB = ('Co',)
+
+# Propriedade do REGISTRO_CORRELACOES -> (variável do grafo da tabela, atributos que vêm de variáveis com outro nome)
+LIGACOES_TABELA_PVT = {'Pb': ('Pb', {'Rs': 'Rsb'}), 'Rs': ('Rs', {'P': 'P_sat'}), 'Bo': ('Bob', {}),
+                       'Co': ('Co_Pb', {'P': 'Pb'}), 'uod': ('uod', {}), 'uob': ('uob', {}), 'uo': ('uo_sub', {}),
+                       'Z': ('Z', {}), 'ug': ('ug_livre', {})}
+
+
+def _coluna_do_fluido(fluidos, chave, padrao=np.nan):
+    """
+    :param fluidos: dict ou DataFrame com as propriedades das amostras
+    :param chave: nome da propriedade
+    :param padrao: valor usado quando a propriedade não foi informada
+    :return: array (n_fluidos, 1) na unidade de UNIDADES_DO_FLUIDO, pronto para broadcast contra a malha de
+    pressões
+    """
+    if chave in fluidos:
+        valor = np.asarray(valor_em(fluidos[chave], UNIDADES_DO_FLUIDO.get(chave)), dtype=float)
+    else:
+        valor = np.asarray(padrao, dtype=float)
+    return np.atleast_1d(valor).reshape(-1, 1)
+
+
+def grafo_tabela_pvt(correlacoes=None):
+    """
+    :param correlacoes: dict {propriedade: nome no REGISTRO_CORRELACOES}, ex.: {'Rs': 'glaso', 'uod': 'bergman'};
+    as propriedades não listadas ficam com as correlações de Black_Oil_Tabela_PVT.py
+    :return: GrafoBlackOil da tabela PVT com as correlações escolhidas
+    """
+    if not correlacoes:
+        return GRAFO_TABELA_PVT
+    grafo = GrafoBlackOil(NOS_TABELA_PVT, GRAFO_TABELA_PVT.cache)
+    for propriedade, nome in correlacoes.items():
+        if propriedade not in LIGACOES_TABELA_PVT:
+            raise ValueError(f'A tabela PVT não permite trocar a correlação de {propriedade}; '
+                             f'use uma de {tuple(LIGACOES_TABELA_PVT)}')
+        saida, variaveis = LIGACOES_TABELA_PVT[propriedade]
+        grafo.adiciona(REGISTRO_CORRELACOES.busca(propriedade, nome).no_grafo(saida, variaveis, grafo.cache))
+    if 'Rs' in correlacoes:
+        # o nó padrão de Co abaixo de Pb usa a dRs/dP de Standing; com outro Rs, a derivada vem da correlação escolhida
+        correlacao_rs = REGISTRO_CORRELACOES.busca('Rs', correlacoes['Rs'])
+        ligacoes = correlacao_rs.no_grafo('Co_sat', {'P': 'P'}).entradas
+        grafo.adiciona(NoGrafo('Co_sat', _compressibilidade_do_oleo_saturado(correlacao_rs, grafo.cache),
+                               dict(ligacoes, Bo='Bo', Bg='Bg'), '1/psia'))
+    if 'Z' in correlacoes:
+        # o nó padrão de Cg usa a dZ/dPpr de Papay; com outro Z, a derivada vem da correlação escolhida
+        kernel_z = REGISTRO_CORRELACOES.busca('Z', correlacoes['Z']).kernel(grafo.cache)
+        grafo.adiciona(NoGrafo('Cg', _compressibilidade_do_gas(kernel_z),
+                               {'Z': 'Z', 'Tpr': 'Tpr', 'Ppr': 'Ppr', 'Ppc': 'Ppc'}, '1/psia'))
+    return grafo
+
+
+def _compressibilidade_do_oleo_saturado(correlacao_rs, cache):
+    """
+    :param correlacao_rs: Correlacao de Rs escolhida
+    :param cache: CacheCorrelacoes repassado ao BlackOil
+    :return: Função Co_sat(Bo, Bg, **entradas de Rs) = (Bg / Bo) dRs/dP, como no nó padrão (Bob = Co = 0)
+    """
+    def Co_sat(Bo, Bg, **entradas):
+        return Bg / Bo * correlacao_rs.derivada('P', cache, **entradas)
+    return Co_sat
+
+
+def _compressibilidade_do_gas(kernel_z):
+    """
+    :param kernel_z: Kernel f(Ppr, Tpr) da correlação de Z escolhida
+    :return: Função Cg(Z, Tpr, Ppr, Ppc) = (1/Ppr - (1/Z) dZ/dPpr) / Ppc, com dZ/dPpr exata por números duais;
+    com entradas duais (derivadas_tabela_pvt), Cg também sai dual (ver derivada_parcial)
+    """
+    def Cg(Z, Tpr, Ppr, Ppc):
+        from ClassesDerivadas import derivada_parcial  # ClassesDerivadas importa este módulo
+        return (1 / Ppr - derivada_parcial(kernel_z, 'Ppr', Ppr=Ppr, Tpr=Tpr) / Z) / Ppc
+    return Cg
+
+
+def gera_tabela_pvt_black_oil(fluidos, P, saidas=SAIDAS_TABELA_PVT, correlacoes=None):
+    """
+    Nota: Pb e Rsb são alternativos. Quando Pb não é informado (ou é NaN), ele vem de Rsb pela correlação de Pb
+    (Standing por padrão); quando informado, Rsb é calculado em Pb pela correlação de Rs.
+    :param fluidos: dict ou DataFrame, uma entrada por amostra: dg, do (ou API), Pb (ou Rsb), T [°F] e,
+    opcionalmente, Tsep [°F], Psep [psia], Yn2, Yco2, Yh2s. Cada entrada pode vir como Grandeza (ex.:
+    Grandeza(T, '°C')), convertida uma vez para a unidade de UNIDADES_DO_FLUIDO
+    :param P: Malha de pressões, psia (ou Grandeza). 1-D (comum a todos os fluidos) ou 2-D (uma linha por fluido)
+    :param saidas: Variáveis do grafo a calcular; só os nós necessários para elas são avaliados
+    :param correlacoes: dict {propriedade: nome no REGISTRO_CORRELACOES} (ver grafo_tabela_pvt); a escolha é
+    resolvida uma vez para o lote inteiro
+    :return: Array (n_fluidos, n_pressões, len(saidas)); com as saídas padrão, na ordem de COLUNAS_TABELA_PVT
+    """
+    with etapa('gera_tabela_pvt_black_oil'):
+        grafo = grafo_tabela_pvt(correlacoes)
+        variaveis = _variaveis_da_tabela(fluidos, P)
+        with etapa('completa_Pb'):
+            _completa_Pb(variaveis, grafo)
+
+        resultado = grafo.avalia(saidas, **variaveis)
+        with etapa('empilha_colunas'):
+            colunas = np.broadcast_arrays(*(resultado[saida] for saida in saidas))
+            return np.stack(colunas, axis=-1)
+
+
+def _variaveis_da_tabela(fluidos, P):
+    """
+    :return: dict com as entradas do grafo: propriedades dos fluidos em colunas (n_fluidos, 1), T_F e P em 2-D
+    """
+    variaveis = {chave: _coluna_do_fluido(fluidos, chave) for chave in ENTRADAS_DO_FLUIDO if chave in fluidos}
+    variaveis['T_F'] = variaveis.pop('T')
+    variaveis['P'] = np.atleast_2d(np.asarray(valor_em(P, 'psia'), dtype=float))
+    return variaveis
+
+
+def _completa_Pb(variaveis, grafo):
+    # Pb ausente (NaN) em alguma amostra vem de Rsb pela correlação de Pb do grafo
+    if 'Pb' in variaveis and np.isnan(variaveis['Pb']).any():
+        Pb = variaveis.pop('Pb')
+        variaveis['Pb'] = np.where(np.isnan(Pb), grafo.avalia(['Pb'], **variaveis)['Pb'], Pb)
+
+
+class TabelaPVT:
+    def __init__(self, P, dados, Pb, colunas=COLUNAS_TABELA_PVT):
+        """
+        Nota: a tabela é dividida em dois trechos, P <= Pb e P >= Pb, e nenhuma interpolação atravessa Pb, então a
+        quebra das curvas na pressão de bolha é respeitada. Se houver dois nós em P = Pb, o primeiro é o limite por
+        baixo (óleo saturado) e o segundo o limite por cima (óleo sub-saturado).
+        :param P: Pressões dos nós, psia, em ordem crescente
+        :param dados: Array (len(P), len(colunas)) com as propriedades em cada nó
+        :param Pb: Pressão de bolha, psia
+        :param colunas: Nomes das colunas; o que vem antes de '[' é o nome usado na consulta (ex.: 'Bo')
+        """
+        P = np.asarray(P, dtype=float)
+        dados = np.asarray(dados, dtype=float)
+        self.Pb = float(Pb)
+        self.colunas = list(colunas)
+        self.nomes = [c.split('[')[0] for c in self.colunas]
+
+        inicio_Pb = np.searchsorted(P, self.Pb, 'left')
+        fim_Pb = np.searchsorted(P, self.Pb, 'right')
+        fim_abaixo, inicio_acima = fim_Pb, inicio_Pb
+        if fim_Pb - inicio_Pb == 2:  # limites por baixo e por cima informados separadamente
+            fim_abaixo, inicio_acima = fim_Pb - 1, inicio_Pb + 1
+        self.trechos = [_TrechoTabela(P[:fim_abaixo], dados[:fim_abaixo]),
+                        _TrechoTabela(P[inicio_acima:], dados[inicio_acima:])]
+
+    @classmethod
+    def de_fluido(cls, fluido, P):
+        """
+        Nota: os dois limites laterais em Pb são avaliados e inseridos como nós, então a quebra é exata.
+        :param fluido: dict com as propriedades de uma amostra (mesmas chaves de gera_tabela_pvt_black_oil)
+        :param P: Malha de pressões, psia (ou Grandeza)
+        :return: TabelaPVT
+        """
+        P = np.asarray(valor_em(P, 'psia'), dtype=float)
+        Pb = gera_tabela_pvt_black_oil(fluido, [1.0])[0, 0, 0]
+        limites = [np.nextafter(Pb, -np.inf), np.nextafter(Pb, np.inf)]
+        dados = gera_tabela_pvt_black_oil(fluido, np.concatenate([P[P < Pb], limites, P[P > Pb]]))[0]
+        return cls(np.concatenate([P[P < Pb], [Pb, Pb], P[P > Pb]]), dados, Pb)
+
+    @classmethod
+    def adaptativa(cls, fluido, tolerancia=10 ** -3, P_min=14, P_max=7000, metodo='linear', n_inicial=8,
+                   max_nos=10 ** 4):
+        """
+        Nota: cada trecho (P <= Pb e P >= Pb) começa com n_inicial intervalos iguais e cada intervalo em que alguma
+        propriedade, avaliada no ponto médio, difere da interpolação por mais de tolerancia (relativa) é dividido ao
+        meio; só os intervalos novos são verificados de novo (na cúbica, todos são revistos ao final, porque um nó
+        novo muda as inclinações dos vizinhos). O erro é medido nos pontos médios, então entre eles pode passar um
+        pouco da tolerância, sobretudo na cúbica. Os pontos médios de uma rodada são avaliados juntos em uma chamada
+        de gera_tabela_pvt_black_oil. Pb é sempre um nó (com os limites laterais, como em de_fluido), então a quebra
+        em Pb não consome nós, e o refinamento se concentra onde as curvas se dobram (Bg e Cg em baixa pressão, Rs e
+        uo perto de Pb). Para sem convergir ao atingir max_nos nós por trecho.
+        :param fluido: dict com as propriedades de uma amostra (mesmas chaves de gera_tabela_pvt_black_oil)
+        :param tolerancia: Erro relativo máximo da interpolação, em cada propriedade
+        :param P_min: Menor pressão da tabela, psia
+        :param P_max: Maior pressão da tabela, psia
+        :param metodo: Interpolação usada na consulta ('linear' ou 'cubica'), que é a verificada no refinamento
+        :param n_inicial: Número de intervalos iniciais de cada trecho
+        :param max_nos: Número máximo de nós de cada trecho
+        :return: TabelaPVT
+        """
+        Pb = gera_tabela_pvt_black_oil(fluido, [1.0])[0, 0, 0]
+        P, dados = [], []
+        for inicio, fim, lado in ((P_min, min(Pb, P_max), -np.inf), (max(Pb, P_min), P_max, np.inf)):
+            if fim <= inicio:
+                continue
+            P_trecho = np.linspace(inicio, fim, n_inicial + 1)
+            P_avaliado = np.where(P_trecho == Pb, np.nextafter(Pb, lado), P_trecho)
+            trecho = _refina_trecho(fluido, P_trecho, gera_tabela_pvt_black_oil(fluido, P_avaliado)[0],
+                                    tolerancia, metodo, max_nos)
+            P.append(trecho[0])
+            dados.append(trecho[1])
+        return cls(np.concatenate(P), np.concatenate(dados), Pb)
+
+    @classmethod
+    def de_dataframe(cls, tabela):
+        """
+        :param tabela: DataFrame no formato de Black_Oil_Tabela_PVT.py (índice = pressão, primeira coluna = Pb)
+        :return: TabelaPVT
+        """
+        return cls(tabela.index.to_numpy(dtype=float), tabela.to_numpy(dtype=float), tabela.iloc[0, 0],
+                   tabela.columns)
+
+    def consulta(self, P, colunas=None, metodo='linear', derivada=False):
+        """
+        Nota: busca binária (O(log n)) e interpolação vetorizadas sobre todo o array de consultas. Fora da malha, as
+        propriedades são extrapoladas linearmente a partir do intervalo da ponta. Em P = Pb cada coluna segue a regra
+        do grafo da tabela: as de COLUNAS_ACIMA_EM_PB (Co) vêm do trecho de cima e as demais do de baixo.
+        :param P: Pressões de consulta, psia (escalar, array ou Grandeza)
+        :param colunas: Nomes das colunas desejadas (ex.: ('Bo', 'Rs')); None devolve todas
+        :param metodo: 'linear' ou 'cubica' (Hermite monótona de Fritsch-Carlson)
+        :param derivada: Se True, devolve também d(propriedade)/dP
+        :return: Array P.shape + (n_colunas,) e, se derivada=True, um segundo array com as derivadas em 1/psia
+        """
+        P = np.asarray(valor_em(P, 'psia'), dtype=float)
+        indices = range(len(self.nomes)) if colunas is None else [self.nomes.index(c) for c in colunas]
+        indices = list(indices)
+        Pq = P.ravel()
+        valores = np.empty((len(indices), Pq.size))
+        derivadas = np.empty((len(indices), Pq.size))
+
+        acima = Pq > self.Pb
+        for trecho, mascara in zip(self._trechos(), (~acima, acima)):
+            if mascara.any():
+                valores[:, mascara], derivadas[:, mascara] = trecho.interpola(Pq[mascara], indices, metodo)
+
+        em_Pb = Pq == self.Pb
+        linhas = [k for k, i in enumerate(indices) if self.nomes[i] in COLUNAS_ACIMA_EM_PB]
+        if em_Pb.any() and linhas:
+            valores_Pb, derivadas_Pb = self._trechos()[1].interpola(Pq[em_Pb], [indices[k] for k in linhas], metodo)
+            valores[np.ix_(linhas, em_Pb)], derivadas[np.ix_(linhas, em_Pb)] = valores_Pb, derivadas_Pb
+
+        valores = valores.T.reshape(P.shape + (len(indices),))
+        if derivada:
+            return valores, derivadas.T.reshape(P.shape + (len(indices),))
+        return valores
+
+    def _trechos(self):
+        # Pb fora da malha: o trecho que existe cobre os dois lados
+        abaixo, acima = self.trechos
+        return (abaixo if abaixo.P.size else acima), (acima if acima.P.size else abaixo)
+
+
+class _TrechoTabela:
+    def __init__(self, P, dados):
+        """
+        :param P: Pressões dos nós do trecho, psia
+        :param dados: Array (len(P), n_colunas)
+        """
+        self.P = np.ascontiguousarray(P, dtype=float)
+        self.valores = np.ascontiguousarray(np.asarray(dados, dtype=float).T)  # uma coluna contígua por propriedade
+        self.inclinacoes = _inclinacoes_monotonas(self.P, self.valores)
+
+    def interpola(self, Pq, indices, metodo):
+        """
+        :return: valores e derivadas, arrays (len(indices), len(Pq))
+        """
+        V = self.valores[indices]
+        if self.P.size == 1:
+            return np.repeat(V, Pq.size, axis=1), np.zeros((len(indices), Pq.size))
+
+        k = np.clip(np.searchsorted(self.P, Pq, 'right') - 1, 0, self.P.size - 2)
+        h = self.P[k + 1] - self.P[k]
+        y0, y1 = V[:, k], V[:, k + 1]
+        if metodo == 'linear':
+            inclinacao = (y1 - y0) / h
+            return y0 + inclinacao * (Pq - self.P[k]), inclinacao
+
+        D = self.inclinacoes[indices]
+        d0, d1 = D[:, k], D[:, k + 1]
+        t = np.clip((Pq - self.P[k]) / h, 0, 1)
+        fora = Pq - (self.P[k] + t * h)  # distância além da ponta da malha (zero dentro dela)
+        t2, t3 = t * t, t * t * t
+        valores = (2 * t3 - 3 * t2 + 1) * y0 + (t3 - 2 * t2 + t) * h * d0 + (-2 * t3 + 3 * t2) * y1 + (t3 - t2) * h * d1
+        derivadas = ((6 * t2 - 6 * t) * y0 + (-6 * t2 + 6 * t) * y1) / h + (3 * t2 - 4 * t + 1) * d0 + \
+            (3 * t2 - 2 * t) * d1
+        return valores + derivadas * fora, derivadas
+
+
+class TabelaPVTPT:
+    def __init__(self, T, Pb, s, d, saturado, subsaturado, colunas=COLUNAS_TABELA_PVT):
+        """
+        Nota: tabela P × T com a quebra em Pb(T) alinhada. Abaixo de Pb a coordenada é s = P / Pb(T) e acima é
+        d = P - Pb(T), então cada trecho é uma grade retangular (s, T) ou (d, T) comum a todas as temperaturas, e a
+        interpolação em T nunca mistura óleo saturado com sub-saturado.
+        :param T: Temperaturas, °F, em ordem crescente
+        :param Pb: Pressão de bolha em cada temperatura, psia
+        :param s: Nós de P / Pb do trecho saturado, crescentes, o último igual a 1
+        :param d: Nós de P - Pb do trecho sub-saturado, psia, crescentes, o primeiro igual a 0
+        :param saturado: Array (len(T), len(s), len(colunas))
+        :param subsaturado: Array (len(T), len(d), len(colunas))
+        :param colunas: Nomes das colunas, como em TabelaPVT
+        """
+        self.T = np.ascontiguousarray(T, dtype=float)
+        self.Pb = np.ascontiguousarray(Pb, dtype=float)
+        if self.T.size < 2:
+            raise ValueError('A tabela P × T precisa de pelo menos duas temperaturas; para uma só, use TabelaPVT')
+        self.colunas = list(colunas)
+        self.nomes = [c.split('[')[0] for c in self.colunas]
+        self._Pb_T = _TrechoTabela(self.T, self.Pb[:, None])
+        self.trechos = [_GradeTabela(s, self.T, saturado), _GradeTabela(d, self.T, subsaturado)]
+
+    @classmethod
+    def de_fluido(cls, fluido, T, P_min=14, P_max=7000, n_saturado=40, n_subsaturado=40, correlacoes=None):
+        """
+        Nota: todos os nós (len(T) × (n_saturado + n_subsaturado)) são avaliados em uma única chamada de
+        gera_tabela_pvt_black_oil, com uma linha por temperatura. Os nós de s são espaçados em progressão geométrica
+        (Bg e Cg variam como 1/P em baixa pressão) e os limites laterais em Pb(T) entram como nós, como em de_fluido.
+        :param fluido: dict com as propriedades de uma amostra (mesmas chaves de gera_tabela_pvt_black_oil; T é
+        ignorada, e um Pb medido vira Rsb, ver pressao_de_bolha_nas_temperaturas)
+        :param T: Temperaturas da tabela, °F (ou Grandeza)
+        :param P_min: Menor pressão coberta em todas as temperaturas, psia
+        :param P_max: Maior pressão coberta em todas as temperaturas, psia
+        :param n_saturado: Número de nós de cada temperatura abaixo de Pb
+        :param n_subsaturado: Número de nós de cada temperatura acima de Pb
+        :param correlacoes: dict {propriedade: nome no REGISTRO_CORRELACOES} (ver grafo_tabela_pvt)
+        :return: TabelaPVTPT
+        """
+        fluido_T, Pb = _fluido_nas_temperaturas(fluido, T, correlacoes)
+        Pb = Pb.ravel()
+        s = np.geomspace(min(P_min / Pb.max(), 0.5), 1, n_saturado)
+        d = np.linspace(0, max(P_max - Pb.min(), P_max / 2), n_subsaturado)
+        P_saturado = s * Pb[:, None]
+        P_saturado[:, -1] = np.nextafter(Pb, -np.inf)
+        P_subsaturado = Pb[:, None] + d
+        P_subsaturado[:, 0] = np.nextafter(Pb, np.inf)
+        dados = gera_tabela_pvt_black_oil(fluido_T, np.hstack([P_saturado, P_subsaturado]), correlacoes=correlacoes)
+        return cls(fluido_T['T'].ravel(), Pb, s, d, dados[:, :n_saturado], dados[:, n_saturado:])
+
+    def pressao_de_bolha(self, T, metodo='linear'):
+        """
+        :param T: Temperaturas, °F (escalar, array ou Grandeza)
+        :param metodo: 'linear' ou 'cubica'
+        :return: Pb(T), psia
+        """
+        T = np.asarray(valor_em(T, '°F'), dtype=float)
+        return self._Pb_T.interpola(T.ravel(), [0], metodo)[0][0].reshape(T.shape)
+
+    def consulta(self, P, T, colunas=None, metodo='linear'):
+        """
+        Nota: vetorizada sobre todas as consultas, sem laço por ponto: uma busca binária em cada eixo e a
+        interpolação bilinear ('linear') ou bicúbica de Hermite com inclinações monótonas ('cubica'). Fora da grade,
+        extrapolação linear a partir da borda. Em P = Pb(T), Pb interpolada, vale a convenção de TabelaPVT.consulta.
+        :param P: Pressões, psia (escalar, array ou Grandeza)
+        :param T: Temperaturas, °F (escalar, array ou Grandeza), com broadcast contra P
+        :param colunas: Nomes das colunas desejadas (ex.: ('Bo', 'Rs')); None devolve todas
+        :param metodo: 'linear' ou 'cubica'
+        :return: Array broadcast(P, T).shape + (n_colunas,)
+        """
+        P, T = np.broadcast_arrays(np.asarray(valor_em(P, 'psia'), dtype=float),
+                                   np.asarray(valor_em(T, '°F'), dtype=float))
+        indices = list(range(len(self.nomes)) if colunas is None else [self.nomes.index(c) for c in colunas])
+        Pq, Tq = P.ravel(), T.ravel()
+        Pb = self._Pb_T.interpola(Tq, [0], metodo)[0][0]
+        valores = np.empty((len(indices), Pq.size))
+
+        acima = Pq > Pb
+        coordenadas = (Pq / Pb, Pq - Pb)
+        for trecho, mascara, x in zip(self.trechos, (~acima, acima), coordenadas):
+            if mascara.any():
+                valores[:, mascara] = trecho.interpola(x[mascara], Tq[mascara], indices, metodo)
+
+        em_Pb = Pq == Pb
+        linhas = [k for k, i in enumerate(indices) if self.nomes[i] in COLUNAS_ACIMA_EM_PB]
+        if em_Pb.any() and linhas:
+            valores[np.ix_(linhas, em_Pb)] = self.trechos[1].interpola(coordenadas[1][em_Pb], Tq[em_Pb],
+                                                                       [indices[k] for k in linhas], metodo)
+        return valores.T.reshape(P.shape + (len(indices),))
+
+
+class _GradeTabela:
+    def __init__(self, x, T, dados):
+        """
+        :param x: Nós da coordenada de pressão do trecho (s ou d)
+        :param T: Nós de temperatura, °F
+        :param dados: Array (len(T), len(x), n_colunas)
+        """
+        self.x = np.ascontiguousarray(x, dtype=float)
+        self.T = T
+        self.valores = np.ascontiguousarray(np.moveaxis(np.asarray(dados, dtype=float), -1, 0))  # (col, T, x)
+        n_colunas = self.valores.shape[0]
+        # Derivadas nos nós para a bicúbica: em x, em T e a cruzada (inclinação em T da derivada em x)
+        self.Dx = _inclinacoes_monotonas(self.x, self.valores.reshape(-1, self.x.size)).reshape(self.valores.shape)
+        por_T = np.moveaxis(self.valores, 1, 2).reshape(-1, T.size)
+        self.DT = np.moveaxis(_inclinacoes_monotonas(T, por_T).reshape(n_colunas, self.x.size, T.size), 2, 1)
+        por_T = np.moveaxis(self.Dx, 1, 2).reshape(-1, T.size)
+        self.DxT = np.moveaxis(_inclinacoes_monotonas(T, por_T).reshape(n_colunas, self.x.size, T.size), 2, 1)
+
+    def interpola(self, xq, Tq, indices, metodo):
+        """
+        :return: Array (len(indices), len(xq))
+        """
+        i, hx, u = _intervalo(self.x, xq)
+        j, hT, v = _intervalo(self.T, Tq)
+        V = self.valores[indices]
+        cantos = ((j, i), (j, i + 1), (j + 1, i), (j + 1, i + 1))
+        if metodo == 'linear':
+            pesos = ((1 - v) * (1 - u), (1 - v) * u, v * (1 - u), v * u)
+            return sum(peso * V[:, a, b] for peso, (a, b) in zip(pesos, cantos))
+
+        # Bicúbica de Hermite dentro da célula; fora dela, extrapolação linear com a derivada na borda
+        u_in, v_in = np.clip(u, 0, 1), np.clip(v, 0, 1)
+        fora_x, fora_T = (u - u_in) * hx, (v - v_in) * hT
+        Hu, dHu = _bases_hermite(u_in)
+        Hv, dHv = _bases_hermite(v_in)
+        Dx, DT, DxT = self.Dx[indices], self.DT[indices], self.DxT[indices]
+        valores = 0
+        derivada_x = 0
+        derivada_T = 0
+        for (a, b), (p, q) in zip(cantos, ((0, 0), (0, 1), (1, 0), (1, 1))):  # p: canto em T, q: canto em x
+            termos = (V[:, a, b], Dx[:, a, b] * hx, DT[:, a, b] * hT, DxT[:, a, b] * hx * hT)
+            base_x = (Hu[q], Hu[q + 2], Hu[q], Hu[q + 2])
+            base_T = (Hv[p], Hv[p], Hv[p + 2], Hv[p + 2])
+            dbase_x = (dHu[q], dHu[q + 2], dHu[q], dHu[q + 2])
+            dbase_T = (dHv[p], dHv[p], dHv[p + 2], dHv[p + 2])
+            for termo, bx, bT, dbx, dbT in zip(termos, base_x, base_T, dbase_x, dbase_T):
+                valores = valores + termo * bx * bT
+                derivada_x = derivada_x + termo * dbx * bT
+                derivada_T = derivada_T + termo * bx * dbT
+        return valores + derivada_x / hx * fora_x + derivada_T / hT * fora_T
+
+
+def _intervalo(nos, xq):
+    """
+    :return: índice do intervalo de cada consulta, largura do intervalo e posição relativa (fora de [0, 1] além das
+    pontas da malha)
+    """
+    k = np.clip(np.searchsorted(nos, xq, 'right') - 1, 0, nos.size - 2)
+    h = nos[k + 1] - nos[k]
+    return k, h, (xq - nos[k]) / h
+
+
+def _bases_hermite(t):
+    """
+    :return: (h00, h01, h10, h11) e suas derivadas em t; h0* multiplicam os valores e h1* as inclinações × h
+    """
+    t2, t3 = t * t, t * t * t
+    bases = (2 * t3 - 3 * t2 + 1, -2 * t3 + 3 * t2, t3 - 2 * t2 + t, t3 - t2)
+    derivadas = (6 * t2 - 6 * t, -6 * t2 + 6 * t, 3 * t2 - 4 * t + 1, 3 * t2 - 2 * t)
+    return bases, derivadas
+
+
+def _fluido_nas_temperaturas(fluido, T, correlacoes=None):
+    """
+    Nota: um Pb medido vale só na temperatura da amostra. Ele é trocado pelo Rsb que o reproduz
+    (completa_ponto_de_bolha, com a correlação de Pb escolhida) e Pb(T) vem desse Rsb em cada temperatura.
+    :param fluido: Propriedades de uma amostra
+    :param T: Temperaturas, °F (ou Grandeza)
+    :return: dict de entradas com uma linha por temperatura e Pb(T) (len(T), 1), psia
+    """
+    fluido = valores_em(fluido, UNIDADES_DO_FLUIDO)
+    T = np.asarray(valor_em(T, '°F'), dtype=float).ravel()
+    if np.any(np.diff(T) <= 0):
+        raise ValueError('As temperaturas da tabela devem ser crescentes')
+    correlacao_Pb = (correlacoes or {}).get('Pb', 'standing')
+    if 'Pb' in fluido and not np.isnan(fluido['Pb']).all():
+        fluido['Rsb'] = completa_ponto_de_bolha(fluido, correlacao_Pb)[1]
+    fluido_T = {chave: valor for chave, valor in fluido.items() if chave != 'Pb'}
+    fluido_T['T'] = T.reshape(-1, 1)
+    Pb = gera_tabela_pvt_black_oil(fluido_T, [1.0], saidas=('Pb',), correlacoes=correlacoes)[:, :, 0]
+    return fluido_T, Pb
+
+
+def gera_tabela_pvt_P_T(fluido, P, T, saidas=SAIDAS_TABELA_PVT, correlacoes=None):
+    """
+    :param fluido: Propriedades de uma amostra (ver TabelaPVTPT.de_fluido)
+    :param P: Malha de pressões, psia (1-D, comum a todas as temperaturas)
+    :param T: Temperaturas, °F, crescentes
+    :param saidas: Variáveis do grafo a calcular
+    :param correlacoes: dict {propriedade: nome no REGISTRO_CORRELACOES}
+    :return: Array (len(T), len(P), len(saidas)), avaliado em uma única chamada, e Pb(T) (len(T),), psia
+    """
+    fluido_T, Pb = _fluido_nas_temperaturas(fluido, T, correlacoes)
+    return gera_tabela_pvt_black_oil(fluido_T, P, saidas, correlacoes), Pb.ravel()
+
+
+def _refina_trecho(fluido, P, dados, tolerancia, metodo, max_nos):
+    """
+    :param fluido: Propriedades da amostra
+    :param P: Nós iniciais do trecho, psia, em ordem crescente
+    :param dados: Array (len(P), n_colunas) com as propriedades nos nós iniciais
+    :return: nós e dados do trecho refinado (ver TabelaPVT.adaptativa)
+    """
+    verificar = np.ones(P.size - 1, dtype=bool)  # intervalos ainda não verificados
+    while P.size < max_nos:
+        if not verificar.any():
+            if metodo == 'linear' or varredura_completa:
+                break
+            verificar[:] = True
+        varredura_completa = verificar.all()
+        k = np.flatnonzero(verificar)
+        meio = (P[k] + P[k + 1]) / 2
+        exato = gera_tabela_pvt_black_oil(fluido, meio)[0]
+        interpolado = _TrechoTabela(P, dados).interpola(meio, range(dados.shape[1]), metodo)[0].T
+        with np.errstate(invalid='ignore'):
+            ruins = (np.abs(interpolado - exato) > tolerancia * np.abs(exato)).any(axis=1)
+        ruins &= (meio > P[k]) & (meio < P[k + 1])  # intervalo já no limite da precisão do float
+        ruins[np.cumsum(ruins) > max_nos - P.size] = False
+
+        divididos = np.zeros(P.size - 1, dtype=bool)
+        divididos[k[ruins]] = True
+        P = np.insert(P, k[ruins] + 1, meio[ruins])
+        dados = np.insert(dados, k[ruins] + 1, exato[ruins], axis=0)
+        verificar = np.repeat(divididos, 1 + divididos)  # as duas metades de cada intervalo dividido
+    return P, dados
+
+
+def _inclinacoes_monotonas(P, valores):
+    """
+    Nota: inclinações de Fritsch-Carlson (média harmônica ponderada), que preservam a monotonia dos dados.
+    :param P: Pressões dos nós
+    :param valores: Array (n_colunas, len(P))
+    :return: dV/dP em cada nó, mesmo formato de valores
+    """
+    D = np.zeros_like(valores)
+    if P.size < 2:
+        return D
+    h = np.diff(P)
+    delta = np.diff(valores, axis=1) / h
+    D[:, 0] = delta[:, 0]
+    D[:, -1] = delta[:, -1]
+    if P.size > 2:
+        w1 = 2 * h[1:] + h[:-1]
+        w2 = h[1:] + 2 * h[:-1]
+        mesmo_sinal = delta[:, :-1] * delta[:, 1:] > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            media = (w1 + w2) / (w1 / delta[:, :-1] + w2 / delta[:, 1:])
+        D[:, 1:-1] = np.where(mesmo_sinal, media, 0)
+    return D
@@ -0,0 +1,165 @@
+"""
+Conversão de unidades vetorizada, por tabela de fatores.
+
+Cada unidade é guardada como (grandeza, fator, deslocamento) em relação à unidade de base da grandeza (SI), com
+valor_base = valor * fator + deslocamento. O par (fator, deslocamento) entre duas unidades é calculado uma vez e
+reaproveitado, então converter um array inteiro é uma multiplicação e uma soma do NumPy, sem laço nem comparação de
+strings por elemento. Uma Grandeza carrega o valor junto com a unidade: as correlações do REGISTRO_CORRELACOES e a
+tabela PVT recebem Grandeza's e as convertem para as unidades que esperam, uma única vez por unidade.
+"""
+
+import functools
+
+import numpy as np
+
+
+_F_PARA_K = 5 / 9
+_PSI_EM_PA = 6894.757293168361
+_ATM_EM_PA = 101325.0
+
+# unidade: (grandeza, fator, deslocamento), com valor_base = valor * fator + deslocamento
+UNIDADES = {
+    # Temperatura (base: K)
+    'K': ('temperatura', 1.0, 0.0),
+    '°C': ('temperatura', 1.0, 273.15),
+    '°R': ('temperatura', _F_PARA_K, 0.0),
+    '°F': ('temperatura', _F_PARA_K, 459.67 * _F_PARA_K),
+    # Pressão (base: Pa)
+    'Pa': ('pressao', 1.0, 0.0),
+    'kPa': ('pressao', 10 ** 3, 0.0),
+    'MPa': ('pressao', 10 ** 6, 0.0),
+    'bar': ('pressao', 10 ** 5, 0.0),
+    'atm': ('pressao', _ATM_EM_PA, 0.0),
+    'psia': ('pressao', _PSI_EM_PA, 0.0),
+    'psig': ('pressao', _PSI_EM_PA, _ATM_EM_PA),
+    'torr': ('pressao', _ATM_EM_PA / 760, 0.0),
+    'mmHg': ('pressao', 133.322387415, 0.0),
+    'kgf/cm²': ('pressao', 98066.5, 0.0),
+    'kgf/in²': ('pressao', 9.80665 / 0.0254 ** 2, 0.0),
+    # Compressibilidade (base: 1/Pa)
+    '1/Pa': ('compressibilidade', 1.0, 0.0),
+    '1/kPa': ('compressibilidade', 10 ** -3, 0.0),
+    '1/bar': ('compressibilidade', 10 ** -5, 0.0),
+    '1/psia': ('compressibilidade', 1 / _PSI_EM_PA, 0.0),
+    '1/kgf/cm²': ('compressibilidade', 1 / 98066.5, 0.0),
+    # Massa específica (base: kg/m³)
+    'kg/m³': ('massa_especifica', 1.0, 0.0),
+    'g/cm³': ('massa_especifica', 10 ** 3, 0.0),
+    'lb/ft³': ('massa_especifica', 0.45359237 / 0.3048 ** 3, 0.0),
+    # Viscosidade (base: Pa.s)
+    'Pa.s': ('viscosidade', 1.0, 0.0),
+    'mPa.s': ('viscosidade', 10 ** -3, 0.0),
+    'cP': ('viscosidade', 10 ** -3, 0.0),
+    # Razão gás-óleo (base: m³/m³ em condição padrão)
+    'm³/m³': ('razao_gas_oleo', 1.0, 0.0),
+    'SCF/STB': ('razao_gas_oleo', 0.3048 ** 3 / 0.158987294928, 0.0),
+    'adimensional': ('adimensional', 1.0, 0.0),
+}
+
+# Grafias aceitas para as unidades acima (comparadas sem maiúsculas, espaços e '°')
+_SINONIMOS = {
+    'c': '°C', 'f': '°F', 'r': '°R', 'psi': 'psia', 'kgf/cm2': 'kgf/cm²', 'kgf/in2': 'kgf/in²', 'mmhg': 'mmHg',
+    '1/psi': '1/psia', '1/kgf/cm2': '1/kgf/cm²', 'kg/m3': 'kg/m³', 'g/cm3': 'g/cm³', 'lb/ft3': 'lb/ft³',
+    'pas': 'Pa.s', 'mpas': 'mPa.s', 'm3/m3': 'm³/m³', 'scf/bbl': 'SCF/STB', '-': 'adimensional',
+}
+_SINONIMOS.update({unidade.lower().replace('°', ''): unidade for unidade in UNIDADES})
+
+# Unidade em que as correlações esperam cada propriedade de entrada de uma amostra de fluido
+UNIDADES_DO_FLUIDO = {'dg': 'adimensional', 'do': 'adimensional', 'API': 'adimensional', 'Pb': 'psia',
+                      'Rsb': 'SCF/STB', 'T': '°F', 'Tsep': '°F', 'Psep': 'psia', 'Yn2': 'adimensional',
+                      'Yco2': 'adimensional', 'Yh2s': 'adimensional'}
+
+
+@functools.lru_cache(maxsize=None)
+def unidade_canonica(unidade):
+    """
+    :param unidade: Nome da unidade em qualquer grafia aceita (ex.: 'C', '°c', 'BAR', 'kgf/cm2')
+    :return: Nome da unidade como em UNIDADES (ex.: '°C', 'bar', 'kgf/cm²')
+    """
+    chave = unidade.strip().lower().replace('°', '').replace(' ', '')
+    if chave not in _SINONIMOS:
+        raise ValueError(f'Unidade "{unidade}" desconhecida; use uma de {tuple(UNIDADES)}')
+    return _SINONIMOS[chave]
+
+
+@functools.lru_cache(maxsize=None)
+def fator_de_conversao(de, para):
+    """
+    :param de: Unidade de origem
+    :param para: Unidade de destino, da mesma grandeza
+    :return: (fator, deslocamento) com valor_para = valor_de * fator + deslocamento
+    """
+    grandeza_de, fator_de, deslocamento_de = UNIDADES[unidade_canonica(de)]
+    grandeza_para, fator_para, deslocamento_para = UNIDADES[unidade_canonica(para)]
+    if grandeza_de != grandeza_para:
+        raise ValueError(f'Não há conversão de {de} ({grandeza_de}) para {para} ({grandeza_para})')
+    return fator_de / fator_para, (deslocamento_de - deslocamento_para) / fator_para
+
+
+def converte(valor, de, para):
+    """
+    Nota: uma multiplicação e uma soma sobre o array inteiro (cada uma omitida quando é identidade); arrays NumPy e
+    NumeroDual passam direto, listas viram arrays.
+    :param valor: Escalar ou array na unidade de
+    :param de: Unidade de origem
+    :param para: Unidade de destino
+    :return: valor na unidade para
+    """
+    fator, deslocamento = fator_de_conversao(de, para)
+    if isinstance(valor, (list, tuple)):
+        valor = np.asarray(valor, dtype=float)
+    if fator != 1:
+        valor = valor * fator
+    if deslocamento != 0:
+        valor = valor + deslocamento
+    return valor
+
+
+class Grandeza:
+    def __init__(self, valor, unidade):
+        """
+        :param valor: Escalar ou array
+        :param unidade: Unidade de valor (qualquer grafia aceita por unidade_canonica)
+        """
+        self.valor = np.asarray(valor, dtype=float)[()]
+        self.unidade = unidade_canonica(unidade)
+        self._convertidos = {self.unidade: self.valor}
+
+    def em(self, unidade):
+        """
+        :param unidade: Unidade desejada
+        :return: Valor na unidade pedida; cada unidade é convertida uma única vez e guardada
+        """
+        unidade = unidade_canonica(unidade)
+        if unidade not in self._convertidos:
+            self._convertidos[unidade] = converte(self.valor, self.unidade, unidade)
+        return self._convertidos[unidade]
+
+    def __getitem__(self, indice):
+        return Grandeza(np.asarray(self.valor)[indice], self.unidade)
+
+    def __len__(self):
+        return len(self.valor)
+
+    def __repr__(self):
+        return f'Grandeza({self.valor!r}, {self.unidade!r})'
+
+
+def valor_em(valor, unidade):
+    """
+    :param valor: Grandeza ou valor comum (já suposto na unidade pedida)
+    :param unidade: Unidade esperada por quem vai usar o valor
+    :return: valor na unidade pedida
+    """
+    if isinstance(valor, Grandeza):
+        return valor.em(unidade)
+    return valor
+
+
+def valores_em(dados, unidades=UNIDADES_DO_FLUIDO):
+    """
+    :param dados: dict ou DataFrame com valores comuns e/ou Grandeza's
+    :param unidades: dict {chave: unidade esperada}
+    :return: dict com os mesmos valores, os que eram Grandeza convertidos para a unidade esperada
+    """
+    return {chave: valor_em(dados[chave], unidades.get(chave)) for chave in dados}
@@ -0,0 +1,147 @@
+"""
+Varreduras de sensibilidade (fluidos × temperaturas × pressões) distribuídas em vários processos.
+
+As amostras de fluido são divididas em lotes; cada processo gera a tabela PVT de um lote inteiro com
+gera_tabela_pvt_black_oil e grava o resultado em disco assim que termina. Um lote já gravado não é refeito, então
+uma varredura interrompida continua de onde parou.
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from ClassesTabelaPVT import gera_tabela_pvt_black_oil, COLUNAS_TABELA_PVT
+
+
+def amostra_hipercubo_latino(limites, n, semente=None):
+    """
+    :param limites: dict {propriedade: (mínimo, máximo)}, ex.: {'dg': (0.6, 1.0), 'T': (100, 250)}
+    :param n: Número de amostras
+    :param semente: Semente do gerador aleatório
+    :return: dict {propriedade: array (n,)}, com cada faixa dividida em n estratos e um ponto por estrato
+    """
+    gerador = np.random.default_rng(semente)
+    amostras = {}
+    for propriedade, (minimo, maximo) in limites.items():
+        u = (gerador.permutation(n) + gerador.random(n)) / n
+        amostras[propriedade] = minimo + u * (maximo - minimo)
+    return amostras
+
+
+def combina_fluidos_temperaturas(fluidos, T):
+    """
+    :param fluidos: dict {propriedade: array (n_fluidos,)}
+    :param T: Temperaturas, °F
+    :return: dict com n_fluidos × len(T) casos (cada fluido repetido em todas as temperaturas)
+    """
+    T = np.asarray(T, dtype=float)
+    n_fluidos = len(next(iter(fluidos.values())))
+    casos = {chave: np.repeat(np.asarray(valor, dtype=float), T.size) for chave, valor in fluidos.items()}
+    casos['T'] = np.tile(T, n_fluidos)
+    return casos
+
+
+def resumo_dos_fluidos(fluidos):
+    """
+    :param fluidos: dict {propriedade: array (n_casos,)}
+    :return: dict {propriedade: resumo BLAKE2b (hexadecimal) dos valores}, para conferir a retomada de uma varredura
+    """
+    resumos = {}
+    for chave in sorted(fluidos):
+        valor = np.ascontiguousarray(fluidos[chave], dtype=float)
+        resumos[chave] = hashlib.blake2b(valor.data, digest_size=16).hexdigest()
+    return resumos
+
+
+def _executa_lote(arquivo, fluidos, P):
+    inicio = time.perf_counter()
+    tabela = gera_tabela_pvt_black_oil(fluidos, P)
+    temporario = arquivo + '.parcial.npy'
+    np.save(temporario, tabela)
+    os.replace(temporario, arquivo)  # o lote só aparece com o nome final depois de gravado por completo
+    return arquivo, tabela.shape[0] * tabela.shape[1], time.perf_counter() - inicio
+
+
+class VarreduraPVT:
+    def __init__(self, fluidos, P, diretorio, tamanho_lote=1000, processos=None):
+        """
+        :param fluidos: dict ou DataFrame com uma linha por caso (mesmas chaves de gera_tabela_pvt_black_oil)
+        :param P: Malha de pressões, psia
+        :param diretorio: Pasta onde os lotes e o manifesto são gravados
+        :param tamanho_lote: Número de casos por lote (por tarefa de um processo)
+        :param processos: Número de processos; None usa todos os núcleos
+        """
+        self.fluidos = {chave: np.asarray(fluidos[chave], dtype=float) for chave in fluidos.keys()}
+        self.P = np.asarray(P, dtype=float)
+        self.diretorio = diretorio
+        self.tamanho_lote = tamanho_lote
+        self.processos = processos or os.cpu_count()
+        self.n_casos = len(next(iter(self.fluidos.values())))
+        self.n_lotes = -(-self.n_casos // tamanho_lote)
+
+    def arquivo_do_lote(self, k):
+        return os.path.join(self.diretorio, f'lote_{k:06d}.npy')
+
+    def _confere_manifesto(self):
+        """
+        Nota: grava o manifesto na primeira execução; nas seguintes, garante que a retomada é da mesma varredura (mesma
+        malha e mesmos valores de cada propriedade dos fluidos, conferidos pelo resumo BLAKE2b de cada array).
+        """
+        manifesto = {'n_casos': self.n_casos, 'tamanho_lote': self.tamanho_lote, 'P': self.P.tolist(),
+                     'colunas': COLUNAS_TABELA_PVT, 'fluidos': resumo_dos_fluidos(self.fluidos)}
+        arquivo = os.path.join(self.diretorio, 'manifesto.json')
+        if os.path.exists(arquivo):
+            with open(arquivo) as f:
+                if json.load(f) != manifesto:
+                    raise ValueError(f'{self.diretorio} contém outra varredura; use outra pasta')
+        else:
+            with open(arquivo, 'w') as f:
+                json.dump(manifesto, f)
+            np.savez(os.path.join(self.diretorio, 'fluidos.npz'), **self.fluidos)
+
+    def executa(self, mostra_progresso=True):
+        """
+        :param mostra_progresso: Imprime a vazão de cada lote concluído
+        :return: dict com lotes calculados, lotes reaproveitados, nós calculados, tempo e nós por segundo
+        """
+        os.makedirs(self.diretorio, exist_ok=True)
+        self._confere_manifesto()
+        pendentes = [k for k in range(self.n_lotes) if not os.path.exists(self.arquivo_do_lote(k))]
+
+        inicio = time.perf_counter()
+        nos = 0
+        with ProcessPoolExecutor(self.processos) as executor:
+            tarefas = []
+            for k in pendentes:
+                fatia = slice(k * self.tamanho_lote, (k + 1) * self.tamanho_lote)
+                lote = {chave: valor[fatia] for chave, valor in self.fluidos.items()}
+                tarefas.append(executor.submit(_executa_lote, self.arquivo_do_lote(k), lote, self.P))
+            for concluidas, tarefa in enumerate(as_completed(tarefas), 1):
+                arquivo, nos_do_lote, _ = tarefa.result()
+                nos += nos_do_lote
+                if mostra_progresso:
+                    decorrido = time.perf_counter() - inicio
+                    print(f'{os.path.basename(arquivo)} ({concluidas}/{len(pendentes)}): {nos / decorrido:.3g} nós/s, '
+                          f'{nos * len(COLUNAS_TABELA_PVT) / decorrido:.3g} propriedades/s')
+        tempo = time.perf_counter() - inicio
+
+        return {'lotes_calculados': len(pendentes), 'lotes_reaproveitados': self.n_lotes - len(pendentes),
+                'nos': nos, 'tempo': tempo, 'nos_por_segundo': nos / tempo if tempo > 0 else 0.0}
+
+    def lotes(self):
+        """
+        :return: Gerador dos lotes gravados, em ordem, cada um um array (tamanho_lote, len(P), 11) mapeado do disco
+        (somente leitura), sem carregar a varredura inteira na memória
+        """
+        for k in range(self.n_lotes):
+            yield np.load(self.arquivo_do_lote(k), mmap_mode='r')
+
+    def resultado(self):
+        """
+        Nota: copia todos os lotes para um único array em memória; para varreduras maiores que a memória, use lotes().
+        :return: Array (n_casos, len(P), 11) montado a partir dos lotes gravados
+        """
+        return np.concatenate(list(self.lotes()))
@@ -0,0 +1,172 @@
+"""
+Viscosidade do gás em lote: Lee, Sutton (2007) e Dempsey (1965) com os termos independentes da pressão separados.
+
+Nas três correlações só a massa específica in situ (rho_g, vinda da passada da fase gás: P, Z) varia com a pressão;
+kv, xv e yv de Lee, X, Y e K de Sutton e a viscosidade a 1 atm de Dempsey dependem só do fluido e da temperatura.
+ViscosidadeGas calcula esses fatores uma vez, na forma das colunas do fluido (ex.: (n_fluidos, 1)), e cada avaliação
+sobre a malha (n_fluidos, n_pressões) custa só uma potência e uma exponencial por nó. As funções fatores_* e
+viscosidade_* são as mesmas usadas pelos métodos de BlackOil.
+"""
+
+import functools
+
+import numpy as np
+from ClassesUnidades import converte
+
+
+VISCOSIDADES_GAS = ('lee', 'sutton', 'dempsey')
+R_CAMPO = 10.73  # psia.ft³/(lbmol.°R), mesma constante padrão de BlackOil
+
+
+def fatores_lee(Mg, T):
+    """
+    :param Mg: Peso molecular do gás, lb/lbmol
+    :param T: Temperatura, °R
+    :return: kv, xv, yv
+    """
+    xv = 3.448 + (986.4 / T) + 0.01009 * Mg
+    yv = 2.4 - 0.2 * xv
+    kv = ((9.379 + 0.0160 * Mg) * T ** 1.5) / (209.2 + 19.26 * Mg + T)
+    return kv, xv, yv
+
+
+def viscosidade_lee(fatores, rho_g):
+    """
+    :param fatores: kv, xv, yv de fatores_lee
+    :param rho_g: Massa específica do gás, lb/ft³
+    :return: Viscosidade do gás, cP
+    """
+    kv, xv, yv = fatores
+    return (10 ** -4) * kv * np.exp(xv * (rho_g / 62.4) ** yv)
+
+
+def fatores_sutton(Mg, T, Tpr, Tpc, Ppc):
+    """
+    :param Mg: Peso molecular, lb/lbmol
+    :param T: Temperatura, °R
+    :param Tpr: Temperatura pseudoreduzida, adimensional
+    :param Tpc: Temperatura pseudocrítica, °R
+    :param Ppc: Pressão pseudocrítica, psia
+    :return: X, Y, K (K é a viscosidade a baixa pressão, ug_sc, sem o fator 10^-4)
+    """
+    X = 3.47 + (1588 / T) + 0.0009 * Mg
+    Y = 1.66378 - 0.04679 * X
+    K = (0.807 * Tpr ** 0.618 - 0.357 * np.exp(-0.449 * Tpr) + 0.34 * np.exp(-4.058 * Tpr) + 0.018) / \
+        (0.9490 * (Tpc / (Mg ** 3 * Ppc ** 4)) ** (1 / 6))
+    return X, Y, K
+
+
+def viscosidade_sutton(fatores, rho_g):
+    """
+    :param fatores: X, Y, K de fatores_sutton
+    :param rho_g: Massa específica do gás in situ, lb/ft³ (a correlação usa g/cm³; a conversão é feita aqui)
+    :return: Viscosidade do gás, cP
+    """
+    X, Y, K = fatores
+    return 10 ** -4 * K * np.exp(X * converte(rho_g, 'lb/ft³', 'g/cm³') ** Y)
+
+
+def viscosidade_dempsey(dg, T, Yn2=0, Yco2=0, Yh2s=0):
+    """
+    :param dg: Densidade relativa do gás, adimensional
+    :param T: Temperatura, °F
+    :param Yn2: Fração molar de N2
+    :param Yco2: Fração molar de CO2
+    :param Yh2s: Fração molar de H2S
+    :return: Viscosidade do gás na pressão atmosférica, cP
+    """
+    log_dg = np.log10(dg)
+    UG = (1.709 * 10 ** -5 - 2.062 * 10 ** -6 * dg) * T + 8.188 * 10 ** -3 - 6.15 * 10 ** -3 * log_dg
+    delta_ug_n2 = Yn2 * (8.43 * 10 ** -3 * log_dg + 9.59 * 10 ** -3)
+    delta_ug_co2 = Yco2 * (9.08 * 10 ** -3 * log_dg + 6.24 * 10 ** -3)
+    delta_ug_h2s = Yh2s * (8.49 * 10 ** -3 * log_dg + 3.73 * 10 ** -3)
+    return UG + delta_ug_n2 + delta_ug_co2 + delta_ug_h2s
+
+
+class ViscosidadeGas:
+    def __init__(self, dg, T, Yn2=0, Yco2=0, Yh2s=0, Mar=28.96, Tpc=None, Ppc=None):
+        """
+        Nota: os fatores de cada correlação são calculados na primeira vez em que ela é pedida e guardados; crie um
+        objeto por lote de fluidos e reaproveite-o em todas as pressões (ex.: a cada chamada da análise nodal).
+        :param dg: Densidade relativa do gás, adimensional (escalar ou coluna (n_fluidos, 1))
+        :param T: Temperatura, °R
+        :param Yn2: Fração molar de N2
+        :param Yco2: Fração molar de CO2
+        :param Yh2s: Fração molar de H2S
+        :param Mar: Peso molecular do ar, lb/lbmol
+        :param Tpc: Temperatura pseudocrítica, °R; None usa a de BlackOil (gás seco ou úmido, pela dg)
+        :param Ppc: Pressão pseudocrítica, psia; None usa a de BlackOil
+        """
+        self.dg = np.asarray(dg, dtype=float)[()]
+        self.T = np.asarray(T, dtype=float)[()]
+        self.Yn2, self.Yco2, self.Yh2s = Yn2, Yco2, Yh2s
+        self.Mg = Mar * self.dg
+        self.Tpc = Tpc
+        self.Ppc = Ppc
+
+    @functools.cached_property
+    def fatores_lee(self):
+        return fatores_lee(self.Mg, self.T)
+
+    @functools.cached_property
+    def fatores_sutton(self):
+        if self.Tpc is None or self.Ppc is None:
+            from ClassesBlackOil import BlackOil  # BlackOil importa este módulo
+
+            PVT = BlackOil(dg=self.dg, T=self.T, P=1)
+            _, _, Ppc, Tpc = PVT.fase_gas_pressao_temperatura_pseudocritica__Ppr__Tpr__Ppc__Tpc__()
+            self.Tpc = Tpc if self.Tpc is None else self.Tpc
+            self.Ppc = Ppc if self.Ppc is None else self.Ppc
+        return fatores_sutton(self.Mg, self.T, self.T / self.Tpc, self.Tpc, self.Ppc)
+
+    @functools.cached_property
+    def ug_1atm(self):
+        return viscosidade_dempsey(self.dg, converte(self.T, '°R', '°F'), self.Yn2, self.Yco2, self.Yh2s)
+
+    def massa_especifica(self, P, Z, R=R_CAMPO):
+        """
+        :param P: Pressão, psia
+        :param Z: Fator de compressibilidade, adimensional
+        :return: Massa específica do gás in situ, lb/ft³
+        """
+        return (P * self.Mg) / (Z * R * self.T)
+
+    def lee(self, rho_g):
+        """
+        :param rho_g: Massa específica do gás in situ, lb/ft³
+        :return: Viscosidade do gás, cP
+        """
+        return viscosidade_lee(self.fatores_lee, rho_g)
+
+    def sutton(self, rho_g):
+        """
+        :param rho_g: Massa específica do gás in situ, lb/ft³
+        :return: Viscosidade do gás, cP
+        """
+        return viscosidade_sutton(self.fatores_sutton, rho_g)
+
+    def dempsey(self, rho_g=None):
+        """
+        :param rho_g: Opcional; quando informado, o resultado é repetido na forma de rho_g
+        :return: Viscosidade do gás a 1 atm, cP (Dempsey não tem termo de pressão)
+        """
+        if rho_g is None:
+            return self.ug_1atm
+        return np.broadcast_to(self.ug_1atm, np.broadcast_shapes(np.shape(self.ug_1atm), np.shape(rho_g)))
+
+    def avalia(self, rho_g=None, correlacoes=VISCOSIDADES_GAS, P=None, Z=None):
+        """
+        :param rho_g: Massa específica do gás in situ, lb/ft³; se None, vem de P e Z
+        :param correlacoes: Nomes de VISCOSIDADES_GAS a avaliar
+        :param P: Pressão, psia (só quando rho_g não é informado)
+        :param Z: Fator de compressibilidade (só quando rho_g não é informado)
+        :return: dict {correlação: viscosidade, cP}, todas na forma de rho_g
+        """
+        if rho_g is None:
+            rho_g = self.massa_especifica(P, Z)
+        resultado = {}
+        for nome in correlacoes:
+            if nome not in VISCOSIDADES_GAS:
+                raise ValueError(f'Correlação "{nome}" desconhecida; use uma de {VISCOSIDADES_GAS}')
+            resultado[nome] = getattr(self, nome)(rho_g)
+        return resultado